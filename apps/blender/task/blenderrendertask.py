@@ -140,6 +140,7 @@ class BlenderTaskTypeInfo(TaskTypeInfo):
         if not task:
             pass
         elif task.use_frames:
+            task.flush_previews()
             if single:
                 return to_unicode(task.last_preview_path)
             else:
@@ -151,6 +152,7 @@ class BlenderTaskTypeInfo(TaskTypeInfo):
                     except IndexError:
                         result[to_unicode(f)] = None
         else:
+            task.flush_previews()
             result = to_unicode(task.preview_task_file_path or
                                 task.preview_file_path)
         return cls._preview_result(result, single=single)
@@ -358,8 +360,7 @@ class BlenderRenderTask(FrameRenderingTask):
             self.preview_file_path = []
             self.preview_updaters = []
             for i in range(0, len(self.frames)):
-                preview_name = "current_task_preview{}.{}".format(i,
-                                                                  PREVIEW_EXT)
+                preview_name = "current_preview{}.{}".format(i, PREVIEW_EXT)
                 preview_path = os.path.join(self.tmp_dir, preview_name)
                 self.preview_file_path.append(preview_path)
                 self.preview_updaters.append(PreviewUpdater(preview_path, 
@@ -556,26 +557,24 @@ class BlenderRenderTask(FrameRenderingTask):
             self._put_collected_files_together(os.path.join(self.tmp_dir, output_file_name),
                                                self.collected_file_names.values(), "paste")
             
-    def mark_part_on_preview(self, part, img_task, color, preview_updater, frame_index=0):
-        lower = preview_updater.get_offset(part)
-        upper = preview_updater.get_offset(part + 1)
-        res_x = preview_updater.preview_res_x
-        for i in range(0, res_x):
-                for j in range(lower, upper):
-                    img_task.putpixel((i, j), color)
-
-    def _mark_task_area(self, subtask, img_task, color, frame_index=0):
+    @staticmethod
+    def get_part_area(part, preview_updater):
+        return (0, preview_updater.get_offset(part),
+                preview_updater.preview_res_x,
+                preview_updater.get_offset(part + 1))
+
+    def _get_task_area(self, subtask, frame_index=0):
         if not self.use_frames:
-            self.mark_part_on_preview(subtask['start_task'], img_task, color, self.preview_updater)
+            return self.get_part_area(subtask['start_task'],
+                                      self.preview_updater)
         elif self.total_tasks <= len(self.frames):
-            for i in range(0, int(math.floor(self.res_x * self.scale_factor))):
-                for j in range(0, int(math.floor(self.res_y * self.scale_factor))):
-                    img_task.putpixel((i, j), color)
+            return (0, 0, int(math.floor(self.res_x * self.scale_factor)),
+                    int(math.floor(self.res_y * self.scale_factor)))
         else:
             parts = int(self.total_tasks / len(self.frames))
             pu = self.preview_updaters[frame_index]
             part = (subtask['start_task'] - 1) % parts + 1
-            self.mark_part_on_preview(part, img_task, color, pu)
+            return self.get_part_area(part, pu)
 
     def _put_frame_together(self, frame_num, num_start):
         directory = os.path.dirname(self.output_file)
@@ -1,6 +1,7 @@
 from __future__ import division
 
 import copy
+import heapq
 import logging
 import os
 import uuid
@@ -125,6 +126,8 @@ class CoreTask(Task):
         self.num_tasks_received = 0
         self.subtasks_given = {}
         self.num_failed_subtasks = 0
+        # heap of (priority, subtask_id) of failed subtasks to be sent again
+        self.failed_subtasks = []
 
         self.full_task_timeout = task_timeout
         self.counting_nodes = {}
@@ -140,6 +143,16 @@ class CoreTask(Task):
         self.verificator = self.VERIFICATOR_CLASS()
         self.max_pending_client_results = max_pending_client_results
 
+    def __setstate__(self, state):
+        super(CoreTask, self).__setstate__(state)
+        if 'failed_subtasks' not in state:
+            # task stored by an older version
+            self.failed_subtasks = []
+            for subtask_id, subtask in self.subtasks_given.items():
+                if subtask['status'] in [SubtaskStatus.failure,
+                                         SubtaskStatus.restarted]:
+                    self._queue_failed_subtask(subtask_id)
+
     def is_docker_task(self):
         return hasattr(self.header, 'docker_images') and len(self.header.docker_images) > 0
 
@@ -156,20 +169,45 @@ class CoreTask(Task):
     def computation_failed(self, subtask_id):
         self._mark_subtask_failed(subtask_id)
 
-    def computation_finished(self, subtask_id, task_result, result_type=0):
+    def computation_finished(self, subtask_id, task_result, result_type=0,
+                             verification_scheduler=None):
         if not self.should_accept(subtask_id):
             logger.info("Not accepting results for {}".format(subtask_id))
             return
         self.interpret_task_results(subtask_id, task_result, result_type)
         result_files = self.results.get(subtask_id)
-        ver_state = self.verificator.verify(subtask_id, self.subtasks_given.get(subtask_id),
-                                            result_files, self)
+        subtask_info = self.subtasks_given.get(subtask_id)
+
+        if verification_scheduler is None:
+            ver_state = self.verificator.verify(subtask_id, subtask_info,
+                                                result_files, self)
+            self.verification_finished(subtask_id, ver_state, result_files)
+            return
+
+        deferred = verification_scheduler.schedule(
+            self.header.deadline, self.verificator.verify,
+            subtask_id, subtask_info, result_files, self)
+        deferred.addErrback(self._verification_error, subtask_id)
+        deferred.addCallback(lambda ver_state: self.verification_finished(
+            subtask_id, ver_state, result_files))
+        return deferred
+
+    def verification_finished(self, subtask_id, ver_state, result_files):
+        if not self.should_accept(subtask_id):
+            logger.info("Subtask {} was restarted during verification"
+                        .format(subtask_id))
+            return
         if ver_state == SubtaskVerificationState.VERIFIED:
             self.accept_results(subtask_id, result_files)
         # TODO Add support for different verification states
         else:
             self.computation_failed(subtask_id)
 
+    def _verification_error(self, failure, subtask_id):
+        logger.error("Cannot verify subtask {}: {}"
+                     .format(subtask_id, failure.getErrorMessage()))
+        return SubtaskVerificationState.WRONG_ANSWER
+
     def accept_results(self, subtask_id, result_files):
         self.subtasks_given[subtask_id]['status'] = SubtaskStatus.finished
 
@@ -380,6 +418,29 @@ class CoreTask(Task):
         self.subtasks_given[subtask_id]['status'] = SubtaskStatus.failure
         self.counting_nodes[self.subtasks_given[subtask_id]['node_id']].reject()
         self.num_failed_subtasks += 1
+        self._queue_failed_subtask(subtask_id)
+
+    def _queue_failed_subtask(self, subtask_id):
+        heapq.heappush(self.failed_subtasks,
+                       (self._get_resend_priority(subtask_id), subtask_id))
+
+    def _get_resend_priority(self, subtask_id):
+        """ Failed subtasks with lower priority value are sent again first,
+        by default these are the earliest parts of the task """
+        return self.subtasks_given[subtask_id].get('start_task', 0)
+
+    def _pop_failed_subtask(self):
+        """ Take a failed subtask that should be sent again. Entries of
+        subtasks that have been sent again in the meantime are skipped.
+        :return None|str: subtask id or None if there are no such subtasks
+        """
+        while self.failed_subtasks:
+            _, subtask_id = heapq.heappop(self.failed_subtasks)
+            subtask = self.subtasks_given.get(subtask_id)
+            if subtask and subtask['status'] in [SubtaskStatus.failure,
+                                                 SubtaskStatus.restarted]:
+                return subtask_id
+        return None
 
     def _unpack_task_result(self, trp, output_dir):
         tr = CBORSerializer.loads(trp)
@@ -0,0 +1,122 @@
+class FlmMergeTree(object):
+    """ Plans incremental merging of film (.flm) files. Results of subtasks
+    are merged in batches of `arity` files as soon as they arrive, merged
+    films of the same level are merged again, so the final merge only has
+    to fold in the few films that were not merged yet. Merging itself is
+    done by the caller, one batch at a time.
+
+    Each film is identified by the set of keys (subtask numbers) of results
+    merged into it. When a result is replaced or removed, films it was
+    merged into are dropped and their other results are merged again.
+    """
+
+    def __init__(self, arity=4):
+        """
+        :param int arity: number of films merged at once, at least 2
+        """
+        self.arity = max(2, arity)
+        self.sources = dict()  # key -> path of a result film
+        self.levels = [[]]  # levels[i]: (keys, path) of films merged i times
+        self.running = None  # (level, films) of the merge in progress
+        self.failed = False
+        self.merges = 0
+
+        self._stale = False  # a result of the running merge was removed
+
+    def add(self, key, path):
+        """ Add result film, replacing previous result with the same key """
+        self.discard(key)
+        self.sources[key] = path
+        self.levels[0].append((frozenset([key]), path))
+
+    def discard(self, key):
+        """ Remove result film and all films it was merged into """
+        if key not in self.sources:
+            return
+        del self.sources[key]
+        if self.running is not None \
+                and any(key in f[0] for f in self.running[1]):
+            self._stale = True
+        for level, films in enumerate(self.levels):
+            for film in [f for f in films if key in f[0]]:
+                films.remove(film)
+                if level > 0:
+                    self._add_sources(film[0])
+
+    def next_merge(self, final=False):
+        """ Choose films to merge next and mark them as being merged
+        :param bool final: merge all remaining films into one
+        :return None|list: films (keys, path) to merge or None if there's
+        nothing to merge now
+        """
+        if self.running is not None:
+            return None
+        if final:
+            films = [f for films in self.levels for f in films]
+            if len(films) < 2:
+                return None
+            level = len(self.levels) - 1
+            self.levels = [[] for _ in self.levels]
+        elif self.failed:
+            return None
+        else:
+            level = next((i for i, films in enumerate(self.levels)
+                          if len(films) >= self.arity), None)
+            if level is None:
+                return None
+            films = self.levels[level][:self.arity]
+            del self.levels[level][:self.arity]
+        self.running = (level, films)
+        self._stale = False
+        return films
+
+    def merge_name(self):
+        """ Return unique name for a merged film """
+        self.merges += 1
+        return "merged_{}".format(self.merges)
+
+    def merge_finished(self, path):
+        """ Add film created by the running merge
+        :param str path: merged film file
+        """
+        level, films = self.running
+        self.running = None
+        keys = frozenset().union(*[f[0] for f in films])
+        if self._stale:
+            # some results were replaced or removed during the merge
+            self._add_sources(keys)
+            return
+        if level + 1 >= len(self.levels):
+            self.levels.append([])
+        self.levels[level + 1].append((keys, path))
+
+    def merge_failed(self):
+        """ Return films of the failed merge, from now on they will be merged
+        only in the final merge """
+        level, films = self.running
+        self.running = None
+        self.failed = True
+        if self._stale:
+            self._add_sources(frozenset().union(*[f[0] for f in films]))
+            return
+        self.levels[min(level, len(self.levels) - 1)].extend(films)
+
+    def cancel(self):
+        """ Forget about the running merge, eg. when it won't finish """
+        if self.running is not None:
+            self._add_sources(frozenset().union(
+                *[f[0] for f in self.running[1]]))
+            self.running = None
+
+    def result(self):
+        """ Return path of the only film left after merging or None """
+        films = [f for films in self.levels for f in films]
+        if self.running is None and len(films) == 1:
+            return films[0][1]
+        return None
+
+    def _add_sources(self, keys):
+        merged = set().union(*[f[0] for films in self.levels for f in films])
+        for key in keys:
+            if key in self.sources and key not in merged:
+                self.levels[0].append((frozenset([key]), self.sources[key]))
@@ -6,6 +6,8 @@ import random
 import shutil
 
 from collections import OrderedDict
+from threading import Lock
+
 from PIL import Image, ImageChops, ImageOps
 
 from golem.core.common import timeout_to_deadline, get_golem_path, to_unicode
@@ -20,6 +22,7 @@ from apps.core.task.coretaskstate import Options
 from apps.lux.luxenvironment import LuxRenderEnvironment
 from apps.lux.resources.scenefileeditor import regenerate_lux_file
 from apps.lux.resources.scenefilereader import make_scene_analysis
+from apps.lux.task.flmmerger import FlmMergeTree
 from apps.lux.task.verificator import LuxRenderVerificator
 from apps.rendering.resources.imgrepr import load_img, blend
 from apps.rendering.task import renderingtask
@@ -29,6 +32,7 @@ from apps.rendering.task import renderingtaskstate
 logger = logging.getLogger("apps.lux")
 
 MERGE_TIMEOUT = 7200
+FLM_MERGE_ARITY = 4
 
 APP_DIR = os.path.join(get_golem_path(), 'apps', 'lux')
 
@@ -157,11 +161,25 @@ class LuxTask(renderingtask.RenderingTask):
 
         self.preview_exr = None
 
+        self.flm_merges = FlmMergeTree(FLM_MERGE_ARITY)
+        self.flm_merge_lock = Lock()
+        self.flm_merge_computer = None
+        # the final film or image couldn't be generated
+        self.final_merge_failed = False
+
     def __getstate__(self):
         state = super(LuxTask, self).__getstate__()
         state['preview_exr'] = None
+        state['flm_merge_lock'] = None
+        state['flm_merge_computer'] = None
         return state
 
+    def __setstate__(self, state):
+        super(LuxTask, self).__setstate__(state)
+        self.flm_merge_lock = Lock()
+        # merges running when the task was stored won't finish
+        self.__reset_flm_merges()
+
     def initialize(self, dir_manager):
         super(LuxTask, self).initialize(dir_manager)
         self.verificator.test_flm = self.__get_test_flm()
@@ -309,6 +327,15 @@ class LuxTask(renderingtask.RenderingTask):
         ]
         return self.__get_merge_ctd(files)
 
+    def restart(self):
+        super(LuxTask, self).restart()
+        self.final_merge_failed = False
+        self.__reset_flm_merges()
+
+    def verify_task(self):
+        return super(LuxTask, self).verify_task() \
+            and not self.final_merge_failed
+
     def accept_results(self, subtask_id, result_files):
         super(LuxTask, self).accept_results(subtask_id, result_files)
         num_start = self.subtasks_given[subtask_id]['start_task']
@@ -318,7 +345,10 @@ class LuxTask(renderingtask.RenderingTask):
                 self.counting_nodes[
                     self.subtasks_given[subtask_id]['node_id']
                 ].accept()
-                self.num_tasks_received += 1
+                # read by merges finishing in their threads
+                with self.flm_merge_lock:
+                    self.flm_merges.add(num_start, tr_file)
+                    self.num_tasks_received += 1
             elif not has_ext(tr_file, '.log'):
                 self.subtasks_given[subtask_id]['preview_file'] = tr_file
                 self._update_preview(tr_file, num_start)
@@ -329,8 +359,10 @@ class LuxTask(renderingtask.RenderingTask):
                 self.__generate_final_flm_advanced_verification()
             else:
                 self.__generate_final_flm()
+        elif not self.verificator.advanced_verification:
+            self.__merge_flms()
 
-    def __get_merge_ctd(self, files):
+    def __get_merge_ctd(self, files, output_flm=None):
         script_file = dirmanager.find_task_script(
             APP_DIR,
             "docker_luxmerge.py"
@@ -346,7 +378,8 @@ class LuxTask(renderingtask.RenderingTask):
         ctd = ComputeTaskDef()
         ctd.task_id = self.header.task_id
         ctd.subtask_id = self.header.task_id
-        ctd.extra_data = {'output_flm': self.output_file, 'flm_files': files}
+        ctd.extra_data = {'output_flm': output_flm or self.output_file,
+                          'flm_files': files}
         ctd.src_code = src_code
         ctd.working_directory = "."
         ctd.docker_images = self.header.docker_images
@@ -441,8 +474,8 @@ class LuxTask(renderingtask.RenderingTask):
         commonprefix = common_dir(results['data'])
         img = find_file_with_ext(commonprefix, ["." + self.output_format])
         if img is None:
-            # TODO Maybe we should try again?
             logger.error("No final file generated...")
+            self.final_merge_failed = True
         else:
             try:
                 shutil.copy(img, self.output_file + "." + self.output_format)
@@ -453,23 +486,121 @@ class LuxTask(renderingtask.RenderingTask):
 
     def __final_img_error(self, error):
         logger.error("Cannot generate final image: {}".format(error))
-        # TODO What should we do in this situation?
+        self.final_merge_failed = True
 
     def __generate_final_flm(self):
+        """ Merge all films into the final one and generate the output
+        file before returning, so they exist once the task is finished """
         self.collected_file_names = OrderedDict(
             sorted(self.collected_file_names.items())
         )
+        self.final_merge_failed = False
+        self.__wait_for_merges()
+        self.__merge_flms(final=True, wait=True)
+
+    def __wait_for_merges(self):
+        """ Wait until background merges are finished. A finished merge
+        may start the next one, which is waited for as well """
+        while True:
+            with self.flm_merge_lock:
+                computer = self.flm_merge_computer
+            if computer is None:
+                return
+            if computer.tt is not None:
+                computer.tt.join()
+            with self.flm_merge_lock:
+                if self.flm_merge_computer is computer:
+                    self.flm_merge_computer = None
+                    return
+
+    def __reset_flm_merges(self):
+        """ Plan merging of collected films from scratch """
+        with self.flm_merge_lock:
+            self.flm_merges = FlmMergeTree(FLM_MERGE_ARITY)
+            for num_start, flm in sorted(self.collected_file_names.items()):
+                self.flm_merges.add(num_start, flm)
+
+    def __merge_flms(self, final=False, wait=False):
+        """ Start merging the next batch of films in the background. Only
+        one merge runs at a time, the next one is started when it's done
+        until all results are received. The final merge of the films that
+        are left is started only by the last accepted result, after the
+        background merges are finished.
+        :param bool final: merge all remaining films into the final film
+        :param bool wait: wait for the merge, used for the final one
+        """
+        with self.flm_merge_lock:
+            merges = self.flm_merges
+            films = merges.next_merge(final)
+            flm = merges.result() if final and films is None else None
+            if films is not None:
+                output_flm = self.output_file if final \
+                    else os.path.join(self.__get_merge_dir(),
+                                      merges.merge_name())
+
+        if flm is not None:
+            new_flm = self.output_file + ".flm"
+            if os.path.abspath(flm) != os.path.abspath(new_flm):
+                shutil.copy(flm, new_flm)
+            self.__generate_final_file(new_flm)
+        if films is None:
+            return
+
+        files = [path for _, path in films]
+        logger.debug("Merging %r into %r", files, output_flm)
         computer = LocalComputer(
             self,
-            self.root_path,
-            self.__final_flm_ready,
-            self.__final_flm_failure,
-            self.query_extra_data_for_final_flm,
+            self.__get_merge_dir(),
+            lambda results, time_spent: self.__flm_merged(
+                merges, output_flm, final, results, time_spent),
+            lambda error: self.__flm_merge_failure(merges, error, final),
+            lambda: self.__get_merge_ctd(
+                [os.path.basename(f) for f in files], output_flm),
             use_task_resources=False,
-            additional_resources=self.collected_file_names.values()
+            additional_resources=files
         )
+        with self.flm_merge_lock:
+            self.flm_merge_computer = computer
         computer.run()
-        computer.tt.join()
+        if wait and computer.tt is not None:
+            computer.tt.join()
+
+    def __flm_merged(self, merges, output_flm, final, results, time_spent):
+        flm = next((f for f in results['data'] if has_ext(f, ".flm")), None)
+        if flm is None:
+            self.__flm_merge_failure(merges, "No flm file created", final)
+            return
+        with self.flm_merge_lock:
+            if merges is not self.flm_merges:
+                return  # task was restarted in the meantime
+            if not final:
+                shutil.copy(flm, output_flm + ".flm")
+            merges.merge_finished(output_flm + ".flm")
+            merge_next = self.num_tasks_received < self.total_tasks
+        if final:
+            self.__final_flm_ready(results, time_spent)
+        elif merge_next:
+            self.__merge_flms()
+
+    def __flm_merge_failure(self, merges, error, final):
+        with self.flm_merge_lock:
+            if merges is not self.flm_merges:
+                return
+            merges.merge_failed()
+            merge_next = self.num_tasks_received < self.total_tasks
+        if final:
+            self.__final_flm_failure(error)
+        else:
+            logger.warning("Cannot merge flm files, they will be merged "
+                           "at the end: {}".format(error))
+            if merge_next:
+                self.__merge_flms()
+
+    def __get_merge_dir(self):
+        merge_dir = os.path.join(self.tmp_dir, "flm_merge")
+        if not os.path.isdir(merge_dir):
+            os.makedirs(merge_dir)
+        return merge_dir
 
     def __final_flm_ready(self, results, time_spent):
         commonprefix = common_dir(results['data'])
@@ -486,7 +617,8 @@ class LuxTask(renderingtask.RenderingTask):
 
     def __final_flm_failure(self, error):
         logger.error("Cannot generate final flm: {}".format(error))
-        # TODO What should we do in this sitution?
+        self.final_merge_failed = True
+        self.notify_update_task()
 
     def __generate_final_flm_advanced_verification(self):
         # the file containing result of task test
@@ -1,6 +1,8 @@
 import logging
 import math
 
+import numpy
+
 from apps.rendering.resources.imgrepr import (EXRImgRepr, ImgRepr, load_img,
                                               PILImgRepr)
 
@@ -23,7 +25,6 @@ def calculate_psnr(mse, max_=255):
 
 
 def calculate_mse(img1, img2, start1=(0, 0), start2=(0, 0), box=None):
-    mse = 0
     if not isinstance(img1, ImgRepr) or not isinstance(img2, ImgRepr):
         raise TypeError("img1 and img2 must be ImgRepr")
 
@@ -31,18 +32,30 @@ def calculate_mse(img1, img2, start1=(0, 0), start2=(0, 0), box=None):
         (res_x, res_y) = img1.get_size()
     else:
         (res_x, res_y) = box
-    for i in range(0, res_x):
-        for j in range(0, res_y):
-            [r1, g1, b1] = img1.get_pixel((start1[0] + i, start1[1] + j))
-            [r2, g2, b2] = img2.get_pixel((start2[0] + i, start2[1] + j))
-            mse += (r1 - r2) * (r1 - r2) + \
-                   (g1 - g2) * (g1 - g2) + \
-                   (b1 - b2) * (b1 - b2)
-
     if res_x <= 0 or res_y <= 0:
         raise ValueError("Image or box resolution must be greater than 0")
-    mse /= res_x * res_y * 3
-    return mse
+
+    region1 = _get_region(img1, start1, (res_x, res_y))
+    region2 = _get_region(img2, start2, (res_x, res_y))
+    num_values = res_x * res_y * 3
+
+    if region1.dtype.kind in 'iu' and region2.dtype.kind in 'iu':
+        diff = region1.astype(numpy.int64) - region2
+        # Integer division, as for integer pixel values summed one by one
+        return int(numpy.sum(diff * diff)) // num_values
+
+    diff = region1.astype(numpy.float64) - region2
+    return float(numpy.sum(diff * diff)) / num_values
+
+
+def _get_region(img, start, box):
+    (x, y) = start
+    (res_x, res_y) = box
+    (size_x, size_y) = img.get_size()
+    if x < 0 or y < 0 or x + res_x > size_x or y + res_y > size_y:
+        raise ValueError("Box {} starting at {} exceeds image size {}"
+                         .format(box, start, (size_x, size_y)))
+    return img.to_array()[y:y + res_y, x:x + res_x]
 
 
 def compare_imgs(img1, img2, max_col=255, start1=(0, 0),
@@ -4,6 +4,7 @@ import logging
 from copy import deepcopy
 import OpenEXR
 import Imath
+import numpy
 from PIL import Image
 
 logger = logging.getLogger("apps.rendering")
@@ -36,6 +37,12 @@ class ImgRepr(object):
     def to_pil(self):
         return
 
+    def to_array(self):
+        """ Return image pixels as an array of shape (height, width, 3) """
+        (res_x, res_y) = self.get_size()
+        return numpy.array([[self.get_pixel((i, j)) for i in xrange(res_x)]
+                            for j in xrange(res_y)])
+
 
 class PILImgRepr(ImgRepr):
     def __init__(self):
@@ -62,6 +69,9 @@ class PILImgRepr(ImgRepr):
     def to_pil(self):
         return self.img
 
+    def to_array(self):
+        return numpy.asarray(self.img)
+
 
 class EXRImgRepr(ImgRepr):
     def __init__(self):
@@ -117,6 +127,9 @@ class EXRImgRepr(ImgRepr):
         rgb8 = [im.point(normalize_0_255).convert("L") for im in self.rgb]
         return Image.merge("RGB", rgb8)
 
+    def to_array(self):
+        return numpy.dstack([numpy.asarray(c) for c in self.rgb])
+
     def to_l_image(self):
         img = self.to_pil()
         return img.convert('L')
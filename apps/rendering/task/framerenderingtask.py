@@ -90,10 +90,10 @@ class FrameRenderingTask(RenderingTask):
             self._update_task_preview()
 
     @CoreTask.handle_key_error
-    def computation_finished(self, subtask_id, task_result, result_type=0):
-        super(FrameRenderingTask, self).computation_finished(subtask_id,
-                                                             task_result,
-                                                             result_type)
+    def verification_finished(self, subtask_id, ver_state, result_files):
+        super(FrameRenderingTask, self).verification_finished(subtask_id,
+                                                              ver_state,
+                                                              result_files)
         if self.use_frames:
             self._update_subtask_frame_status(subtask_id)
 
@@ -252,31 +252,23 @@ class FrameRenderingTask(RenderingTask):
             return img_offset
 
     def _update_frame_task_preview(self):
-        sent_color = (0, 255, 0)
-        failed_color = (255, 0, 0)
-
+        subtasks = defaultdict(list)
         for sub in self.subtasks_given.values():
-            if SubtaskStatus.is_computed(sub['status']):
-                for frame in sub['frames']:
-                    self.__mark_sub_frame(sub, frame, sent_color)
-
-            if sub['status'] in [SubtaskStatus.failure, SubtaskStatus.restarted]:
-                for frame in sub['frames']:
-                    self.__mark_sub_frame(sub, frame, failed_color)
-
-    def _open_frame_preview(self, preview_file_path):
-
-        if not os.path.exists(preview_file_path):
-            img = Image.new("RGB", (int(round(self.res_x * self.scale_factor)), 
-                                    int(round(self.res_y * self.scale_factor))))
-            img.save(preview_file_path, PREVIEW_EXT)
-
-        return Image.open(preview_file_path)
-
-    def _mark_task_area(self, subtask, img_task, color, frame_index=0):
+            for frame in sub['frames']:
+                subtasks[self.frames.index(frame)].append(sub)
+
+        for idx in range(len(self.frames)):
+            preview_task_file_path = self._get_preview_task_file_path(idx)
+            if idx not in subtasks \
+                    and preview_task_file_path not in self._task_previews:
+                continue
+            areas = self._get_preview_areas(subtasks.get(idx, []), idx)
+            self._get_task_preview(preview_task_file_path).update(
+                areas, self._get_preview_file_path(idx))
+
+    def _get_task_area(self, subtask, frame_index=0):
         if not self.use_frames:
-            RenderingTask._mark_task_area(self, subtask, img_task, color)
-            return
+            return RenderingTask._get_task_area(self, subtask, frame_index)
 
         lower_x = 0
         upper_x = int(round(self.res_x * self.scale_factor))
@@ -288,10 +280,7 @@ class FrameRenderingTask(RenderingTask):
             part_height = self.res_y / parts * self.scale_factor
             upper_y = int(math.ceil(part_height) * ((subtask['start_task'] - 1) % parts))
             lower_y = int(math.floor(part_height) * ((subtask['start_task'] - 1) % parts + 1))
-
-        for i in range(lower_x, upper_x):
-            for j in range(upper_y, lower_y):
-                img_task.putpixel((i, j), color)
+        return lower_x, upper_y, upper_x, lower_y
 
     def _choose_frames(self, frames, start_task, total_tasks):
         if total_tasks <= len(frames):
@@ -362,13 +351,6 @@ class FrameRenderingTask(RenderingTask):
     def __full_frames(self):
         return self.total_tasks <= len(self.frames)
 
-    def __mark_sub_frame(self, sub, frame, color):
-        idx = self.frames.index(frame)
-        preview_task_file_path = self._get_preview_task_file_path(idx)
-        img_task = self._open_frame_preview(preview_task_file_path)
-        self._mark_task_area(sub, img_task, color, idx)
-        img_task.save(preview_task_file_path, PREVIEW_EXT)
-
     def _get_subtask_file_path(self, subtask_dir_list, name_dir, num):
         if subtask_dir_list[num] is None:
             subtask_dir_list[num] = "{}{}.{}".format(os.path.join(self.tmp_dir,
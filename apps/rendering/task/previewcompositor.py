@@ -0,0 +1,115 @@
+import logging
+import os
+import time
+
+from PIL import Image
+
+logger = logging.getLogger("apps.rendering")
+
+
+class PreviewCompositor(object):
+    """ Keeps a task preview in memory: image of the results received so far
+    with areas of some subtasks filled with colors (eg. subtasks being
+    computed or failed). Only areas whose color changed are repainted.
+    The image is written to a file at most once per save_interval or when
+    it's flushed, eg. before the file is shown to the user. """
+
+    PREVIEW_EXT = "PNG"
+
+    save_interval = 2.0
+
+    def __init__(self, path, size):
+        """
+        :param str path: file the preview is saved to
+        :param tuple size: preview width and height
+        """
+        self.path = path
+        self.size = size
+        self.image = None
+        self.areas = dict()  # box (left, upper, right, lower) -> color
+        self.dirty = False
+        self.last_save = 0.0
+
+        self._base = None
+        self._base_stat = None
+
+    def update(self, areas, base_path=None):
+        """ Mark given areas with colors, remove marks from other areas
+        :param dict areas: color of each marked box
+        :param None|str base_path: image with results, areas that are not
+        marked show it; it's read again when the file changes
+        """
+        if self._load_base(base_path):
+            self.image = self._base.copy()
+            self.areas = dict()
+
+        cleared = [box for box in self.areas if box not in areas]
+        for box in cleared:
+            if _is_valid(box):
+                self.image.paste(self._base.crop(box), box)
+            del self.areas[box]
+        for box, color in areas.items():
+            if self.areas.get(box) != color \
+                    or any(_overlap(box, c) for c in cleared):
+                self._fill(box, color)
+                self.areas[box] = color
+                self.dirty = True
+        self.dirty = self.dirty or bool(cleared)
+
+        if time.time() - self.last_save >= self.save_interval:
+            self.flush()
+
+    def flush(self):
+        """ Write the preview to its file if it has changed """
+        if not self.dirty:
+            return
+        try:
+            self.image.save(self.path, self.PREVIEW_EXT)
+        except (IOError, OSError) as err:
+            logger.error("Can't save task preview %s: %s", self.path, err)
+            return
+        self.dirty = False
+        self.last_save = time.time()
+
+    def _fill(self, box, color):
+        if _is_valid(box):
+            self.image.paste(color, box)
+
+    def _load_base(self, base_path):
+        """ Read the base image if it's the first update or the file
+        has changed
+        :return bool: True if the base image was read
+        """
+        try:
+            stat = os.stat(base_path) if base_path else None
+        except OSError:
+            stat = None
+        stat = (stat.st_mtime, stat.st_size) if stat else None
+        if self._base is not None and stat == self._base_stat:
+            return False
+
+        self._base_stat = stat
+        self._base = None
+        if stat:
+            try:
+                img = Image.open(base_path)
+                img.load()
+                if img.size != self.size or img.mode != "RGB":
+                    img = img.convert("RGB").resize(self.size)
+                self._base = img
+            except (IOError, ValueError) as err:
+                logger.warning("Can't read preview %s: %s", base_path, err)
+        if self._base is None:
+            self._base = Image.new("RGB", self.size)
+        self.dirty = True
+        return True
+
+
+def _is_valid(box):
+    left, upper, right, lower = box
+    return right > left and lower > upper
+
+
+def _overlap(box1, box2):
+    return box1[0] < box2[2] and box2[0] < box1[2] \
+        and box1[1] < box2[3] and box2[1] < box1[3]
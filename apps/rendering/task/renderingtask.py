@@ -10,6 +10,7 @@ from pathlib import Path
 
 from apps.core.task.coretask import CoreTask, CoreTaskBuilder
 from apps.rendering.resources.imgrepr import load_as_pil
+from apps.rendering.task.previewcompositor import PreviewCompositor
 from apps.rendering.task.renderingtaskstate import RendererDefaults
 from apps.rendering.task.verificator import RenderingVerificator
 from golem.core.common import get_golem_path, timeout_to_deadline
@@ -24,6 +25,8 @@ SUBTASK_TIMEOUT = 220.0
 PREVIEW_EXT = "PNG"
 PREVIEW_X = 1280
 PREVIEW_Y = 720
+PREVIEW_SENT_COLOR = (0, 255, 0)
+PREVIEW_FAILED_COLOR = (255, 0, 0)
 
 logger = logging.getLogger("apps.rendering")
 
@@ -91,6 +94,7 @@ class RenderingTask(CoreTask):
         self.root_path = root_path
         self.preview_file_path = None
         self.preview_task_file_path = None
+        self._task_previews = {}  # preview_task_file_path -> PreviewCompositor
 
         self.task_resources = deepcopy(list(task_resources))
 
@@ -114,6 +118,15 @@ class RenderingTask(CoreTask):
         self.verificator.total_tasks = self.total_tasks
         self.verificator.root_path = self.root_path
 
+    def __getstate__(self):
+        state = super(RenderingTask, self).__getstate__()
+        state['_task_previews'] = {}
+        return state
+
+    def __setstate__(self, state):
+        super(RenderingTask, self).__setstate__(state)
+        self.__dict__.setdefault('_task_previews', {})
+
     @CoreTask.handle_key_error
     def computation_failed(self, subtask_id):
         CoreTask.computation_failed(self, subtask_id)
@@ -130,6 +143,7 @@ class RenderingTask(CoreTask):
         CoreTask.restart_subtask(self, subtask_id)
 
     def update_task_state(self, task_state):
+        self.flush_previews()
         if not self.finished_computation() and self.preview_task_file_path:
             task_state.extra_data['result_preview'] = self.preview_task_file_path
         elif self.preview_file_path:
@@ -145,6 +159,11 @@ class RenderingTask(CoreTask):
     def get_preview_file_path(self):
         return self.preview_file_path
 
+    def flush_previews(self):
+        """ Write task previews changed since they were last saved """
+        for compositor in self._task_previews.values():
+            compositor.flush()
+
     def _update_preview(self, new_chunk_file_path, num_start):
         img = load_as_pil(new_chunk_file_path)
 
@@ -163,36 +182,60 @@ class RenderingTask(CoreTask):
         img.save(self.preview_file_path, PREVIEW_EXT)
 
     def _update_task_preview(self):
-        sent_color = (0, 255, 0)
-        failed_color = (255, 0, 0)
-
         preview_name = "current_task_preview.{}".format(PREVIEW_EXT)
         preview_task_file_path = "{}".format(os.path.join(self.tmp_dir,
                                                           preview_name))
+        self._open_preview().close()
 
-        img_task = self._open_preview()
-
-        for sub in self.subtasks_given.values():
-            if SubtaskStatus.is_computed(sub['status']):
-                self._mark_task_area(sub, img_task, sent_color)
-            if sub['status'] in [SubtaskStatus.failure,
-                                 SubtaskStatus.restarted]:
-                self._mark_task_area(sub, img_task, failed_color)
-
-        img_task.save(preview_task_file_path, PREVIEW_EXT)
+        areas = self._get_preview_areas(self.subtasks_given.values())
+        self._get_task_preview(preview_task_file_path).update(
+            areas, self.preview_file_path)
         self._update_preview_task_file_path(preview_task_file_path)
 
     def _update_preview_task_file_path(self, preview_task_file_path):
         self.preview_task_file_path = preview_task_file_path
 
-    def _mark_task_area(self, subtask, img_task, color):
+    def _get_task_preview(self, preview_task_file_path):
+        compositor = self._task_previews.get(preview_task_file_path)
+        if compositor is None:
+            size = (int(round(self.res_x * self.scale_factor)),
+                    int(round(self.res_y * self.scale_factor)))
+            compositor = PreviewCompositor(preview_task_file_path, size)
+            self._task_previews[preview_task_file_path] = compositor
+        return compositor
+
+    def _get_preview_areas(self, subtasks, frame_index=0):
+        """ Return areas of subtasks that should be marked on the task
+        preview. Failed subtasks are marked over subtasks being computed.
+        :return dict: color of each marked box
+        """
+        areas = {}
+        for sub in subtasks:
+            if sub['status'] in [SubtaskStatus.failure,
+                                 SubtaskStatus.restarted]:
+                color = PREVIEW_FAILED_COLOR
+            elif SubtaskStatus.is_computed(sub['status']):
+                color = PREVIEW_SENT_COLOR
+            else:
+                continue
+            box = self._get_task_area(sub, frame_index)
+            if areas.get(box) != PREVIEW_FAILED_COLOR:
+                areas[box] = color
+        return areas
+
+    def _get_task_area(self, subtask, frame_index=0):
+        """ Return box (left, upper, right, lower) of the subtask area on
+        the preview """
         x = int(round(self.res_x * self.scale_factor))
         y = int(round(self.res_y * self.scale_factor))
         upper = max(0, int(math.floor(y / self.total_tasks * (subtask['start_task'] - 1))))
         lower = min(int(math.floor(y / self.total_tasks * (subtask['end_task']))), y)
-        for i in range(0, x):
-            for j in range(upper, lower):
-                img_task.putpixel((i, j), color)
+        return 0, upper, x, lower
+
+    def _mark_task_area(self, subtask, img_task, color, frame_index=0):
+        left, upper, right, lower = self._get_task_area(subtask, frame_index)
+        if right > left and lower > upper:
+            img_task.paste(color, (left, upper, right, lower))
 
     def _put_collected_files_together(self, output_file_name, files, arg):
         task_collector_path = self._get_task_collector_path()
@@ -224,13 +267,14 @@ class RenderingTask(CoreTask):
             end_task = self.last_task
             return start_task, end_task
         else:
-            for sub in self.subtasks_given.values():
-                if sub['status'] in [SubtaskStatus.failure, SubtaskStatus.restarted]:
-                    sub['status'] = SubtaskStatus.resent
-                    end_task = sub['end_task']
-                    start_task = sub['start_task']
-                    self.num_failed_subtasks -= 1
-                    return start_task, end_task
+            subtask_id = self._pop_failed_subtask()
+            if subtask_id is not None:
+                sub = self.subtasks_given[subtask_id]
+                sub['status'] = SubtaskStatus.resent
+                end_task = sub['end_task']
+                start_task = sub['start_task']
+                self.num_failed_subtasks -= 1
+                return start_task, end_task
         return None, None
 
     def _get_working_directory(self):
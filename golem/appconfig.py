@@ -41,6 +41,12 @@ PUBLISH_BALANCE_INTERVAL = 3.0
 PUBLISH_TASKS_INTERVAL = 1.0
 NODE_SNAPSHOT_INTERVAL = 10.0
 NETWORK_CHECK_INTERVAL = 10.0
+# intervals of subsystem timers
+P2P_SYNC_INTERVAL = 1.0
+TASKS_SYNC_INTERVAL = 1.0
+RESOURCES_SYNC_INTERVAL = 1.0
+RANKING_SYNC_INTERVAL = 5.0
+PAYMENTS_CHECK_INTERVAL = 30.0
 MAX_SENDING_DELAY = 360
 
 P2P_SESSION_TIMEOUT = 240
@@ -51,6 +57,13 @@ WAITING_FOR_TASK_TIMEOUT = 720  # 36000
 WAITING_FOR_TASK_SESSION_TIMEOUT = 20
 FORWARDED_SESSION_REQUEST_TIMEOUT = 30
 
+# Number of subtask results verified at the same time
+MAX_VERIFICATION_WORKERS = 2
+# Number of subtasks computed at the same time
+MAX_CONCURRENT_SUBTASKS = 1
+# Number of subtasks negotiated and downloaded ahead of computation
+PREFETCH_SUBTASKS = 0
+
 # Default max price per hour -- 5.0 GNT ~ 0.05 USD
 MAX_PRICE = int(5.0 * denoms.ether)
 # Default min price per hour of computation to accept
@@ -166,6 +179,9 @@ class AppConfig:
             node_snapshot_interval=NODE_SNAPSHOT_INTERVAL,
             network_check_interval=NETWORK_CHECK_INTERVAL,
             max_results_sending_delay=MAX_SENDING_DELAY,
+            max_verification_workers=MAX_VERIFICATION_WORKERS,
+            max_concurrent_subtasks=MAX_CONCURRENT_SUBTASKS,
+            prefetch_subtasks=PREFETCH_SUBTASKS,
             # timeouts
             p2p_session_timeout=P2P_SESSION_TIMEOUT,
             task_session_timeout=TASK_SESSION_TIMEOUT,
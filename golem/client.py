@@ -9,24 +9,28 @@ from os import path, makedirs
 from threading import Lock
 
 from pydispatch import dispatcher
-from twisted.internet import task
+from twisted.internet import task, threads
 from twisted.internet.defer import inlineCallbacks, returnValue, gatherResults,\
     Deferred
 
 from golem.appconfig import AppConfig, PUBLISH_BALANCE_INTERVAL, \
-    PUBLISH_TASKS_INTERVAL
+    PUBLISH_TASKS_INTERVAL, P2P_SYNC_INTERVAL, TASKS_SYNC_INTERVAL, \
+    RESOURCES_SYNC_INTERVAL, RANKING_SYNC_INTERVAL, PAYMENTS_CHECK_INTERVAL
 from golem.clientconfigdescriptor import ClientConfigDescriptor, ConfigApprover
 from golem.config.presets import HardwarePresetsMixin
 from golem.core.common import to_unicode
+from golem.core.filehash import file_hasher
 from golem.core.fileshelper import du
 from golem.core.hardware import HardwarePresets
 from golem.core.keysauth import EllipticalKeysAuth
 from golem.core.simpleenv import get_local_datadir
 from golem.core.simpleserializer import DictSerializer
+from golem.core.timers import SubsystemTimers
 from golem.core.variables import APP_VERSION
 from golem.diag.service import DiagnosticsService, DiagnosticsOutputFormat
 from golem.diag.vm import VMDiagnosticsProvider
 from golem.environments.environmentsmanager import EnvironmentsManager
+from golem.http.stream import StreamMonitor
 from golem.manager.nodestatesnapshot import NodeStateSnapshot
 from golem.model import Database, Account
 from golem.monitor.model.nodemetadatamodel import NodeMetadataModel
@@ -55,6 +59,7 @@ from golem.task.tasktester import TaskTester
 from golem.tools import filelock
 from golem.transactions.ethereum.ethereumtransactionsystem import \
     EthereumTransactionSystem
+from gui.controller import memoryhelper
 
 
 log = logging.getLogger("golem.client")
@@ -111,6 +116,7 @@ class Client(HardwarePresetsMixin):
 
         # Initialize database
         self.db = Database(datadir)
+        file_hasher.initialize(datadir)
 
         # Hardware configuration
         HardwarePresets.initialize(self.datadir)
@@ -137,7 +143,14 @@ class Client(HardwarePresetsMixin):
 
         self.nodes_manager_client = None
 
-        self.do_work_task = task.LoopingCall(self.__do_work)
+        self.timers = SubsystemTimers()
+        self.timers.add('p2p', P2P_SYNC_INTERVAL, self.__sync_p2p)
+        self.timers.add('tasks', TASKS_SYNC_INTERVAL, self.__sync_tasks)
+        self.timers.add('resources', RESOURCES_SYNC_INTERVAL,
+                        self.__sync_resources)
+        self.timers.add('ranking', RANKING_SYNC_INTERVAL, self.__sync_ranking)
+        self.timers.add('payments', PAYMENTS_CHECK_INTERVAL,
+                        self.__check_payments)
         self.publish_task = task.LoopingCall(self.__publish_events)
 
         self.cfg = config
@@ -211,18 +224,17 @@ class Client(HardwarePresetsMixin):
             log.critical('Can\'t start network. Giving up.', exc_info=True)
             sys.exit(1)
 
-        self.do_work_task.start(1, False)
+        self.timers.start()
         self.publish_task.start(1, True)
 
     @report_calls(Component.client, 'stop', stage=Stage.post)
     def stop(self):
         self.stop_network()
-        if self.do_work_task.running:
-            self.do_work_task.stop()
+        self.timers.stop()
         if self.publish_task.running:
             self.publish_task.stop()
         if self.task_server:
-            self.task_server.task_computer.quit()
+            self.task_server.quit()
         if self.use_monitor and self.monitor:
             self.stop_monitor()
             self.monitor = None
@@ -262,6 +274,7 @@ class Client(HardwarePresetsMixin):
             self.resource_server = BaseResourceServer(resource_manager,
                                                       dir_manager,
                                                       self.keys_auth, self)
+            self.resource_server.change_config(self.config_desc)
 
         def connect((p2p_port, task_port)):
             log.info('P2P server is listening on port %s', p2p_port)
@@ -315,8 +328,7 @@ class Client(HardwarePresetsMixin):
             self.task_server.disconnect()
 
     def pause(self):
-        if self.do_work_task.running:
-            self.do_work_task.stop()
+        self.timers.stop()
         if self.publish_task.running:
             self.publish_task.stop()
 
@@ -329,8 +341,7 @@ class Client(HardwarePresetsMixin):
             self.task_server.task_computer.quit()
 
     def resume(self):
-        if not self.do_work_task.running:
-            self.do_work_task.start(1, False)
+        self.timers.start()
         if not self.publish_task.running:
             self.publish_task.start(1, True)
 
@@ -384,6 +395,7 @@ class Client(HardwarePresetsMixin):
 
         if self.db:
             self.db.close()
+        file_hasher.save()
         self._unlock_datadir()
 
     def key_changed(self):
@@ -648,6 +660,20 @@ class Client(HardwarePresetsMixin):
             u'subtasks_with_timeout': self.get_timeout_task_count()
         }
 
+    def get_verification_stats(self):
+        scheduler = self.task_server.task_manager.verification_scheduler
+        return scheduler.get_stats()
+
+    def get_tick_stats(self):
+        return self.timers.get_stats()
+
+    def get_header_signature_stats(self):
+        return self.task_server.header_sig_cache.get_stats()
+
+    @staticmethod
+    def get_stream_stats():
+        return StreamMonitor.stats()
+
     def get_supported_task_count(self):
         return len(self.task_server.task_keeper.supported_tasks)
 
@@ -794,6 +820,12 @@ class Client(HardwarePresetsMixin):
             client_options=client_options
         )
 
+    def set_resources_priority(self, task_id, priority):
+        self.resource_server.set_resources_priority(task_id, priority)
+
+    def release_resources(self, task_id):
+        self.resource_server.release_resources(task_id)
+
     def add_resource_peer(self, node_name, addr, port, key_id, node_info):
         self.resource_server.add_resource_peer(
             node_name,
@@ -809,8 +841,21 @@ class Client(HardwarePresetsMixin):
                 u"distributed": self.get_distributed_files_dir()}
 
     def get_res_dirs_sizes(self):
-        return {unicode(name): unicode(du(d))
-                for name, d in self.get_res_dirs().iteritems()}
+        sizes = {unicode(name): unicode(du(d))
+                 for name, d in self.get_res_dirs().iteritems()}
+        if self.resource_server:
+            store = self.resource_server.resource_manager.storage.store
+            stats = store.stats()
+            sizes[u"store"] = unicode(du(store.root_dir))
+            sizes[u"store hit rate"] = u"{:.1%} ({} of {})".format(
+                stats['hit_rate'], stats['hits'],
+                stats['hits'] + stats['misses'])
+            cache = self.resource_server.resource_manager.storage.cache
+            size, index = memoryhelper.dir_size_to_display(
+                cache.memory_usage())
+            sizes[u"resource cache"] = u"{} {}".format(
+                size, memoryhelper.translate_resource_index(index))
+        return sizes
 
     def get_res_dir(self, dir_type):
         if dir_type == DirectoryType.COMPUTED:
@@ -897,9 +942,11 @@ class Client(HardwarePresetsMixin):
 
     def enable_environment(self, env_id):
         self.environments_manager.change_accept_tasks(env_id, True)
+        self.task_server.task_keeper.update_environment(env_id)
 
     def disable_environment(self, env_id):
         self.environments_manager.change_accept_tasks(env_id, False)
+        self.task_server.task_keeper.update_environment(env_id)
 
     def send_gossip(self, gossip, send_to):
         return self.p2pservice.send_gossip(gossip, send_to)
@@ -920,11 +967,16 @@ class Client(HardwarePresetsMixin):
         self.p2pservice.push_local_rank(node_id, loc_rank)
 
     def check_payments(self):
+        """ Check payments and incomes in the database. May be called in
+        a thread, requests for incomes that are still expected are not sent
+        :return list: incomes that are still expected
+        """
         if not self.transaction_system:
-            return
+            return []
         after_deadline_nodes = self.transaction_system.check_payments()
         for node_id in after_deadline_nodes:
             Trust.PAYMENT.decrease(node_id)
+        return self.transaction_system.incomes_keeper.update_expected()
 
     @staticmethod
     def save_task_preset(preset_name, task_type, data):
@@ -984,33 +1036,42 @@ class Client(HardwarePresetsMixin):
             new_value = old_value
         return new_value
 
-    def __do_work(self):
+    # Subsystem ticks run on the reactor thread, work not touching network
+    # sessions is moved to threads
+    def __sync_p2p(self):
         if not self.p2pservice:
             return
-
         if self.config_desc.send_pings:
             self.p2pservice.ping_peers(self.config_desc.pings_interval)
+        self.p2pservice.sync_network()
 
-        try:
-            self.p2pservice.sync_network()
-        except Exception:
-            log.exception("p2pservice.sync_network failed")
-        try:
+    def __sync_tasks(self):
+        if self.p2pservice:
             self.task_server.sync_network()
-        except Exception:
-            log.exception("task_server.sync_network failed")
-        try:
+
+    def __sync_resources(self):
+        if self.p2pservice:
             self.resource_server.sync_network()
-        except Exception:
-            log.exception("resource_server.sync_network failed")
-        try:
-            self.ranking.sync_network()
-        except Exception:
-            log.exception("ranking.sync_network failed")
-        try:
-            self.check_payments()
-        except Exception:
-            log.exception("check_payments failed")
+
+    def __sync_ranking(self):
+        if not self.p2pservice:
+            return
+        loc_ranks = self.collect_neighbours_loc_ranks()
+        if loc_ranks:
+            return threads.deferToThread(self.ranking.sync_network, loc_ranks)
+
+    def __check_payments(self):
+        if self.p2pservice and self.transaction_system:
+            # only the database is accessed in a thread, the task server
+            # is notified about expected incomes on the reactor thread
+            deferred = threads.deferToThread(self.check_payments)
+            deferred.addCallback(self.__payments_checked)
+            return deferred
+
+    def __payments_checked(self, expected_incomes):
+        if self.transaction_system:
+            self.transaction_system.incomes_keeper.notify_expected(
+                expected_incomes)
 
     @inlineCallbacks
     def __publish_events(self):
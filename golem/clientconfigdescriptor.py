@@ -39,6 +39,9 @@ class ClientConfigDescriptor(object):
         self.node_snapshot_interval = 0.0
         self.network_check_interval = 0.0
         self.max_results_sending_delay = 0.0
+        self.max_verification_workers = 0
+        self.max_concurrent_subtasks = 1
+        self.prefetch_subtasks = 0
 
         self.num_cores = 0
         self.max_resource_size = 0
@@ -82,7 +85,8 @@ class ConfigApprover(object):
                        'use_ipv6', 'eth_account', 'accept_tasks', 'node_name']
     to_int_opt = ['seed_port', 'num_cores', 'opt_peer_num', 'waiting_for_task_timeout', 'p2p_session_timeout',
                   'task_session_timeout', 'pings_interval', 'max_results_sending_delay',
-                  'min_price', 'max_price']
+                  'min_price', 'max_price', 'max_verification_workers',
+                  'max_concurrent_subtasks', 'prefetch_subtasks']
     to_float_opt = ['estimated_performance', 'estimated_lux_performance', 'estimated_blender_performance',
                     'getting_peers_interval', 'getting_tasks_interval', 'computing_trust', 'requesting_trust']
 
@@ -0,0 +1,111 @@
+import hmac
+import os
+import struct
+from hashlib import sha256
+
+from Crypto.Cipher import AES
+
+
+class ChannelDecryptionError(RuntimeError):
+    pass
+
+
+class ChannelCipher(object):
+    """ Symmetric cipher protecting one direction of a session.
+
+    Keys are exchanged once per connection (ECIES-protected); every following
+    frame is encrypted with AES-128-CTR and authenticated with HMAC-SHA256,
+    like ECIES payloads are. A 64-bit frame counter is used as the CTR nonce.
+    Frame format:
+
+        0x05 || counter (8 bytes, network order) || ciphertext || tag
+
+    Frames may arrive slightly reordered (eg. file chunks prepared ahead of
+    time), so the receiving side keeps a sliding window of recently seen
+    counters and rejects frames that were already seen or are too old.
+    """
+
+    header = chr(0x05)  # distinct from ECIES header (0x04) and CBOR arrays
+    key_length = 32
+    tag_length = 32
+    counter_size = 8
+    overhead_length = 1 + counter_size + tag_length
+    replay_window = 64
+
+    def __init__(self, key):
+        """
+        :param str key: raw channel key (key_length bytes)
+        """
+        if len(key) != self.key_length:
+            raise ValueError("Invalid key length: {}".format(len(key)))
+        self.key = key
+        self.key_enc = key[:16]
+        self.key_mac = sha256(key[16:]).digest()
+        self.counter = 0  # next counter to use for encryption
+        self.max_counter = -1  # highest counter successfully decrypted
+        self.seen_mask = 0  # bit k is set if max_counter - k has been seen
+
+    @classmethod
+    def gen_key(cls):
+        return os.urandom(cls.key_length)
+
+    @classmethod
+    def is_channel_frame(cls, data):
+        return len(data) >= cls.overhead_length and data[0] == cls.header
+
+    def encrypt(self, data):
+        """ Encrypt data and advance the frame counter
+        :param str data: data to encrypt
+        :return str: channel frame
+        """
+        counter = struct.pack("!Q", self.counter)
+        self.counter += 1
+
+        cipher = AES.new(self.key_enc, AES.MODE_CTR, nonce=counter,
+                         initial_value=0)
+        msg = self.header + counter + cipher.encrypt(data)
+        return msg + self._tag(msg)
+
+    def decrypt(self, data):
+        """ Verify and decrypt a channel frame
+        :param str data: channel frame
+        :return str: decrypted data
+        :raise ChannelDecryptionError: if frame is malformed, was tampered
+        with or replayed
+        """
+        if not self.is_channel_frame(data):
+            raise ChannelDecryptionError("Wrong channel header")
+
+        msg, tag = data[:-self.tag_length], data[-self.tag_length:]
+        if not hmac.compare_digest(self._tag(msg), tag):
+            raise ChannelDecryptionError("Fail to verify data")
+
+        counter = msg[1:1 + self.counter_size]
+        (num,) = struct.unpack("!Q", counter)
+        if not self._is_fresh(num):
+            raise ChannelDecryptionError("Replayed frame {}".format(num))
+        self._mark_seen(num)
+
+        cipher = AES.new(self.key_enc, AES.MODE_CTR, nonce=counter,
+                         initial_value=0)
+        return cipher.decrypt(msg[1 + self.counter_size:])
+
+    def _tag(self, msg):
+        return hmac.new(self.key_mac, msg, sha256).digest()
+
+    def _is_fresh(self, num):
+        if num > self.max_counter:
+            return True
+        offset = self.max_counter - num
+        if offset >= self.replay_window:
+            return False
+        return not self.seen_mask & (1 << offset)
+
+    def _mark_seen(self, num):
+        if num > self.max_counter:
+            shift = num - self.max_counter
+            mask = (self.seen_mask << shift) | 1
+            self.seen_mask = mask & ((1 << self.replay_window) - 1)
+            self.max_counter = num
+        else:
+            self.seen_mask |= 1 << (self.max_counter - num)
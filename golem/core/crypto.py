@@ -257,18 +257,30 @@ from secp256k1 import lib
 ctx = lib.secp256k1_context_create(ALL_FLAGS)
 
 
+class ECDSAVerifier(object):
+    """ Public key parsed once and reused to verify many ECDSA signatures """
+
+    def __init__(self, pubkey):
+        assert len(pubkey) == 64
+        self.raw_pubkey = pubkey
+        self.pk = PublicKey('\04' + pubkey, raw=True, ctx=ctx)
+
+    def verify(self, signature, message):
+        assert len(signature) == 65
+        pk = self.pk
+        return pk.ecdsa_verify(
+            message,
+            pk.ecdsa_recoverable_convert(
+                pk.ecdsa_recoverable_deserialize(
+                    signature[:64],
+                    ord(signature[64]))),
+            raw=True
+        )
+
+
 def ecdsa_verify(pubkey, signature, message):
     assert len(signature) == 65
-    assert len(pubkey) == 64
-    pk = PublicKey('\04' + pubkey, raw=True, ctx=ctx)
-    return pk.ecdsa_verify(
-        message,
-        pk.ecdsa_recoverable_convert(
-            pk.ecdsa_recoverable_deserialize(
-                signature[:64],
-                ord(signature[64]))),
-        raw=True
-    )
+    return ECDSAVerifier(pubkey).verify(signature, message)
 verify = ecdsa_verify
 
 
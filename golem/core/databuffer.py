@@ -6,10 +6,25 @@ MAX_BUFFER_SIZE = 2 * 1024 * 1024
 
 
 class DataBuffer:
-    """ Data buffer that helps with network communication. """
+    """ Data buffer that helps with network communication.
+
+    Data is kept in a single bytearray together with a read offset. Reads
+    only move the offset forward; consumed bytes are discarded lazily, once
+    they make up at least a half of the underlying array. Thus appending and
+    reading length-prefixed messages costs time linear in the size of the
+    data, regardless of how many messages arrive in a single batch.
+    """
     def __init__(self):
         """ Create new data buffer """
-        self.buffered_data = ""
+        self._data = bytearray()
+        self._offset = 0
+
+    @property
+    def buffered_data(self):
+        """ Return unread data as a string. Doesn't change the buffer.
+        :return str: data that was not read from the buffer yet
+        """
+        return self._slice(self._offset, len(self._data))
 
     def append_ulong(self, num):
         """
@@ -19,7 +34,7 @@ class DataBuffer:
         if num < 0:
             raise AttributeError("num must be grater than 0")
         str_num_rep = struct.pack("!L", num)
-        self.buffered_data = "".join([self.buffered_data, str_num_rep])
+        self._append(str_num_rep)
         return str_num_rep
 
     def append_string(self, data, check_size=True, overflow_prefix=None):
@@ -30,24 +45,26 @@ class DataBuffer:
         """
         new_size = self.data_size() + len(data)
         if check_size and new_size > MAX_BUFFER_SIZE:
-            self.buffered_data = "".join([overflow_prefix or '', data])
+            self._data = bytearray(overflow_prefix or '')
+            self._data += data
+            self._offset = 0
         else:
-            self.buffered_data = "".join([self.buffered_data, data])
+            self._append(data)
 
     def data_size(self):
         """ Return size of data in buffer
         :return int: size of data in buffer
         """
-        return len(self.buffered_data)
+        return len(self._data) - self._offset
 
     def peek_ulong(self):
         """ Check long number that is located at the beginning of this data buffer
         :return long: number at the beginning of the buffer
         """
-        if len(self.buffered_data) < LONG_STANDARD_SIZE:
+        if self.data_size() < LONG_STANDARD_SIZE:
             raise ValueError("buffer_data is shorter than {}".format(LONG_STANDARD_SIZE))
 
-        (ret_val,) = struct.unpack("!L", self.buffered_data[0:LONG_STANDARD_SIZE])
+        (ret_val,) = struct.unpack_from("!L", self._data, self._offset)
         return ret_val
 
     def read_ulong(self):
@@ -55,7 +72,7 @@ class DataBuffer:
         :return long: long number removed from the beginning of buffer
         """
         val_ = self.peek_ulong()
-        self.buffered_data = self.buffered_data[4:]
+        self._consume(LONG_STANDARD_SIZE)
 
         return val_
 
@@ -64,11 +81,10 @@ class DataBuffer:
         :param long num_chars: how many chars should be read from buffer
         :return str: first <num_chars> chars from buffer
         """
-        if num_chars > len(self.buffered_data):
+        if num_chars > self.data_size():
             raise AttributeError("num_chars is grater than buffer length")
 
-        ret_str = self.buffered_data[:num_chars]
-        return ret_str
+        return self._slice(self._offset, self._offset + num_chars)
 
     def read_string(self, num_chars):
         """ Remove first <num_chars> chars from buffer and return them.
@@ -76,7 +92,7 @@ class DataBuffer:
         :return str: string removed form buffer
         """
         val_ = self.peek_string(num_chars)
-        self.buffered_data = self.buffered_data[num_chars:]
+        self._consume(num_chars)
 
         return val_
 
@@ -85,7 +101,7 @@ class DataBuffer:
         :return str: all data that was in the buffer.
         """
         ret_data = self.buffered_data
-        self.buffered_data = ""
+        self.clear_buffer()
 
         return ret_data
 
@@ -95,8 +111,7 @@ class DataBuffer:
         """
         ret_str = None
 
-        if (self.data_size() > LONG_STANDARD_SIZE and
-                self.data_size() >= (self.peek_ulong() + LONG_STANDARD_SIZE)):
+        if self._has_len_prefixed_string():
             num_chars = self.read_ulong()
             ret_str = self.read_string(num_chars)
 
@@ -104,8 +119,7 @@ class DataBuffer:
 
     def get_len_prefixed_string(self):
         """Generator function that return from buffer strings preceded with their length (long) """
-        while (self.data_size() > LONG_STANDARD_SIZE and
-               self.data_size() >= (self.peek_ulong() + LONG_STANDARD_SIZE)):
+        while self._has_len_prefixed_string():
             num_chars = self.read_ulong()
             yield self.read_string(num_chars)
 
@@ -118,4 +132,27 @@ class DataBuffer:
 
     def clear_buffer(self):
         """ Remove all data from the buffer """
-        self.buffered_data = ""
+        self._data = bytearray()
+        self._offset = 0
+
+    def _has_len_prefixed_string(self):
+        size = self.data_size()
+        return (size > LONG_STANDARD_SIZE and
+                size >= self.peek_ulong() + LONG_STANDARD_SIZE)
+
+    def _append(self, data):
+        # Discard consumed bytes before the array grows any further
+        if self._offset and self._offset * 2 >= len(self._data):
+            del self._data[:self._offset]
+            self._offset = 0
+        self._data += data
+
+    def _consume(self, num_chars):
+        self._offset += num_chars
+        if self._offset == len(self._data):
+            self.clear_buffer()
+
+    def _slice(self, start, end):
+        # Slicing a memoryview avoids an intermediate bytearray copy. The view
+        # is a temporary, so it doesn't block resizing the array later on
+        return memoryview(self._data)[start:end].tobytes()
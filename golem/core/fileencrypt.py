@@ -82,52 +82,116 @@ class AESFileEncryptor(FileEncryptor):
     @classmethod
     def encrypt(cls, file_in, file_out, secret, key_len=32):
 
+        with FileHelper(file_in, 'rb') as src, FileHelper(file_out, 'wb') as dst:
+
+            writer = cls.encrypting_writer(dst, secret, key_len)
+            chunk = src.read(cls.chunk_size * cls.block_size)
+            while chunk:
+                writer.write(chunk)
+                chunk = src.read(cls.chunk_size * cls.block_size)
+            writer.close()
+
+    @classmethod
+    def decrypt(cls, file_in, file_out, secret, key_len=32):
+
+        with FileHelper(file_in, 'rb') as src, FileHelper(file_out, 'wb') as dst:
+
+            reader = cls.decrypting_reader(src, secret, key_len)
+            chunk = reader.read(cls.chunk_size * cls.block_size)
+            while chunk:
+                dst.write(chunk)
+                chunk = reader.read(cls.chunk_size * cls.block_size)
+
+    @classmethod
+    def encrypting_writer(cls, dst, secret, key_len=32):
+        """ Write salt to a file object and return a writer which encrypts
+        data written to it, in the format of encrypt """
         block_size = cls.block_size
         salt = cls.gen_salt(block_size)
         key, iv = cls.get_key_and_iv(secret, salt, key_len, block_size)
-        cipher = AES.new(key, cls.aes_mode, iv)
 
-        with FileHelper(file_in, 'rb') as src, FileHelper(file_out, 'wb') as dst:
+        dst.write(cls.salt_prefix + salt)
+        return AESEncryptingWriter(dst, AES.new(key, cls.aes_mode, iv))
 
-            dst.write(cls.salt_prefix + salt)
-
-            working = True
-            while working:
+    @classmethod
+    def decrypting_reader(cls, src, secret, key_len=32):
+        """ Read salt from a file object and return a reader which decrypts
+        data encrypted with encrypt or encrypting_writer """
+        block_size = cls.block_size
+        salt = src.read(block_size)[cls.salt_prefix_len:]
+        key, iv = cls.get_key_and_iv(secret, salt, key_len, block_size)
 
-                chunk = src.read(cls.chunk_size * block_size)
-                chunk_len = len(chunk)
-                chunk_len_mod = chunk_len % block_size
+        return AESDecryptingReader(src, AES.new(key, cls.aes_mode, iv),
+                                   cls.chunk_size * block_size)
 
-                if chunk_len == 0 or chunk_len_mod != 0:
-                    pad_len = (block_size - chunk_len_mod) or block_size
-                    chunk += pad_len * chr(pad_len)
-                    working = False
 
-                dst.write(cipher.encrypt(chunk))
+class AESEncryptingWriter(object):
+    """ Encrypts data written to it in whole blocks and writes it to
+    a file object. Pads the last block on close """
 
-    @classmethod
-    def decrypt(cls, file_in, file_out, secret, key_len=32):
+    block_size = AES.block_size
 
-        block_size = cls.block_size
+    def __init__(self, dst, cipher):
+        self.dst = dst
+        self._cipher = cipher
+        self._buffer = str()
 
-        with FileHelper(file_in, 'rb') as src, FileHelper(file_out, 'wb') as dst:
+    def write(self, data):
+        if self._buffer:
+            data = self._buffer + data
+        length = len(data) - len(data) % self.block_size
+        if length:
+            self.dst.write(self._cipher.encrypt(data[:length]))
+        self._buffer = data[length:]
 
-            block = src.read(block_size)
-            salt = block[cls.salt_prefix_len:]
+    def close(self):
+        """ Write the padded last block, the file object is not closed """
+        pad_len = self.block_size - len(self._buffer)
+        self.dst.write(self._cipher.encrypt(self._buffer +
+                                            pad_len * chr(pad_len)))
+        self._buffer = str()
 
-            key, iv = cls.get_key_and_iv(secret, salt, key_len, block_size)
-            cipher = AES.new(key, cls.aes_mode, iv)
 
-            working = True
-            next_chunk = str()
-            while working:
+class AESDecryptingReader(object):
+    """ Reads and decrypts data from a file object, removing the padding.
+    The last decrypted block is held back until the end of the file, when
+    the padding is known """
 
-                chunk = next_chunk
-                next_chunk = cipher.decrypt(src.read(cls.chunk_size *
-                                                     block_size))
-                if len(next_chunk) == 0:
-                    pad_len = ord(chunk[-1])
-                    chunk = chunk[:-pad_len]
-                    working = False
+    block_size = AES.block_size
 
-                dst.write(chunk)
+    def __init__(self, src, cipher, chunk_size):
+        self.src = src
+        self._cipher = cipher
+        self._chunk_size = chunk_size
+        self._buffer = str()
+        self._last_block = str()
+        self._eof = False
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+
+        while not self._eof and (size < 0 or length < size):
+            chunk = self._read_chunk()
+            chunks.append(chunk)
+            length += len(chunk)
+
+        data = str().join(chunks)
+        if size < 0:
+            self._buffer = str()
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    def _read_chunk(self):
+        chunk = self.src.read(self._chunk_size)
+        if chunk:
+            chunk = self._last_block + self._cipher.decrypt(chunk)
+            self._last_block = chunk[-self.block_size:]
+            return chunk[:-self.block_size]
+
+        self._eof = True
+        if self._last_block:
+            pad_len = ord(self._last_block[-1])
+            return self._last_block[:-pad_len]
+        return str()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+
+class FileHasher(object):
+    """ Computes file digests reading files in large blocks and remembers
+    them in an index keyed by path, inode, size and modification time, so
+    unchanged files are not read again. The index may be persisted in
+    a JSON file. It keeps at most max_entries of the most recently used
+    digests, entries of files that no longer exist are dropped when the index
+    is loaded. """
+
+    INDEX_FILE_NAME = 'file_hashes.json'
+
+    block_size = 2 ** 20
+    # Files modified this recently may change again within the mtime
+    # resolution without changing their metadata, don't remember them
+    min_age = 2.0
+
+    def __init__(self, index_path=None, workers=4, max_entries=100000):
+        """
+        :param None|str index_path: file to load the index from and to save
+        it to; index is kept in memory only if None
+        :param int workers: number of threads used to hash several files
+        :param int max_entries: maximum number of remembered digests
+        """
+        self.index_path = index_path
+        self.workers = workers
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._index = OrderedDict()  # least recently used first
+        self._dirty = False
+        self._lock = Lock()
+        self._pool = None
+        if index_path:
+            self.load()
+
+    def initialize(self, datadir):
+        """ Load and persist the index in given directory """
+        self.index_path = os.path.join(datadir, self.INDEX_FILE_NAME)
+        self.load()
+
+    def digest(self, path, algorithm='sha1'):
+        """ Return digest of a file
+        :param str path: file path
+        :param str algorithm: name of a hashlib algorithm
+        :return str: binary digest
+        """
+        key = (os.path.abspath(path), algorithm)
+        stat = os.stat(path)
+        meta = [stat.st_ino, stat.st_size, stat.st_mtime]
+
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry and entry[0] == meta:
+                self._index[key] = entry
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        digest = self._compute(path, algorithm)
+
+        if time.time() - stat.st_mtime >= self.min_age:
+            with self._lock:
+                self._index.pop(key, None)
+                self._index[key] = (meta, digest)
+                self._evict()
+                self._dirty = True
+        return digest
+
+    def digests(self, paths, algorithm='sha1'):
+        """ Return digests of many files, hashing them in parallel. Index is
+        saved afterwards.
+        :param list paths: file paths
+        :param str algorithm: name of a hashlib algorithm
+        :return list: binary digests in the same order as paths
+        """
+        if len(paths) > 1 and self.workers > 1:
+            result = self._get_pool().map(
+                lambda path: self.digest(path, algorithm), paths)
+        else:
+            result = [self.digest(path, algorithm) for path in paths]
+        self.save()
+        return result
+
+    def load(self):
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                entries = json.load(f)
+            index = OrderedDict(
+                ((path, algorithm), (meta, digest.decode('hex')))
+                for path, algorithm, meta, digest in entries
+                if os.path.isfile(path)
+            )
+        except Exception as exc:
+            logger.warning("Cannot load file hash index %r: %r",
+                           self.index_path, exc)
+            return
+        with self._lock:
+            self._dirty = self._dirty or len(index) < len(entries)
+            for key, entry in index.iteritems():
+                self._index.pop(key, None)
+                self._index[key] = entry
+            self._evict()
+
+    def save(self):
+        """ Write index to disk if it has changed """
+        if not self.index_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [
+                [path, algorithm, meta, digest.encode('hex')]
+                for (path, algorithm), (meta, digest)
+                in self._index.iteritems()
+            ]
+            self._dirty = False
+
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f)
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            os.rename(tmp_path, self.index_path)
+        except Exception as exc:
+            logger.warning("Cannot save file hash index %r: %r",
+                           self.index_path, exc)
+
+    def clear(self):
+        with self._lock:
+            self._index.clear()
+            self._dirty = True
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            return {'size': len(self._index), 'hits': self.hits,
+                    'misses': self.misses}
+
+    def _evict(self):
+        while len(self._index) > self.max_entries:
+            self._index.popitem(last=False)
+            self._dirty = True
+
+    def _compute(self, path, algorithm):
+        # hashlib releases the GIL while hashing large blocks
+        hsh = hashlib.new(algorithm)
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(self.block_size)
+                if not data:
+                    break
+                hsh.update(data)
+        return hsh.digest()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.workers)
+            return self._pool
+
+
+# Index shared by all file hashing helpers
+file_hasher = FileHasher()
@@ -0,0 +1,171 @@
+import logging
+import os
+import pickle
+import struct
+import zlib
+
+from golem.core.common import is_windows
+
+logger = logging.getLogger(__name__)
+
+
+class Journal(object):
+    """ Append-only file of key-value records. Storing a value appends
+    a single record instead of rewriting the whole state, the most recent
+    record of a key wins when the journal is loaded. The file is compacted,
+    ie. rewritten with live records only, when it grows much larger than
+    its live records. A record torn by a crash is detected with a checksum
+    and dropped together with everything written after it. """
+
+    PUT = 1
+    DELETE = 2
+
+    # operation, key length, value length, crc32 of key and value
+    header = struct.Struct('<BHII')
+
+    def __init__(self, path, compact_ratio=2.0, min_compact_size=2 ** 20):
+        """
+        :param str path: journal file path, created on first write
+        :param float compact_ratio: compact the file when it is that many
+        times bigger than its live records
+        :param int min_compact_size: don't compact files smaller than that
+        """
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact_size = min_compact_size
+        self.size = 0
+        self.live_size = 0
+
+        self._records = dict()  # key -> (offset, size) of its last record
+        self._file = None
+
+    def load(self):
+        """ Read the journal file
+        :return dict: last stored value of each key that wasn't deleted;
+        values that can't be unpickled are logged and skipped
+        """
+        self.close()
+        self._records = dict()
+        self.size = self.live_size = 0
+        if not os.path.exists(self.path):
+            return dict()
+
+        with open(self.path, 'rb') as f:
+            while True:
+                record = self._read_record(f)
+                if record is None:
+                    break
+                op, key, _, size = record
+                if op == self.PUT:
+                    self._set_record(key, self.size, size)
+                else:
+                    self._del_record(key)
+                self.size += size
+
+            values = dict()
+            for key, (offset, _) in self._records.items():
+                f.seek(offset)
+                _, _, data, _ = self._read_record(f)
+                try:
+                    values[key] = pickle.loads(data)
+                except Exception:
+                    logger.exception("Cannot restore %r from journal %s",
+                                     key, self.path)
+                    self._del_record(key)
+
+        if os.path.getsize(self.path) > self.size:
+            logger.warning("Dropping incomplete records from journal %s",
+                           self.path)
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.size)
+        self._compact_if_needed()
+        return values
+
+    def put(self, key, value):
+        """ Append a record with new value of the key """
+        data = pickle.dumps(value, protocol=2)
+        size = self._append(self.PUT, key, data)
+        self._set_record(key, self.size - size, size)
+
+    def delete(self, key):
+        """ Append a record removing the key """
+        if key in self._records:
+            self._append(self.DELETE, key, b'')
+            self._del_record(key)
+
+    def flush(self, sync=False):
+        """ Write appended records to the file
+        :param bool sync: make sure the records are on disk, not only in
+        the system buffers
+        """
+        if self._file:
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+        self._compact_if_needed()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def compact(self):
+        """ Rewrite the file keeping only the last record of each key """
+        self.close()
+        tmp_path = self.path + '.tmp'
+        records = dict()
+        offset = 0
+        with open(self.path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for key, (old_offset, size) in self._records.items():
+                src.seek(old_offset)
+                dst.write(src.read(size))
+                records[key] = (offset, size)
+                offset += size
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        if is_windows():
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
+        self._records = records
+        self.size = self.live_size = offset
+
+    def _compact_if_needed(self):
+        if self.size > max(self.min_compact_size,
+                           self.compact_ratio * self.live_size):
+            logger.debug("Compacting journal %s", self.path)
+            self.compact()
+
+    def _append(self, op, key, data):
+        key_data = key.encode('utf-8')
+        record = self.header.pack(op, len(key_data), len(data),
+                                  zlib.crc32(key_data + data) & 0xffffffff)
+        record += key_data + data
+        if not self._file:
+            self._file = open(self.path, 'ab')
+        self._file.write(record)
+        self.size += len(record)
+        return len(record)
+
+    def _set_record(self, key, offset, size):
+        self._del_record(key)
+        self._records[key] = (offset, size)
+        self.live_size += size
+
+    def _del_record(self, key):
+        _, size = self._records.pop(key, (None, 0))
+        self.live_size -= size
+
+    def _read_record(self, f):
+        header = f.read(self.header.size)
+        if len(header) < self.header.size:
+            return None
+        op, key_len, data_len, crc = self.header.unpack(header)
+        payload = f.read(key_len + data_len)
+        if op not in (self.PUT, self.DELETE) \
+                or len(payload) < key_len + data_len \
+                or zlib.crc32(payload) & 0xffffffff != crc:
+            return None
+        key = payload[:key_len].decode('utf-8')
+        size = self.header.size + key_len + data_len
+        return op, key, payload[key_len:], size
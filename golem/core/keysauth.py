@@ -1,7 +1,9 @@
 import abc
 import logging
 import os
+from collections import OrderedDict
 from hashlib import sha256
+from threading import Lock
 from _pysha3 import sha3_256, keccak_256
 
 import bitcoin
@@ -10,7 +12,7 @@ from Crypto.Signature.pkcs1_15 import PKCS115_SigScheme
 from Crypto.Hash import SHA256
 from Crypto.Cipher import PKCS1_OAEP
 from abc import abstractmethod
-from crypto import ECCx
+from crypto import ECCx, ECDSAVerifier
 from golem.core.variables import PRIVATE_KEY, PUBLIC_KEY
 from simpleenv import get_local_datadir
 from simplehash import SimpleHash
@@ -390,6 +392,56 @@ class RSAKeysAuth(KeysAuth):
             f.write(public_key.exportKey())
 
 
+class VerifierCache(object):
+    """ Bounded LRU cache of ECDSA verifiers keyed by raw public key. Parsing
+    a public key is much more expensive than verifying a signature with an
+    already parsed one, and most messages come from a small set of peers. """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._verifiers = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, raw_pubkey):
+        """ Return verifier for given public key, create it if necessary
+        :param str raw_pubkey: public key in digest (len == 64)
+        :return ECDSAVerifier:
+        """
+        with self._lock:
+            verifier = self._verifiers.pop(raw_pubkey, None)
+            if verifier is not None:
+                self.hits += 1
+                self._verifiers[raw_pubkey] = verifier
+                return verifier
+            self.misses += 1
+
+        verifier = ECDSAVerifier(raw_pubkey)
+        with self._lock:
+            self._verifiers[raw_pubkey] = verifier
+            while len(self._verifiers) > self.max_size:
+                self._verifiers.popitem(last=False)
+        return verifier
+
+    def get_stats(self):
+        """ Return cache size, hits and misses
+        :return dict:
+        """
+        with self._lock:
+            return {'size': len(self._verifiers), 'hits': self.hits,
+                    'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._verifiers.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._verifiers)
+
+
 class EllipticalKeysAuth(KeysAuth):
     """Elliptical curves cryptographic authorization manager. Create and keeps private and public keys based on ECC
     (curve secp256k1)."""
@@ -400,6 +452,8 @@ class EllipticalKeysAuth(KeysAuth):
         :param uuid|None uuid: application identifier (to read keys)
         """
         KeysAuth.__init__(self, datadir, private_key_name, public_key_name)
+        # Shared by all servers using this keys auth manager
+        self.verifier_cache = VerifierCache()
         try:
             self.ecc = ECCx(None, self._private_key)
         except AssertionError:
@@ -459,8 +513,8 @@ class EllipticalKeysAuth(KeysAuth):
                 public_key = self.public_key
             if len(public_key) == 128:
                 public_key = public_key.decode('hex')
-            ecc = ECCx(public_key)
-            return ecc.verify(sig, sha3(data))
+            verifier = self.verifier_cache.get(public_key)
+            return verifier.verify(sig, sha3(data))
         except AssertionError:
             logger.info("Wrong key format")
         except Exception as exc:
@@ -1,6 +1,8 @@
 import hashlib
 import base64
 
+from golem.core.filehash import file_hasher
+
 
 class SimpleHash(object):
     """ Hash methods wrapper meta-class """
@@ -48,19 +50,22 @@ class SimpleHash(object):
         return cls.base64_encode(cls.hash(data))
 
     @classmethod
-    def hash_file_base64(cls, filename, block_size=2 ** 20):
-        """Return sha1 of data from given file encoded with base64
+    def hash_file_base64(cls, filename, block_size=None):
+        """Return sha1 of data from given file encoded with base64. Digests of
+        unchanged files are remembered by golem.core.filehash.file_hasher.
         :param str filename: name of a file that should be read
-        :param int block_size: *Default: 2**20* data will be read from file in chunks of this size
+        :param None|int block_size: *Default: None* ignored, file hasher's
+        block size is used
         :return str: base64 encoded sha1 of data from file <filename>
         """
-        with open(filename, "r") as f:
-            sha = hashlib.sha1()
-
-            while True:
-                data = f.read(block_size)
-                if not data:
-                    break
-                sha.update(data)
+        return cls.base64_encode(file_hasher.digest(filename, 'sha1'))
 
-            return cls.base64_encode(sha.digest())
+    @classmethod
+    def hash_files_base64(cls, filenames):
+        """Return sha1 of data from given files encoded with base64. Files
+        are hashed in parallel.
+        :param list filenames: names of files that should be read
+        :return list: base64 encoded sha1 of data from each file
+        """
+        return [cls.base64_encode(digest)
+                for digest in file_hasher.digests(filenames, 'sha1')]
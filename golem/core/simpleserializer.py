@@ -3,10 +3,12 @@ import inspect
 import logging
 import sys
 import types
+from io import BytesIO
 
 import cbor2
 import jsonpickle
 import pytz
+from cbor2.encoder import encode_length, shareable_encoder
 
 from golem.core.common import to_unicode
 
@@ -139,6 +141,43 @@ class CBORCoder(DictCoder):
         return obj
 
 
+# Encoded map keys, most of them are repeated message / attribute names
+_canonical_keys = dict()
+_canonical_keys_max = 4096
+
+
+def _encode_canonical_key(encoder, key):
+    cache_key = (key.__class__, key)
+    try:
+        return _canonical_keys[cache_key]
+    except (KeyError, TypeError):
+        pass
+
+    buf = BytesIO()
+    encoder.encode(key, buf)
+    encoded = buf.getvalue()
+    if isinstance(key, basestring):
+        if len(_canonical_keys) >= _canonical_keys_max:
+            _canonical_keys.clear()
+        _canonical_keys[cache_key] = encoded
+    return encoded
+
+
+@shareable_encoder
+def encode_canonical_map(encoder, value, fp):
+    """ Encode map with keys in canonical CBOR order (RFC 7049, 3.9):
+    shorter encoded keys go first, keys of equal length are sorted bytewise
+    """
+    items = [(_encode_canonical_key(encoder, k), v)
+             for k, v in value.iteritems()]
+    items.sort(key=lambda item: (len(item[0]), item[0]))
+
+    fp.write(encode_length(0xa0, len(items)))
+    for key, v in items:
+        fp.write(key)
+        encoder.encode(v, fp)
+
+
 class SimpleSerializer(object):
     """ Simple meta-class that serialize and deserialize objects to a json format"""
     @classmethod
@@ -183,6 +222,22 @@ class DictSerializer(object):
         return DictCoder.from_dict(dictionary, as_class=as_class)
 
 
+class CanonicalCBOREncoder(cbor2.CBOREncoder):
+    """ CBOR encoder producing deterministic output. Encoder table is built
+    once instead of being copied for every encoded object. """
+
+    default_encoders = cbor2.CBOREncoder.default_encoders.copy()
+    default_encoders.update([
+        (dict, encode_canonical_map),
+        (collections.Mapping, encode_canonical_map),
+        (object, CBORCoder.encode),
+    ])
+
+    def __init__(self):
+        super(CanonicalCBOREncoder, self).__init__(datetime_as_timestamp=True, timezone=pytz.utc,
+                                                   value_sharing=False)
+
+
 class CBORSerializer(object):
     """ Serialize and deserialize objects to and from CBOR"""
     decoders = dict()
@@ -193,6 +248,39 @@ class CBORSerializer(object):
     def loads(cls, payload):
         return cbor2.loads(payload, semantic_decoders=cls.decoders)
 
+    @classmethod
+    def loads_items(cls, payload):
+        """ Deserialize CBOR array and keep raw encodings of its items
+        :param str payload: serialized array
+        :return list: (item, raw item encoding) pairs
+        :raise ValueError: if payload is not a definite-length array
+        """
+        initial_byte = ord(payload[0]) if payload else None
+        if initial_byte is None or initial_byte >> 5 != 4 or initial_byte & 31 == 31:
+            raise ValueError("Not a definite-length CBOR array")
+
+        fp = BytesIO(payload)
+        fp.seek(1)
+        decoder = cbor2.CBORDecoder(semantic_decoders=cls.decoders)
+        length = decoder.decode_uint(initial_byte & 31, fp)
+
+        result = []
+        for _ in xrange(length):
+            start = fp.tell()
+            item = decoder.decode(fp)
+            result.append((item, payload[start:fp.tell()]))
+        return result
+
     @classmethod
     def dumps(cls, obj):
         return cbor2.dumps(obj, encoders=cls.encoders, datetime_as_timestamp=True, timezone=pytz.utc)
+
+    @classmethod
+    def dumps_canonical(cls, obj):
+        """ Serialize obj to a deterministic byte string: map keys are sorted
+        and no value sharing markers are written. The result may be both
+        hashed and sent over the wire.
+        """
+        buf = BytesIO()
+        CanonicalCBOREncoder().encode(obj, buf)
+        return buf.getvalue()
@@ -0,0 +1,150 @@
+import bisect
+import logging
+import time
+from collections import OrderedDict
+
+from twisted.internet import defer, task
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of tick duration histogram buckets in seconds
+TICK_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class TickHistogram(object):
+    """ Histogram of durations of subsystem ticks """
+
+    def __init__(self, buckets=TICK_DURATION_BUCKETS):
+        """
+        :param tuple buckets: sorted upper bounds of buckets in seconds,
+        longer durations are counted in an additional last bucket
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.ticks = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.counts[bisect.bisect_left(self.buckets, duration)] += 1
+        self.ticks += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def to_dict(self):
+        """ Return histogram as a dictionary. Buckets are given as
+        [upper bound, count] pairs, the last one has None as its bound
+        :return dict:
+        """
+        bounds = list(self.buckets) + [None]
+        return {
+            'ticks': self.ticks,
+            'total': self.total,
+            'mean': self.total / self.ticks if self.ticks else 0.0,
+            'max': self.max,
+            'buckets': [list(b) for b in zip(bounds, self.counts)],
+        }
+
+
+class SubsystemTimer(object):
+    """ Calls a subsystem tick function periodically on the reactor thread.
+    A tick may return a Deferred, e.g. of work moved to a thread with
+    deferToThread; the next tick is scheduled after it fires, so ticks of
+    one subsystem never overlap. Only the time spent on the reactor thread
+    is added to the histogram. """
+
+    def __init__(self, name, interval, tick, clock=None):
+        self.name = name
+        self.interval = interval
+        self.tick = tick
+        self.errors = 0
+        self.histogram = TickHistogram()
+
+        self._call = task.LoopingCall(self._tick)
+        if clock is not None:
+            self._call.clock = clock
+
+    @property
+    def running(self):
+        return self._call.running
+
+    def start(self, now=False):
+        if not self._call.running:
+            self._call.start(self.interval, now)
+
+    def stop(self):
+        if self._call.running:
+            self._call.stop()
+
+    def _tick(self):
+        started = time.time()
+        try:
+            result = self.tick()
+        except Exception:
+            self._error()
+            result = None
+        self.histogram.add(time.time() - started)
+
+        if isinstance(result, defer.Deferred):
+            return result.addErrback(self._error)
+
+    def _error(self, failure=None):
+        self.errors += 1
+        if failure is None:
+            logger.exception("%s tick failed", self.name)
+        else:
+            logger.error("%s tick failed:\n%s", self.name,
+                         failure.getTraceback())
+
+    def get_stats(self):
+        stats = self.histogram.to_dict()
+        stats.update(interval=self.interval, errors=self.errors)
+        return stats
+
+
+class SubsystemTimers(object):
+    """ Timers of subsystems, each running at its own interval instead of
+    all subsystems being synchronized one after another in a single loop.
+    Must be used from the reactor thread. """
+
+    def __init__(self, clock=None):
+        """
+        :param clock: IReactorTime provider, reactor by default
+        """
+        self.clock = clock
+        self._timers = OrderedDict()
+
+    def add(self, name, interval, tick):
+        """ Register subsystem tick
+        :param str name: subsystem name used in stats
+        :param float interval: seconds between ticks
+        :param tick: function called on the reactor thread; may return
+        a Deferred to postpone the next tick until it fires
+        :return SubsystemTimer:
+        """
+        timer = SubsystemTimer(name, interval, tick, clock=self.clock)
+        self._timers[name] = timer
+        return timer
+
+    @property
+    def running(self):
+        return any(t.running for t in self._timers.itervalues())
+
+    def start(self, now=False):
+        for timer in self._timers.itervalues():
+            timer.start(now)
+
+    def stop(self):
+        for timer in self._timers.itervalues():
+            timer.stop()
+
+    def get_stats(self):
+        """ Return tick stats of every subsystem
+        :return dict: subsystem name -> tick count, durations histogram,
+        errors and interval
+        """
+        return dict((name, timer.get_stats())
+                    for name, timer in self._timers.iteritems())
+
+    def __getitem__(self, name):
+        return self._timers[name]
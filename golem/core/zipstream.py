@@ -0,0 +1,405 @@
+import os
+import struct
+import time
+import zipfile
+import zlib
+
+ZIP_DEFLATED = zipfile.ZIP_DEFLATED
+ZIP_STORED = zipfile.ZIP_STORED
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_VERSION = 45
+
+# signature, crc, compressed size, uncompressed size
+string_data_descriptor = 'PK\x07\x08'
+struct_data_descriptor = '<4sL2L'
+struct_data_descriptor64 = '<4sL2Q'
+
+size_file_header = struct.calcsize(zipfile.structFileHeader)
+
+# records following the last local file header
+END_SIGNATURES = (zipfile.stringCentralDir, zipfile.stringEndArchive64,
+                  zipfile.stringEndArchive)
+
+
+def dos_date_time(timestamp):
+    """ Convert timestamp to date and time fields of a zip header """
+    y, m, d, hh, mm, ss = time.localtime(timestamp)[:6]
+    if y < 1980:
+        y, m, d, hh, mm, ss = 1980, 1, 1, 0, 0, 0
+    return (y - 1980) << 9 | m << 5 | d, hh << 11 | mm << 5 | ss // 2
+
+
+def encode_name(name):
+    """ Return zip file name and flags for a unicode or byte string name """
+    if isinstance(name, unicode):
+        try:
+            return name.encode('ascii'), 0
+        except UnicodeEncodeError:
+            return name.encode('utf-8'), FLAG_UTF8
+    return name, 0
+
+
+class _Entry(object):
+
+    __slots__ = ('name', 'flags', 'date', 'time', 'crc', 'compress_size',
+                 'file_size', 'header_offset', 'external_attr')
+
+
+class ZipStreamWriter(object):
+    """ Writes a zip archive to a stream, eg. a pipe or an encrypting writer,
+    that does not have to support seek and tell. Each file is written in one
+    pass: it is deflated as it is read, its CRC and sizes follow its data in
+    a data descriptor. Files are compressed with the given level, level 0
+    stores them in uncompressed deflate blocks. Archives larger than 2 GB
+    use ZIP64 records. The result can be read with the zipfile module and
+    streamed back with ZipStreamReader.
+    """
+
+    chunk_size = 2 ** 20
+
+    def __init__(self, dst, compress_level=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        :param dst: file-like object with write method
+        :param int compress_level: default zlib compression level, 0-9
+        """
+        self.dst = dst
+        self.compress_level = compress_level
+        self._entries = []
+        self._offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+    def write(self, file_path, arcname=None, compress_level=None):
+        """ Add file to the archive
+        :param str file_path: path of the file
+        :param str arcname: name in the archive, file name by default
+        :param int compress_level: compression level for this file
+        """
+        st = os.stat(file_path)
+        arcname = arcname or os.path.basename(file_path)
+
+        with open(file_path, 'rb') as src:
+            chunks = iter(lambda: src.read(self.chunk_size), '')
+            self._write_entry(arcname, chunks, st.st_mtime,
+                              (st.st_mode & 0xFFFF) << 16, compress_level)
+
+    def writestr(self, arcname, data, compress_level=None):
+        """ Add file with given contents to the archive """
+        self._write_entry(arcname, [data], time.time(), 0o600 << 16,
+                          compress_level)
+
+    def close(self):
+        """ Write the central directory. The stream is not closed """
+        cd_offset = self._offset
+        for entry in self._entries:
+            self._write_central_dir_entry(entry)
+        cd_size = self._offset - cd_offset
+        self._write_end_records(cd_offset, cd_size)
+
+    def _write(self, data):
+        self.dst.write(data)
+        self._offset += len(data)
+
+    def _write_entry(self, arcname, chunks, timestamp, external_attr,
+                     compress_level):
+
+        if compress_level is None:
+            compress_level = self.compress_level
+
+        entry = _Entry()
+        entry.name, flags = encode_name(arcname)
+        entry.flags = flags | FLAG_DATA_DESCRIPTOR
+        entry.date, entry.time = dos_date_time(timestamp)
+        entry.header_offset = self._offset
+        entry.external_attr = external_attr
+
+        self._write(struct.pack(
+            zipfile.structFileHeader, zipfile.stringFileHeader, 20, 0,
+            entry.flags, ZIP_DEFLATED, entry.time, entry.date, 0, 0, 0,
+            len(entry.name), 0))
+        self._write(entry.name)
+
+        compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+        crc, file_size, compress_size = 0, 0, 0
+
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            data = compressor.compress(chunk)
+            if data:
+                compress_size += len(data)
+                self._write(data)
+
+        data = compressor.flush()
+        compress_size += len(data)
+        self._write(data)
+
+        entry.crc = crc & 0xFFFFFFFF
+        entry.file_size = file_size
+        entry.compress_size = compress_size
+
+        if file_size > zipfile.ZIP64_LIMIT \
+                or compress_size > zipfile.ZIP64_LIMIT:
+            fmt = struct_data_descriptor64
+        else:
+            fmt = struct_data_descriptor
+        self._write(struct.pack(fmt, string_data_descriptor, entry.crc,
+                                compress_size, file_size))
+        self._entries.append(entry)
+
+    def _write_central_dir_entry(self, entry):
+        extra = []
+        file_size, compress_size, header_offset = \
+            entry.file_size, entry.compress_size, entry.header_offset
+
+        if file_size > zipfile.ZIP64_LIMIT:
+            extra.append(file_size)
+            file_size = 0xFFFFFFFF
+        if compress_size > zipfile.ZIP64_LIMIT:
+            extra.append(compress_size)
+            compress_size = 0xFFFFFFFF
+        if header_offset > zipfile.ZIP64_LIMIT:
+            extra.append(header_offset)
+            header_offset = 0xFFFFFFFF
+
+        if extra:
+            extra_data = struct.pack('<2H' + 'Q' * len(extra),
+                                     ZIP64_EXTRA_ID, 8 * len(extra), *extra)
+            version = ZIP64_VERSION
+        else:
+            extra_data = ''
+            version = 20
+
+        self._write(struct.pack(
+            zipfile.structCentralDir, zipfile.stringCentralDir, version, 3,
+            version, 0, entry.flags, ZIP_DEFLATED, entry.time, entry.date,
+            entry.crc, compress_size, file_size, len(entry.name),
+            len(extra_data), 0, 0, 0, entry.external_attr, header_offset))
+        self._write(entry.name)
+        self._write(extra_data)
+
+    def _write_end_records(self, cd_offset, cd_size):
+        count = len(self._entries)
+
+        if count >= zipfile.ZIP_FILECOUNT_LIMIT \
+                or cd_offset > zipfile.ZIP64_LIMIT \
+                or cd_size > zipfile.ZIP64_LIMIT:
+            end64_offset = self._offset
+            self._write(struct.pack(
+                zipfile.structEndArchive64, zipfile.stringEndArchive64,
+                44, ZIP64_VERSION, ZIP64_VERSION, 0, 0, count, count,
+                cd_size, cd_offset))
+            self._write(struct.pack(
+                zipfile.structEndArchive64Locator,
+                zipfile.stringEndArchive64Locator, 0, end64_offset, 1))
+            count = min(count, 0xFFFF)
+            cd_offset = min(cd_offset, 0xFFFFFFFF)
+            cd_size = min(cd_size, 0xFFFFFFFF)
+
+        self._write(struct.pack(zipfile.structEndArchive,
+                                zipfile.stringEndArchive, 0, 0, count, count,
+                                cd_size, cd_offset, 0))
+
+
+class ZipStreamReader(object):
+    """ Reads a zip archive sequentially from a stream that does not have to
+    support seek, using local file headers. Reads archives written by
+    ZipStreamWriter and archives written by the zipfile module to files.
+    """
+
+    chunk_size = 2 ** 20
+
+    def __init__(self, src):
+        """
+        :param src: file-like object with read method
+        """
+        self.src = src
+        self._pending = ''
+
+    def extract_all(self, output_dir):
+        """ Extract all files to a directory
+        :return list: names of extracted files
+        """
+        names = []
+
+        for name, chunks in self.entries():
+            path = self._target_path(output_dir, name)
+
+            if name.endswith('/'):
+                if not os.path.isdir(path):
+                    os.makedirs(path)
+                for _ in chunks:
+                    pass
+                continue
+
+            parent = os.path.dirname(path)
+            if parent and not os.path.isdir(parent):
+                os.makedirs(parent)
+
+            with open(path, 'wb') as dst:
+                for chunk in chunks:
+                    dst.write(chunk)
+            names.append(name)
+
+        return names
+
+    def entries(self):
+        """ Yield (name, chunks) for each file in the archive. Chunks of
+        a file have to be consumed before the next file is read. """
+        while True:
+            header = self._read(size_file_header)
+            if header[:4] != zipfile.stringFileHeader:
+                if header[:4] in END_SIGNATURES:
+                    # central directory or end of the archive
+                    return
+                raise zipfile.BadZipfile("File is not a zip file")
+
+            (_, _, _, flags, compress_type, _, _, crc, compress_size,
+             file_size, name_len, extra_len) = struct.unpack(
+                zipfile.structFileHeader, header)
+
+            name = self._read(name_len)
+            extra = self._read(extra_len)
+            name = name.decode('utf-8') if flags & FLAG_UTF8 else name
+
+            if compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+                raise zipfile.BadZipfile("Unsupported compression method {} "
+                                         "for file {!r}"
+                                         .format(compress_type, name))
+
+            if flags & FLAG_DATA_DESCRIPTOR:
+                if compress_type != ZIP_DEFLATED:
+                    raise zipfile.BadZipfile("Size of stored file {!r} is "
+                                             "unknown".format(name))
+                yield name, self._read_deflated(name)
+            else:
+                if compress_size == 0xFFFFFFFF or file_size == 0xFFFFFFFF:
+                    file_size, compress_size = self._zip64_sizes(
+                        extra, file_size, compress_size)
+                yield name, self._read_sized(name, compress_type, crc,
+                                             compress_size)
+
+    def _read_sized(self, name, compress_type, crc, compress_size):
+        decompressor = zlib.decompressobj(-15) \
+            if compress_type == ZIP_DEFLATED else None
+        crc_read = 0
+        left = compress_size
+
+        while left > 0:
+            data = self._read(min(left, self.chunk_size))
+            if not data:
+                raise zipfile.BadZipfile("Truncated file {!r}".format(name))
+            left -= len(data)
+            for chunk in self._inflate(decompressor, data):
+                crc_read = zlib.crc32(chunk, crc_read)
+                yield chunk
+
+        if decompressor:
+            data = decompressor.flush()
+            crc_read = zlib.crc32(data, crc_read)
+            if data:
+                yield data
+
+        self._check_crc(name, crc, crc_read)
+
+    def _read_deflated(self, name):
+        decompressor = zlib.decompressobj(-15)
+        crc_read, file_size, compress_size = 0, 0, 0
+
+        while not decompressor.unused_data:
+            data = self._read_chunk()
+            if not data:
+                raise zipfile.BadZipfile("Truncated file {!r}".format(name))
+            compress_size += len(data)
+            for chunk in self._inflate(decompressor, data):
+                crc_read = zlib.crc32(chunk, crc_read)
+                file_size += len(chunk)
+                yield chunk
+
+        # return data read past the end of the file
+        self._pending = decompressor.unused_data + self._pending
+        compress_size -= len(decompressor.unused_data)
+
+        signature = self._read(4)
+        if signature == string_data_descriptor:
+            crc, = struct.unpack('<L', self._read(4))
+        else:
+            # the signature is optional
+            crc, = struct.unpack('<L', signature)
+
+        if file_size > zipfile.ZIP64_LIMIT \
+                or compress_size > zipfile.ZIP64_LIMIT:
+            self._read(16)
+        else:
+            self._read(8)
+
+        self._check_crc(name, crc, crc_read)
+
+    def _inflate(self, decompressor, data):
+        if not decompressor:
+            yield data
+            return
+        # limit the size of decompressed chunks
+        while data:
+            chunk = decompressor.decompress(data, self.chunk_size)
+            data = decompressor.unconsumed_tail
+            if chunk:
+                yield chunk
+
+    @staticmethod
+    def _zip64_sizes(extra, file_size, compress_size):
+        while len(extra) >= 4:
+            tp, ln = struct.unpack('<2H', extra[:4])
+            if tp == ZIP64_EXTRA_ID:
+                values = list(struct.unpack('<{}Q'.format(ln // 8),
+                                            extra[4:4 + ln]))
+                if file_size == 0xFFFFFFFF:
+                    file_size = values.pop(0)
+                if compress_size == 0xFFFFFFFF:
+                    compress_size = values.pop(0)
+                break
+            extra = extra[4 + ln:]
+        return file_size, compress_size
+
+    @staticmethod
+    def _check_crc(name, crc, crc_read):
+        if crc != crc_read & 0xFFFFFFFF:
+            raise zipfile.BadZipfile("Bad CRC-32 for file {!r}".format(name))
+
+    @staticmethod
+    def _target_path(output_dir, name):
+        # skip absolute and parent directory parts, like zipfile does
+        name = name.replace('/', os.path.sep)
+        name = os.path.splitdrive(name)[1]
+        parts = [p for p in name.split(os.path.sep)
+                 if p not in ('', os.path.curdir, os.path.pardir)]
+        return os.path.join(output_dir, *parts)
+
+    def _read_chunk(self):
+        if self._pending:
+            data, self._pending = self._pending, ''
+            return data
+        return self.src.read(self.chunk_size)
+
+    def _read(self, size):
+        chunks = [self._pending[:size]]
+        self._pending = self._pending[size:]
+        missing = size - len(chunks[0])
+
+        while missing > 0:
+            data = self.src.read(max(missing, self.chunk_size))
+            if not data:
+                break
+            chunks.append(data[:missing])
+            self._pending = data[missing:]
+            missing -= len(chunks[-1])
+
+        return ''.join(chunks)
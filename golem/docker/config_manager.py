@@ -48,6 +48,36 @@ class DockerConfigManager(object):
 
         self.container_host_config.update(host_config)
 
+    def slot_host_config(self, slot, slots):
+        """ Host config of a container computed in one of concurrent
+        computation slots. Configured CPU cores are split between the slots
+        and each slot gets an equal share of memory.
+        :param int slot: slot index
+        :param int slots: number of slots
+        """
+        host_config = dict(self.container_host_config)
+        if slots <= 1:
+            return host_config
+
+        cpuset = host_config.get('cpuset')
+        if cpuset:
+            cpus = cpuset.split(',')
+            if len(cpus) >= slots:
+                share, extra = divmod(len(cpus), slots)
+                # first `extra` slots get one core more
+                start = slot * share + min(slot, extra)
+                end = start + share + (1 if slot < extra else 0)
+                cpus = cpus[start:end]
+            else:
+                cpus = [cpus[slot % len(cpus)]]
+            host_config['cpuset'] = ','.join(cpus)
+
+        mem_limit = host_config.get('mem_limit')
+        if mem_limit:
+            host_config['mem_limit'] = mem_limit // slots
+
+        return host_config
+
     @classmethod
     def install(cls, *args, **kwargs):
         if not DockerTaskThread.docker_manager:
@@ -24,7 +24,8 @@ class DockerTaskThread(TaskThread):
 
     def __init__(self, task_computer, subtask_id, docker_images,
                  orig_script_dir, src_code, extra_data, short_desc,
-                 res_path, tmp_path, timeout, check_mem=False):
+                 res_path, tmp_path, timeout, check_mem=False,
+                 host_config=None):
 
         if not docker_images:
             raise AttributeError("docker images is None")
@@ -43,6 +44,7 @@ class DockerTaskThread(TaskThread):
         self.job = None
         self.mc = None
         self.check_mem = check_mem
+        self.host_config = host_config
 
     def run(self):
         if not self.image:
@@ -60,10 +62,9 @@ class DockerTaskThread(TaskThread):
             if not os.path.exists(output_dir):
                 os.mkdir(output_dir)
 
-            if self.docker_manager:
+            host_config = self.host_config
+            if host_config is None and self.docker_manager:
                 host_config = self.docker_manager.container_host_config
-            else:
-                host_config = None
 
             with DockerJob(self.image, self.src_code, self.extra_data,
                            self.res_path, work_dir, output_dir,
@@ -1,9 +1,11 @@
 import errno
+import heapq
 import logging
+import os
 import socket
 import time
 import uuid
-from threading import Lock, Thread
+from threading import Condition, Lock, Thread
 
 import requests
 import select
@@ -37,6 +39,8 @@ class ChunkStream:
     _conn_sleep = 0.1
     _read_sleep = 0.1
 
+    buf_size = 64 * 1024
+
     _retry_err_codes = [errno.EWOULDBLOCK, errno.EINTR]
     _stop_err_codes = [errno.EBADF]
 
@@ -60,12 +64,18 @@ class ChunkStream:
         self.url = url
 
         self.sock = None
-        self.buf = []
         self.recv_size = 4096
 
+        # received data is kept in buf[buf_start:buf_end]
+        self.buf = bytearray(self.buf_size)
+        self.buf_view = memoryview(self.buf)
+        self.buf_start = 0
+        self.buf_end = 0
+
         self.headers_read = False
         self.eof = False
         self.done = False
+        self.monitor_id = None
         self.cancelled = False
         self.working = True
 
@@ -94,6 +104,7 @@ class ChunkStream:
     def disconnect(self):
         self.__disconnect()
         self.working = False
+        StreamMonitor.unregister(self)
         if self.cancelled:
             raise requests.exceptions.ReadTimeout()
 
@@ -109,6 +120,27 @@ class ChunkStream:
         self.cancelled = True
 
     def next(self):
+        return self._next_content().tobytes()
+
+    def write_to(self, fd):
+        """ Write the remaining content to a file descriptor, directly from
+        the receive buffer
+        :param int fd: file descriptor
+        :return int: number of bytes written
+        """
+        written = 0
+        try:
+            while True:
+                content = self._next_content()
+                while content:
+                    n = os.write(fd, content)
+                    content = content[n:]
+                    written += n
+        except StopIteration:
+            pass
+        return written
+
+    def _next_content(self):
         if not self.headers_read:
             self.headers_read = True
             self._read_headers()
@@ -116,16 +148,13 @@ class ChunkStream:
 
     def _read_headers(self):
         while self.working and not self.eof:
-            try:
-                self._read_chunk()
-            except StopIteration:
-                self.eof = True
+            self._read_chunk()
 
-            sep_idx = self.sublist_index(self.buf, self.long_sep_list)
+            sep_idx = self.buf.find(self.long_sep, self.buf_start,
+                                    self.buf_end)
             if sep_idx != -1:
-                next_idx = sep_idx + self.long_sep_list_len
-                self._assert_headers(self.buf[:sep_idx])
-                self.buf = self.buf[next_idx:]
+                self._assert_headers(self._take(sep_idx - self.buf_start,
+                                                self.long_sep_list_len))
                 break
 
     @classmethod
@@ -182,12 +211,11 @@ class ChunkStream:
 
     def _read_chunk(self):
         if self.working and not self.eof:
+            self._reserve()
             try:
-                chunk = self.__read()
-                if chunk:
-                    self.buf += chunk
-                    return len(chunk)
-                return 0
+                n = self.__read(self.buf_view[self.buf_end:])
+                self.buf_end += n
+                return n
             except StopIteration:
                 self.eof = True
         return -1
@@ -197,71 +225,76 @@ class ChunkStream:
 
             if self.content_size is None:
 
-                sep_idx = self.sublist_index(self.buf, self.short_sep_list)
+                sep_idx = self.buf.find(self.short_sep, self.buf_start,
+                                        self.buf_end)
                 if sep_idx == -1:
-
-                    n = self._read_chunk()
-                    if n <= 0 or not self.buf:
+                    if self._read_chunk() <= 0:
                         raise StopIteration()
                     continue
 
-                else:
-
-                    size_slice = self.buf[:sep_idx]
-                    next_idx = sep_idx + self.short_sep_len
-                    self.buf = self.buf[next_idx:]
-
-                    if not size_slice:
-                        continue
+                size_line = self._take(sep_idx - self.buf_start,
+                                       self.short_sep_len)
+                if not size_line:
+                    continue
 
-                    try:
-                        self.content_size = int(''.join(size_slice), 16)
-                        self.content_read = self.content_sent = 0
-                    except Exception as exc:
-                        logger.error("Invalid size: {} : {}"
-                                     .format(size_slice[:8], exc))
-                        raise
+                try:
+                    # skip chunk extensions
+                    self.content_size = int(size_line.split(';', 1)[0], 16)
+                    self.content_read = self.content_sent = 0
+                except Exception as exc:
+                    logger.error("Invalid size: {} : {}"
+                                 .format(size_line[:8], exc))
+                    raise
 
                 if self.content_size == 0:
                     raise StopIteration()
 
-            if self.buf:
-                n = len(self.buf)
-            else:
-                n = self._read_chunk()
-                if n <= 0 or not self.buf:
-                    raise StopIteration()
-
-            self.content_read = min(self.content_size, self.content_read + n)
-
-            if self.content_read >= self.content_size:
+            if self.buf_start == self.buf_end and self._read_chunk() <= 0:
+                raise StopIteration()
 
-                last_idx = self.content_size - self.content_sent
-                result = ''.join(self.buf[:last_idx])
+            n = min(self.buf_end - self.buf_start,
+                    self.content_size - self.content_sent)
+            result = self.buf_view[self.buf_start:self.buf_start + n]
+            self._skip(n)
 
-                self.buf = self.buf[last_idx:]
-                if self.sublist_index(self.buf, self._eoc_list) == 0:
-                    self.buf = self.buf[self._eoc_len:]
+            self.content_sent += n
+            self.content_read = self.content_sent
 
-                self.data_read += self.content_read
+            if self.content_sent >= self.content_size:
+                self.data_read += self.content_size
                 self.content_size = None
                 self.content_sent = 0
 
-            else:
+            return result
 
-                self.content_sent += len(self.buf)
-                result = ''.join(self.buf)
-                self.buf = []
+        raise StopIteration()
+
+    def _take(self, size, skip=0):
+        """ Consume size bytes of the buffer and skip the following ones
+        :return str: consumed data
+        """
+        data = self.buf_view[self.buf_start:self.buf_start + size].tobytes()
+        self._skip(size + skip)
+        return data
+
+    def _skip(self, size):
+        self.buf_start += size
+        if self.buf_start >= self.buf_end:
+            self.buf_start = self.buf_end = 0
+
+    def _reserve(self):
+        """ Make room for data at the end of the buffer, by moving pending
+        data to the front or by growing the buffer """
+        if len(self.buf) - self.buf_end >= len(self.buf) / 4:
+            return
 
-            return result
+        pending = self.buf_view[self.buf_start:self.buf_end].tobytes()
+        if len(pending) > len(self.buf) / 2:
+            self.buf = bytearray(2 * len(self.buf))
+            self.buf_view = memoryview(self.buf)
 
-    @staticmethod
-    def sublist_index(buf, seq, start_idx=0):
-        l_seq = len(seq)
-        for i in xrange(start_idx, len(buf)):
-            if buf[i:i + l_seq] == seq:
-                return i
-        return -1
+        self.buf_view[:len(pending)] = pending
+        self.buf_start, self.buf_end = 0, len(pending)
 
     def __iter__(self):
         return self
@@ -333,18 +366,21 @@ class ChunkStream:
             logger.error("Error disconnecting socket: {}"
                          .format(exc))
 
-    def __read(self, drain=False):
+    def __read(self, view=None, drain=False):
         while self.working:
 
             if self.cancelled and not (drain or self.done):
                 self.disconnect()
 
             try:
-                chunk = self.sock.recv(self.recv_size)
+                if drain:
+                    n = len(self.sock.recv(self.recv_size))
+                else:
+                    n = self.sock.recv_into(view)
             except socket.error, e:
                 err = e.args[0]
                 if err in self._retry_err_codes:
-                    time.sleep(self._read_sleep)
+                    self.__wait_readable()
                 elif err in self._stop_err_codes:
                     raise StopIteration()
                 else:
@@ -353,27 +389,41 @@ class ChunkStream:
                     raise
             else:
                 self.timestamp = time.time()
-                if chunk:
+                if n:
                     if drain:
                         continue
-                    return chunk
+                    return n
                 raise StopIteration()
 
+    def __wait_readable(self):
+        try:
+            select.select([self.sock], [], [], self._read_sleep)
+        except select.error:
+            pass
+
 
 class StreamMonitor(object):
+    """ Cancels streams that have not received data for stream_timeout
+    seconds. Streams are kept in a heap of deadlines and the monitor thread
+    sleeps until the earliest one. When a deadline expires and the stream
+    has received data in the meantime, it is pushed again with a new
+    deadline. Streams are unregistered when they finish; the ones that
+    were not are removed at their deadline. """
+
     stream_timeout = IDLE_STREAM_TIMEOUT
 
     _thread = None
     _initialized = False
     _working = False
 
-    _sleep = 1.0
-    _sleep_short = 0.1
-
     _streams = {}
+    _deadlines = []  # heap of (deadline, unique_id)
+
+    timed_out = 0  # streams cancelled after a timeout
+    finished = 0  # finished streams removed
 
     __lock = Lock()
-    __streams_lock = Lock()
+    __streams_cond = Condition(Lock())
 
     @classmethod
     def monitor(cls, stream, sock=None):
@@ -382,48 +432,77 @@ class StreamMonitor(object):
                 cls._initialize()
 
         unique_id = str(uuid.uuid4())
-        with cls.__streams_lock:
+        stream.monitor_id = unique_id
+        with cls.__streams_cond:
             cls._streams[unique_id] = dict(
                 stream=stream,
                 socket=sock
             )
+            heapq.heappush(cls._deadlines,
+                           (stream.timestamp + cls.stream_timeout, unique_id))
+            cls.__streams_cond.notify()
 
     @classmethod
-    def _loop(cls):
-        while cls._working:
-            now = time.time()
-            sleep = cls._sleep
+    def unregister(cls, stream):
+        """ Stop monitoring a finished stream """
+        with cls.__streams_cond:
+            if cls._streams.pop(stream.monitor_id, None) is None:
+                return
+            cls.finished += 1
+            # its deadline is now stale, let the loop wait for the next one
+            cls.__streams_cond.notify()
 
-            for unique_id in cls._streams.keys():
-                with cls.__streams_lock:
-                    if unique_id in cls._streams:
-                        data = cls._streams[unique_id]
-                    else:
-                        continue
+    @classmethod
+    def stats(cls):
+        with cls.__streams_cond:
+            return dict(
+                active=len(cls._streams),
+                timed_out=cls.timed_out,
+                finished=cls.finished
+            )
 
-                stream, sock = data['stream'], data['socket']
-                dt = now - stream.timestamp
-                timed_out = dt >= cls.stream_timeout
+    @classmethod
+    def _loop(cls):
+        while cls._working:
+            with cls.__streams_cond:
+                now = time.time()
+                expired = cls._pop_expired(now)
+                if not expired:
+                    timeout = None
+                    if cls._deadlines:
+                        timeout = cls._deadlines[0][0] - now
+                    cls.__streams_cond.wait(timeout)
+                    continue
 
-                if timed_out or stream.done:
-                    cls._close_stream(unique_id, stream, sock)
-                    sleep = cls._sleep_short
-                    break
+            for unique_id, data in expired:
+                cls._close_stream(unique_id, data['stream'], data['socket'])
 
-            time.sleep(sleep)
+    @classmethod
+    def _pop_expired(cls, now):
+        expired = []
+        while cls._deadlines and cls._deadlines[0][0] <= now:
+            _, unique_id = heapq.heappop(cls._deadlines)
+            data = cls._streams.get(unique_id)
+            if not data:
+                continue
+
+            deadline = data['stream'].timestamp + cls.stream_timeout
+            if data['stream'].done or deadline <= now:
+                del cls._streams[unique_id]
+                expired.append((unique_id, data))
+            else:
+                heapq.heappush(cls._deadlines, (deadline, unique_id))
+        return expired
 
     @classmethod
     def _close_stream(cls, unique_id, stream, sock):
-        if not stream.done:
+        if stream.done:
+            cls.finished += 1
+        else:
             logger.debug("Closing stream {} (> {} s)"
-                         .format(unique_id, IDLE_STREAM_TIMEOUT))
+                         .format(unique_id, cls.stream_timeout))
+            cls.timed_out += 1
             stream.cancel()
-        cls._remove_stream(unique_id)
-
-    @classmethod
-    def _remove_stream(cls, unique_id):
-        with cls.__streams_lock:
-            cls._streams.pop(unique_id, None)
 
     @classmethod
     def _close_socket(cls, sock):
@@ -436,6 +515,7 @@ class StreamMonitor(object):
 
     @classmethod
     def _initialize(cls):
+        cls._initialized = True
         cls._working = True
         cls._thread = Thread(target=cls._loop)
         cls._thread.daemon = True
@@ -450,6 +530,7 @@ class StreamFileObject:
         self.timestamp = time.time()
         self.timed_out = False
         self.done = False
+        self.monitor_id = None
 
     def read(self, count):
         if not self.source_iter:
@@ -464,6 +545,7 @@ class StreamFileObject:
             return data
         except StopIteration:
             self.done = True
+            StreamMonitor.unregister(self)
             return None
 
     def cancel(self):
@@ -159,6 +159,18 @@ class Settings(object):
             '{} >= int >= 1'.format(_cpu_count),
             _int,
             lambda x: _cpu_count >= x >= 1
+        ),
+        'max_concurrent_subtasks': Setting(
+            'Number of subtasks computed at the same time',
+            '{} >= int >= 1'.format(_cpu_count),
+            _int,
+            lambda x: _cpu_count >= x >= 1
+        ),
+        'prefetch_subtasks': Setting(
+            'Number of subtasks downloaded ahead of computation',
+            'int >= 0',
+            _int,
+            lambda x: x >= 0
         )
     }
 
@@ -697,11 +697,20 @@ class P2PService(tcpserver.PendingConnectionsServer, DiagnosticsProvider):
 
     # TASK FUNCTIONS
     ############################
-    def get_tasks_headers(self):
+    def get_tasks_headers(self, known_digests=None):
         """ Return a list of a known tasks headers
+        :param dict|None known_digests: task id -> digest of headers known
+                                        to the requesting peer, those are
+                                        not returned
         :return list: list of task header
         """
-        return self.task_server.get_tasks_headers()
+        return self.task_server.get_tasks_headers(known_digests)
+
+    def get_tasks_digests(self):
+        """ Return digests of known tasks headers
+        :return dict: task id -> header digest
+        """
+        return self.task_server.get_tasks_digests()
 
     def add_task_header(self, th_dict_repr):
         """ Add new task header to a list of known task headers
@@ -946,8 +955,11 @@ class P2PService(tcpserver.PendingConnectionsServer, DiagnosticsProvider):
     def __send_message_get_tasks(self):
         if time.time() - self.last_tasks_request > TASK_INTERVAL:
             self.last_tasks_request = time.time()
+            if not self.peers:
+                return
+            digests = self.get_tasks_digests()
             for p in self.peers.values():
-                p.send_get_tasks()
+                p.send_get_tasks(digests)
 
     def __connection_established(self, session, conn_id=None):
         peer_conn = session.conn.transport.getPeer()
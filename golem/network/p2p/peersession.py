@@ -1,6 +1,7 @@
 import logging
 import time
 
+from golem.core.channelcipher import ChannelCipher
 from golem.core.crypto import ECIESDecryptionError
 from golem.network.transport import message
 from golem.network.transport.session import BasicSafeSession
@@ -8,7 +9,7 @@ from golem.network.transport.tcpnetwork import SafeProtocol
 
 logger = logging.getLogger(__name__)
 
-P2P_PROTOCOL_ID = 14
+P2P_PROTOCOL_ID = 15
 
 
 class PeerSessionInfo(object):
@@ -149,6 +150,8 @@ class PeerSession(BasicSafeSession):
         :param str data: serialized message to be encrypted
         :return str: encrypted message
         """
+        if self.send_cipher:
+            return self.send_cipher.encrypt(data)
         return self.p2p_service.encrypt(data, self.key_id)
 
     def decrypt(self, data):
@@ -158,6 +161,8 @@ class PeerSession(BasicSafeSession):
         :param str data: data to be decrypted
         :return str msg: decrypted message
         """
+        if ChannelCipher.is_channel_frame(data):
+            return self._decrypt_channel_frame(data)
         if not self.p2p_service:
             return data
 
@@ -202,9 +207,11 @@ class PeerSession(BasicSafeSession):
         """  Send get peers message """
         self.send(message.MessageGetPeers())
 
-    def send_get_tasks(self):
-        """  Send get tasks message """
-        self.send(message.MessageGetTasks())
+    def send_get_tasks(self, digests=None):
+        """  Send get tasks message
+        :param dict|None digests: task id -> digest of known task headers
+        """
+        self.send(message.MessageGetTasks(digests=digests))
 
     def send_remove_task(self, task_id):
         """  Send remove task  message
@@ -436,7 +443,7 @@ class PeerSession(BasicSafeSession):
             self.p2p_service.try_to_add_peer(pi)
 
     def _react_to_get_tasks(self, msg):
-        tasks = self.p2p_service.get_tasks_headers()
+        tasks = self.p2p_service.get_tasks_headers(msg.digests)
         self.send(message.MessageTasks(tasks))
 
     def _react_to_tasks(self, msg):
@@ -565,6 +572,7 @@ class PeerSession(BasicSafeSession):
     def __set_verified_conn(self):
         self.verified = True
         self.p2p_service.verified_conn(self.conn_id)
+        self.start_channel()
         self.p2p_service.add_known_peer(
             self.node_info,
             self.address,
@@ -1,8 +1,6 @@
-import collections
 import logging
 import time
 
-from golem.core.common import to_unicode
 from golem.core.databuffer import DataBuffer
 from golem.core.simplehash import SimpleHash
 from golem.core.simpleserializer import CBORSerializer
@@ -19,6 +17,13 @@ class Message(object):
     # Message types that are allowed to be sent in the network
     registered_message_types = {}
 
+    # Attributes that are not a part of the signed payload
+    unsigned_attributes = frozenset(['sig', 'timestamp', 'encrypted',
+                                     '_payload'])
+
+    # Canonical CBOR encoding of dict_repr(), memoized
+    _payload = None
+
     def __init__(self, sig="", timestamp=None, dict_repr=None):
         """ Create new message"""
         if not self.registered_message_types:
@@ -32,41 +37,39 @@ class Message(object):
 
         self.load_dict_repr(dict_repr)
 
+    def __setattr__(self, name, value):
+        # Payload changes, drop memoized encoding. Note that in-place
+        # modifications of attribute values are not tracked.
+        if name not in self.unsigned_attributes:
+            object.__setattr__(self, '_payload', None)
+        object.__setattr__(self, name, value)
+
+    def get_payload(self):
+        """Return canonical CBOR encoding of message dictionary
+        representation. It is computed once and used both for signing and
+        for sending the message.
+        :return str: serialized payload
+        """
+        if self._payload is None:
+            self._payload = CBORSerializer.dumps_canonical(self.dict_repr())
+        return self._payload
+
     def get_short_hash(self):
         """Return short message representation for signature
-        :return str: short hash of serialized and sorted message dictionary
+        :return str: short hash of canonically serialized message dictionary
                      representation
         """
-        sorted_dict = self._sort_obj(self.dict_repr())
-        return SimpleHash.hash(CBORSerializer.dumps(sorted_dict))
-
-    def _sort_obj(self, v):
-        if isinstance(v, dict):
-            return self._sort_dict(v)
-        # treat objects as dictionaries
-        elif hasattr(v, '__dict__'):
-            return self._sort_dict(v.__dict__, filter_properties=True)
-        elif isinstance(v, basestring):
-            return to_unicode(v)
-        elif isinstance(v, collections.Iterable):
-            return v.__class__([self._sort_obj(_v) for _v in v])
-        return v
-
-    def _sort_dict(self, dictionary, filter_properties=False):
-        result = dict()
-        for k, v in dictionary.iteritems():
-            if filter_properties and (k.startswith('_') or callable(v)):
-                continue
-            result[to_unicode(k)] = self._sort_obj(v)
-        return sorted(result.items())
+        return SimpleHash.hash(self.get_payload())
 
     def serialize(self):
         """ Return serialized message
         :return str: serialized message """
         try:
-            return CBORSerializer.dumps(
-                [self.TYPE, self.sig, self.timestamp, self.dict_repr()]
+            header = CBORSerializer.dumps_canonical(
+                [self.TYPE, self.sig, self.timestamp, None]
             )
+            # Replace the trailing null with the memoized payload
+            return header[:-1] + self.get_payload()
         except Exception:
             logger.exception("Error serializing message:")
             raise
@@ -157,29 +160,32 @@ class Message(object):
                               type is unknown
         """
         try:
-            msg_repr = CBORSerializer.loads(msg_)
+            items = CBORSerializer.loads_items(msg_)
         except Exception as exc:
             logger.error("Error deserializing message: {}".format(exc))
-            msg_repr = None
+            items = None
 
-        if not (isinstance(msg_repr, list) and len(msg_repr) >= 4):
-            logger.info('Invalid message representation: %r', msg_repr)
+        if not (isinstance(items, list) and len(items) >= 4):
+            logger.info('Invalid message representation: %r', items)
             return
 
-        msg_type = msg_repr[0]
-        msg_sig = msg_repr[1]
-        msg_timestamp = msg_repr[2]
-        d_repr = msg_repr[3]
+        msg_type = items[0][0]
+        msg_sig = items[1][0]
+        msg_timestamp = items[2][0]
+        d_repr, payload = items[3]
 
         if msg_type not in cls.registered_message_types:
             logger.info('Unrecognized message type: %r', msg_type)
             return
 
-        return cls.registered_message_types[msg_type](
+        msg = cls.registered_message_types[msg_type](
             sig=msg_sig,
             timestamp=msg_timestamp,
             dict_repr=d_repr
         )
+        # Signature is verified against the payload exactly as received
+        msg._payload = payload
+        return msg
 
     def __str__(self):
         return "{}".format(self.__class__)
@@ -321,6 +327,29 @@ class MessageChallengeSolution(Message):
         super(MessageChallengeSolution, self).__init__(**kwargs)
 
 
+class MessageChannelKey(Message):
+    TYPE = 4
+
+    MAPPING = {
+        'key': u"KEY",
+    }
+
+    def __init__(self, key="", **kwargs):
+        """
+        Create a message with a symmetric key that will be used to encrypt
+        further messages sent by the other side
+        :param str key: hex encoded channel key
+        """
+        self.key = key
+        super(MessageChannelKey, self).__init__(**kwargs)
+
+
+class MessageChannelKeyAck(Message):
+    """Confirms that channel key has been installed"""
+    TYPE = 5
+    MAPPING = {}
+
+
 ################
 # P2P Messages #
 ################
@@ -364,7 +393,31 @@ class MessagePeers(Message):
 
 class MessageGetTasks(Message):
     TYPE = P2P_MESSAGE_BASE + 5
-    MAPPING = {}
+
+    MAPPING = {
+        'digests': u"DIGESTS",
+    }
+
+    def __init__(self, digests=None, **kwargs):
+        """
+        Create request for task headers
+        :param dict|None digests: task id -> header digest of tasks known
+                                  to the requesting node; only new and
+                                  updated headers are sent back. All headers
+                                  are requested if it's None
+        """
+        self.digests = digests
+        super(MessageGetTasks, self).__init__(**kwargs)
+
+    def load_dict_repr(self, dict_repr):
+        # older nodes request all headers without sending digests
+        if dict_repr is not None:
+            self.digests = dict_repr.get(self.MAPPING['digests'])
+
+    def dict_repr(self):
+        if self.digests is None:
+            return {}
+        return super(MessageGetTasks, self).dict_repr()
 
 
 class MessageTasks(Message):
@@ -1234,6 +1287,8 @@ def init_messages():
             MessageRandVal,
             MessageDisconnect,
             MessageChallengeSolution,
+            MessageChannelKey,
+            MessageChannelKeyAck,
 
             # P2P messages
             MessagePing,
@@ -3,6 +3,7 @@ import logging
 import random
 import time
 
+from golem.core.channelcipher import ChannelCipher, ChannelDecryptionError
 from golem.core.keysauth import get_random_float
 from golem.core.variables import MSG_TTL, FUTURE_TIME_TOLERANCE, UNVERIFIED_CNT
 from golem.network.transport import message
@@ -183,6 +184,17 @@ class BasicSafeSession(BasicSession, SafeSession):
         self.can_be_unsigned = [message.MessageDisconnect.TYPE]  # React to message even if it's not signed.
         self.can_be_not_encrypted = [message.MessageDisconnect.TYPE]  # React to message even if it's not encrypted.
 
+        # Symmetric ciphers negotiated after the connection has been verified. Until the peer confirms
+        # our key, outgoing messages are encrypted with ECIES (see start_channel).
+        self.send_cipher = None
+        self.recv_cipher = None
+        self._offered_cipher = None
+
+        self._interpretation.update({
+            message.MessageChannelKey.TYPE: self._react_to_channel_key,
+            message.MessageChannelKeyAck.TYPE: self._react_to_channel_key_ack,
+        })
+
     # Simple session with no encryption and no signing
     def sign(self, msg):
         return msg
@@ -211,9 +223,40 @@ class BasicSafeSession(BasicSession, SafeSession):
 
         BasicSession.send(self, message)
 
+    def start_channel(self):
+        """ Offer the peer a symmetric key for messages sent from this side. The key is sent in an ECIES
+        encrypted message and is used to encrypt further messages as soon as the peer acknowledges it.
+        Should be called once the connection has been verified.
+        """
+        if self.send_cipher or self._offered_cipher:
+            return
+        self._offered_cipher = ChannelCipher(ChannelCipher.gen_key())
+        self.send(message.MessageChannelKey(key=self._offered_cipher.key.encode('hex')))
+
+    def reset_channel(self):
+        """ Forget negotiated symmetric keys and go back to per-message ECIES encryption """
+        self.send_cipher = None
+        self.recv_cipher = None
+        self._offered_cipher = None
+
     def _can_send(self, msg, send_unverified):
         return self.verified or send_unverified or msg.TYPE in self.can_be_unverified
 
+    def _decrypt_channel_frame(self, data):
+        """ Decrypt data encrypted with the symmetric key negotiated with the peer. Disconnect if the frame
+        cannot be decrypted.
+        :param str data: channel frame
+        :return str|None: decrypted data or None if decryption failed
+        """
+        try:
+            if self.recv_cipher is None:
+                raise ChannelDecryptionError("Channel key not established")
+            return self.recv_cipher.decrypt(data)
+        except ChannelDecryptionError as err:
+            logger.warning("Failed to decrypt message from {}:{}: {}".format(self.address, self.port, err))
+            self.disconnect(BasicSafeSession.DCRWrongEncryption)
+        return None
+
     def _check_msg(self, msg):
         if not BasicSession._check_msg(self, msg):
             return False
@@ -254,6 +297,22 @@ class BasicSafeSession(BasicSession, SafeSession):
 
         return True
 
+    def _react_to_channel_key(self, msg):
+        try:
+            self.recv_cipher = ChannelCipher(msg.key.decode('hex'))
+        except (AttributeError, TypeError, ValueError):
+            logger.info("Wrong channel key from {}:{}".format(self.address, self.port))
+            self.disconnect(BasicSafeSession.DCRBadProtocol)
+            return
+        self.send(message.MessageChannelKeyAck())
+
+    def _react_to_channel_key_ack(self, msg):
+        if self._offered_cipher is None:
+            logger.info("Unexpected channel key confirmation from {}:{}".format(self.address, self.port))
+            return
+        self.send_cipher = self._offered_cipher
+        self._offered_cipher = None
+
 
 class MiddlemanSafeSession(BasicSafeSession):
     """ Enhance BasicSafeSession with logic that supports middleman connection. If is_middleman variable is set True,
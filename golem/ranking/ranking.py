@@ -147,8 +147,13 @@ class Ranking(object):
         #     return rank / float(weight_sum)
         return UNKNOWN_TRUST
 
-    def sync_network(self):
-        neighbours_loc_ranks = self.client.collect_neighbours_loc_ranks()
+    def sync_network(self, neighbours_loc_ranks=None):
+        """ Save local ranks received from neighbours
+        :param list|None neighbours_loc_ranks: [neighbour id, node id,
+        local rank] entries, collected from the client if None
+        """
+        if neighbours_loc_ranks is None:
+            neighbours_loc_ranks = self.client.collect_neighbours_loc_ranks()
         for [neighbour_id, about_id, loc_rank] in neighbours_loc_ranks:
             with self.lock:
                 dm.upsert_neighbour_loc_rank(neighbour_id, about_id, loc_rank)
@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import time
+from threading import Lock
+
+
+class Download(object):
+
+    def __init__(self, key, task_id, priority, params):
+        self.key = key
+        self.task_id = task_id
+        self.priority = priority
+        self.params = params
+        self.waiters = []  # requests waiting for the resource
+
+
+class DownloadScheduler(object):
+    """ Decides when resource downloads start. Requests for a resource
+    that is already queued or being downloaded wait for that download
+    instead of fetching the resource again. Queued downloads start in
+    order of their task priority (higher first), then in request order.
+
+    The number of concurrent downloads is adapted to the throughput. After
+    each measurement window in which downloads had to wait for a slot, the
+    limit is moved by one, between 1 and max_limit: in the same direction
+    as before if throughput grew, in the opposite one if it dropped.
+    """
+
+    window = 5.0  # seconds of a throughput measurement window
+    threshold = 0.1  # relative throughput change that counts as a change
+
+    def __init__(self, limit=3, max_limit=None):
+        """
+        :param int limit: initial number of concurrent downloads, there's no
+        limit if it's lower than 1
+        :param int max_limit: maximum number of concurrent downloads
+        """
+        self.limit = limit
+        self.max_limit = max(limit, max_limit or 4 * limit)
+        self.task_priorities = dict()
+
+        self._lock = Lock()
+        self._downloads = dict()  # key -> queued or running Download
+        self._running = set()
+        self._queue = []  # heap of (-priority, request number, key)
+        self._counter = itertools.count()
+
+        self._window_start = time.time()
+        self._window_bytes = 0
+        self._saturated = False
+        self._throughput = None
+        self._direction = 1
+
+    @property
+    def running(self):
+        return len(self._running)
+
+    @property
+    def queued(self):
+        return len(self._downloads) - len(self._running)
+
+    def has_downloads(self, task_id):
+        """ Check whether a task has queued or running downloads """
+        with self._lock:
+            return any(d.task_id == task_id for d in self._downloads.values())
+
+    def set_task_priority(self, task_id, priority):
+        """ Change priority of queued and future downloads of a task """
+        with self._lock:
+            self.task_priorities[task_id] = priority
+            for download in self._downloads.values():
+                if download.task_id == task_id \
+                        and download.key not in self._running:
+                    download.priority = priority
+                    self._push(download)
+
+    def add(self, key, task_id, params, waiter):
+        """ Request a download
+        :param key: resource identifier, requests with the same key share
+        one download
+        :param params: kept in the download, eg. to start it later
+        :param waiter: returned by finish or fail, eg. request callbacks
+        :return bool: False if the request joined an existing download
+        """
+        with self._lock:
+            download = self._downloads.get(key)
+            if download:
+                download.waiters.append(waiter)
+                return False
+
+            download = Download(key, task_id,
+                                self.task_priorities.get(task_id, 0), params)
+            download.waiters.append(waiter)
+            self._downloads[key] = download
+            self._push(download)
+            return True
+
+    def next(self):
+        """ Take the next queued download if there's a free download slot
+        :return None|Download: download to start
+        """
+        with self._lock:
+            while self._queue:
+                if not self._has_free_slot():
+                    self._saturated = True
+                    return None
+                priority, _, key = heapq.heappop(self._queue)
+                download = self._downloads.get(key)
+                if download and key not in self._running \
+                        and download.priority == -priority:
+                    self._running.add(key)
+                    return download
+        return None
+
+    def finish(self, key, size=0):
+        """ Mark download as successful
+        :param int size: number of bytes downloaded
+        :return list: waiters of all requests for the resource
+        """
+        with self._lock:
+            self._window_bytes += size
+            self._adapt()
+            return self._remove(key)
+
+    def fail(self, key):
+        """ Mark download as failed
+        :return list: waiters of all requests for the resource
+        """
+        with self._lock:
+            return self._remove(key)
+
+    def _push(self, download):
+        heapq.heappush(self._queue, (-download.priority, next(self._counter),
+                                     download.key))
+
+    def _remove(self, key):
+        self._running.discard(key)
+        download = self._downloads.pop(key, None)
+        return download.waiters if download else []
+
+    def _has_free_slot(self):
+        return self.limit < 1 or len(self._running) < self.limit
+
+    def _adapt(self):
+        now = time.time()
+        elapsed = now - self._window_start
+        if self.limit < 1 or elapsed < self.window:
+            return
+
+        throughput = self._window_bytes / elapsed
+        if self._saturated:
+            previous = self._throughput
+            if previous is None \
+                    or throughput > previous * (1 + self.threshold):
+                step = self._direction
+            elif throughput < previous * (1 - self.threshold):
+                self._direction = -self._direction
+                step = self._direction
+            else:
+                step = 0
+            self.limit = min(self.max_limit, max(1, self.limit + step))
+
+        self._throughput = throughput
+        self._window_start = now
+        self._window_bytes = 0
+        self._saturated = len(self._downloads) > len(self._running)
@@ -83,6 +83,12 @@ class BaseResourceServer(object):
         if collected:
             self.client.task_resource_collected(task_id, unpack_delta=False)
 
+    def set_resources_priority(self, task_id, priority):
+        self.resource_manager.set_download_priority(task_id, priority)
+
+    def release_resources(self, task_id):
+        self.resource_manager.release_task(task_id)
+
     def _add_pending_resource(self, resource, task_id, client_options):
         if task_id not in self.pending_resources:
             self.pending_resources[task_id] = []
@@ -159,4 +165,6 @@ class BaseResourceServer(object):
         pass
 
     def change_config(self, config_desc):
-        pass
+        # max_resource_size is the disk space offered for resources, in kB
+        store = self.resource_manager.storage.store
+        store.max_size = int(config_desc.max_resource_size) * 1024
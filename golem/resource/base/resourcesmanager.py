@@ -3,11 +3,13 @@ import logging
 import os
 import re
 import shutil
-from collections import deque
+import sys
 from threading import Lock
 
 from golem.core.common import to_unicode
 from golem.core.fileshelper import copy_file_tree, common_dir
+from golem.resource.base.downloadscheduler import DownloadScheduler
+from golem.resource.base.resourcestore import ResourceStore
 from golem.resource.client import IClientHandler, ClientCommands, \
     ClientHandler, ClientConfig, TestClient
 from golem.core.async import AsyncRequest, async_run
@@ -44,6 +46,8 @@ def dir_files(directory):
 
 class Resource(object):
 
+    __slots__ = ('hash', 'task_id', 'path')
+
     def __init__(self, resource_hash, task_id=None, path=None):
         self.hash = resource_hash
         self.task_id = task_id
@@ -75,6 +79,8 @@ class Resource(object):
 
 class FileResource(Resource):
 
+    __slots__ = ('file_name',)
+
     def __init__(self, file_name, resource_hash, task_id=None, path=None):
         super(FileResource, self).__init__(resource_hash, task_id=task_id, path=path)
         self.file_name = norm_path(file_name)
@@ -93,6 +99,8 @@ class FileResource(Resource):
 
 class ResourceBundle(Resource):
 
+    __slots__ = ('_files', '_files_split')
+
     def __init__(self, files, bundle_hash, task_id=None, path=None):
         super(ResourceBundle, self).__init__(bundle_hash, task_id=task_id, path=path)
         self._files = None
@@ -113,14 +121,14 @@ class ResourceBundle(Resource):
 
     @files.setter
     def files(self, value):
-        if value:
-            self._files_split = [split_path(v) for v in value]
-        else:
-            self._files_split = []
+        # split on first use
+        self._files_split = None
         self._files = value
 
     @property
     def files_split(self):
+        if self._files_split is None:
+            self._files_split = [split_path(v) for v in self._files or []]
         return self._files_split[:]
 
     def contains_file(self, name):
@@ -130,7 +138,19 @@ class ResourceBundle(Resource):
         return False
 
 
+class _TaskResources(object):
+
+    __slots__ = ('task_id', 'prefix', 'resources')
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.prefix = None
+        self.resources = []
+
+
 class ResourceCache(object):
+    """ Indexes resources by hash, path and task. Resources of a task share
+    a single instance of the task id string. """
 
     def __init__(self):
         self._lock = Lock()
@@ -138,19 +158,17 @@ class ResourceCache(object):
         self._hash_to_res = dict()
         # path to resource
         self._path_to_res = dict()
-        # task to resources
-        self._task_to_res = dict()
-        # task to resource common prefix
-        self._task_to_prefix = dict()
+        # task to resources and their common prefix
+        self._tasks = dict()
 
     def add_resource(self, resource):
-        task_id = resource.task_id
-
         with self._lock:
-            resource_list = self._task_to_res.get(task_id)
-            if not resource_list:
-                self._task_to_res[task_id] = resource_list = list()
-            resource_list.append(resource)
+            task = self._tasks.get(resource.task_id)
+            if not task:
+                self._tasks[resource.task_id] = task = \
+                    _TaskResources(resource.task_id)
+            resource.task_id = task.task_id
+            task.resources.append(resource)
 
             self._hash_to_res[resource.hash] = resource
             self._path_to_res[resource.path] = resource
@@ -162,34 +180,74 @@ class ResourceCache(object):
         return self._path_to_res.get(resource_path, default)
 
     def has_resource(self, resource):
-        if resource.task_id and resource.task_id not in self._task_to_res:
+        if resource.task_id and resource.task_id not in self._tasks:
             return False
         if resource.hash and resource.hash not in self._hash_to_res:
             return False
         return resource.path in self._path_to_res
 
     def get_resources(self, task_id, default=None):
-        return self._task_to_res.get(task_id, default or [])
+        task = self._tasks.get(task_id)
+        if task and task.resources:
+            return task.resources
+        return default or []
 
     def set_prefix(self, task_id, prefix):
-        self._task_to_prefix[task_id] = norm_path(prefix)
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task:
+                self._tasks[task_id] = task = _TaskResources(task_id)
+            task.prefix = norm_path(prefix)
 
     def get_prefix(self, task_id, default=''):
-        return self._task_to_prefix.get(task_id, default)
+        task = self._tasks.get(task_id)
+        if task and task.prefix is not None:
+            return task.prefix
+        return default
 
     def remove(self, task_id):
-        resources = self._task_to_res.pop(task_id, [])
-        for r in resources:
-            self._hash_to_res.pop(r.hash, None)
-            self._path_to_res.pop(r.path, None)
-        self._task_to_prefix.pop(task_id, None)
-        return resources
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if not task:
+                return []
+            for r in task.resources:
+                # the same hash may be indexed for another task
+                if self._hash_to_res.get(r.hash) is r:
+                    del self._hash_to_res[r.hash]
+                if self._path_to_res.get(r.path) is r:
+                    del self._path_to_res[r.path]
+            return task.resources
 
     def clear(self):
         self._hash_to_res = dict()
         self._path_to_res = dict()
-        self._task_to_res = dict()
-        self._task_to_prefix = dict()
+        self._tasks = dict()
+
+    def memory_usage(self):
+        """ Estimate memory used by the cache, in bytes """
+        seen = set()
+
+        def size(obj):
+            if id(obj) in seen:
+                return 0
+            seen.add(id(obj))
+            return sys.getsizeof(obj)
+
+        total = size(self._hash_to_res) + size(self._path_to_res) + \
+            size(self._tasks)
+        for task_id, task in self._tasks.items():
+            total += size(task_id) + size(task) + size(task.resources)
+            if task.prefix:
+                total += size(task.prefix)
+            for r in task.resources:
+                total += size(r) + size(r.hash) + size(r.path)
+                for attr in ('file_name', '_files'):
+                    value = getattr(r, attr, None)
+                    if isinstance(value, list):
+                        total += size(value) + sum(size(v) for v in value)
+                    elif value is not None:
+                        total += size(value)
+        return total
 
 
 class ResourceStorage(object):
@@ -198,6 +256,8 @@ class ResourceStorage(object):
         self.dir_manager = dir_manager
         self.resource_dir_method = resource_dir_method
         self.cache = ResourceCache()
+        self.store = ResourceStore(dir_manager.get_resource_store_dir(),
+                                   tasks_dir=dir_manager.get_node_dir())
 
     def list_dir(self, dir_name):
         return self.dir_manager.list_dir_names(dir_name)
@@ -256,10 +316,9 @@ class ResourceStorage(object):
         elif os.path.isdir(dst_path):
             shutil.rmtree(dst_path)
 
-        if os.path.isfile(src_path):
-            shutil.copyfile(src_path, dst_path)
-        elif os.path.isdir(src_path):
-            copy_file_tree(src_path, dst_path)
+        if os.path.exists(src_path):
+            # files are linked from the resource store instead of copied
+            self.store.copy(src_path, dst_path, task_id)
         else:
             raise ValueError("Error reading source path: '{}'"
                              .format(src_path))
@@ -271,13 +330,9 @@ class ResourceStorage(object):
 class AbstractResourceManager(IClientHandler):
     __metaclass__ = abc.ABCMeta
 
-    lock = Lock()
-    queue_lock = Lock()
-
     def __init__(self, dir_manager, resource_dir_method=None):
 
-        self.download_queue = deque()
-        self.current_downloads = 0
+        self._download_scheduler = None
         self.storage = ResourceStorage(dir_manager, resource_dir_method
                                        or dir_manager.get_task_resource_dir)
         self.index_resources(self.storage.get_root())
@@ -289,6 +344,18 @@ class AbstractResourceManager(IClientHandler):
     def build_client_options(self, node_id, **kwargs):
         pass
 
+    @property
+    def download_scheduler(self):
+        # created on first use, config may be set after __init__
+        if self._download_scheduler is None:
+            self._download_scheduler = DownloadScheduler(
+                self.config.max_concurrent_downloads)
+        return self._download_scheduler
+
+    def set_download_priority(self, task_id, priority):
+        """ Download resources of tasks with higher priority first """
+        self.download_scheduler.set_task_priority(task_id, priority)
+
     def index_resources(self, dir_name, client=None, client_options=None):
         pass
 
@@ -327,6 +394,8 @@ class AbstractResourceManager(IClientHandler):
     def remove_task(self, task_id,
                     client=None, client_options=None):
 
+        self.download_scheduler.task_priorities.pop(task_id, None)
+        self.storage.store.remove_task(task_id)
         resources = self.storage.cache.remove(task_id)
         if resources:
             for resource in resources:
@@ -410,71 +479,31 @@ class AbstractResourceManager(IClientHandler):
     def pull_resource(self, entry, task_id,
                       success, error,
                       client=None, client_options=None, async=True, pin=True):
-
+        """ Download a resource. Requests for a resource that is already
+        being downloaded for the same task share that download.
+        :param success: called with (entry, task_id)
+        :param error: called with (exception, entry, task_id)
+        """
         resource = self._wrap_resource(entry, task_id)
 
         if self.storage.has_resource(resource):
             success(entry, task_id)
             return
 
-        def success_wrapper(response, **_):
-            self.__dec_downloads()
-            self._clear_retry(self.commands.get, resource.hash)
-
-            if pin:
-                self._cache_resource(resource)
-                self.pin_resource(resource.hash)
-
-            logger.debug("Resource manager: {} ({}) downloaded"
-                         .format(resource.path, resource.hash))
-
-            success(entry, task_id)
-            self.__process_queue()
-
-        def error_wrapper(exception, **_):
-            self.__dec_downloads()
-
-            if self._can_retry(exception, self.commands.get, resource.hash):
-                self.pull_resource(entry, task_id,
-                                   client_options=client_options,
-                                   success=success,
-                                   error=error,
-                                   async=async,
-                                   pin=pin)
-            else:
-                logger.error("Resource manager: error downloading {} ({}): {}"
-                             .format(resource.path, resource.hash, exception))
-
-                error(exception, entry, task_id)
-                self.__process_queue()
-
         make_path_dirs(self.storage.get_path(resource.path, task_id))
-        local = self.storage.cache.get_by_hash(resource.hash)
-
-        if local:
 
-            self.__inc_downloads()
-            try:
-                self.storage.copy(local.path, resource.path, task_id)
-            except Exception as exc:
-                error_wrapper(exc)
-            else:
-                success_wrapper(entry)
+        # keep the task's stored files while its resources are downloaded
+        # and used, until release_task is called
+        self.storage.store.pin(task_id)
 
+        key = (task_id, resource.hash, resource.path)
+        params = (resource, task_id, client, client_options, async, pin)
+        if self.download_scheduler.add(key, task_id, params,
+                                       (entry, success, error)):
+            self.__process_queue()
         else:
-
-            if self.__can_download():
-                self.__inc_downloads()
-                self.__pull(resource, task_id,
-                            success=success_wrapper,
-                            error=error_wrapper,
-                            client=client,
-                            client_options=client_options,
-                            async=async)
-            else:
-                self.__push_to_queue(entry, task_id,
-                                     success, error,
-                                     client, client_options, async, pin)
+            logger.debug("Resource manager: {} ({}) is already being "
+                         "downloaded".format(resource.path, resource.hash))
 
     def command_failed(self, exc, cmd, obj_id, **kwargs):
         logger.error("Resource manager: Error executing command '{}': {}"
@@ -544,32 +573,88 @@ class AbstractResourceManager(IClientHandler):
             except Exception as e:
                 error(e)
 
-    def __can_download(self):
-        max_dl = self.config.max_concurrent_downloads
-        with self.lock:
-            return max_dl < 1 or self.current_downloads < max_dl
+    def __process_queue(self):
+        download = self.download_scheduler.next()
+        while download:
+            self.__start_download(download)
+            download = self.download_scheduler.next()
 
-    def __inc_downloads(self):
-        with self.lock:
-            self.current_downloads += 1
+    def __start_download(self, download):
+        resource, task_id, client, client_options, async, _ = download.params
+        local = self.storage.cache.get_by_hash(resource.hash)
 
-    def __dec_downloads(self):
-        with self.lock:
-            self.current_downloads -= 1
+        if local:
+            try:
+                self.storage.copy(local.path, resource.path, task_id)
+            except Exception as exc:
+                self.__download_failed(download, exc)
+            else:
+                self.__download_finished(download)
+        else:
+            self.storage.store.release(resource.path)
+            self.__pull(resource, task_id,
+                        success=lambda *_, **__:
+                        self.__download_pulled(download),
+                        error=lambda exc, **_:
+                        self.__download_failed(download, exc),
+                        client=client,
+                        client_options=client_options,
+                        async=async)
+
+    def __download_pulled(self, download):
+        resource, task_id = download.params[:2]
+        size = 0
+
+        if resource.exists:
+            size = os.path.getsize(resource.path) \
+                if os.path.isfile(resource.path) else 0
+            try:
+                self.storage.store.add(resource.path, task_id)
+            except Exception as exc:
+                logger.warning("Resource manager: cannot store {} ({}): {}"
+                               .format(resource.path, resource.hash, exc))
 
-    def __push_to_queue(self, *params):
-        with self.queue_lock:
-            self.download_queue.append(params)
+        self.__download_finished(download, size)
 
-    def __process_queue(self):
-        params = None
+    def __download_finished(self, download, size=0):
+        resource, task_id, _, _, _, pin = download.params
+        self._clear_retry(self.commands.get, resource.hash)
 
-        with self.queue_lock:
-            if self.download_queue:
-                params = self.download_queue.popleft()
+        if pin:
+            self._cache_resource(resource)
+            self.pin_resource(resource.hash)
+
+        logger.debug("Resource manager: {} ({}) downloaded"
+                     .format(resource.path, resource.hash))
+
+        for entry, success, _ in self.download_scheduler.finish(download.key,
+                                                                size):
+            success(entry, task_id)
+        self.__process_queue()
+
+    def __download_failed(self, download, exception):
+        resource, task_id = download.params[:2]
+
+        if self._can_retry(exception, self.commands.get, resource.hash):
+            # keep the download slot, partial HTTP downloads are resumed
+            self.__start_download(download)
+            return
 
-        if params:
-            self.pull_resource(*params)
+        logger.error("Resource manager: error downloading {} ({}): {}"
+                     .format(resource.path, resource.hash, exception))
+
+        for entry, _, error in self.download_scheduler.fail(download.key):
+            error(exception, entry, task_id)
+        # the task won't be computed
+        self.release_task(task_id)
+        self.__process_queue()
+
+    def release_task(self, task_id):
+        """ Allow evicting stored files of a task that is no longer
+        computed, unless more of its resources are being downloaded """
+        if not self.download_scheduler.has_downloads(task_id):
+            self.download_scheduler.task_priorities.pop(task_id, None)
+            self.storage.store.unpin(task_id)
 
 
 class TestResourceManager(AbstractResourceManager, ClientHandler):
@@ -0,0 +1,235 @@
+import logging
+import os
+import shutil
+from collections import OrderedDict
+from threading import Lock
+
+from golem.resource.client import file_multihash
+
+logger = logging.getLogger(__name__)
+
+
+def link_file(src_path, dst_path):
+    """ Hard link a file, copy it if hard links are not supported """
+    try:
+        os.link(src_path, dst_path)
+    except (AttributeError, OSError):
+        shutil.copyfile(src_path, dst_path)
+
+
+class ResourceStore(object):
+    """ Content-addressed store of resource files. Each file is kept once,
+    under its multihash, and resource files of tasks are hard links to the
+    stored files, so files shared by several tasks take disk space and
+    have to be downloaded only once.
+
+    When the size of the store exceeds max_size, least recently used files
+    are removed from the store, together with their links in task
+    directories. Files of pinned tasks are never removed.
+
+    Files from outside of the task directories, eg. original resources of
+    a requested task, are copied to the store instead, since they may be
+    changed in place.
+    """
+
+    def __init__(self, root_dir, max_size=0, tasks_dir=None):
+        """
+        :param str root_dir: directory of stored files
+        :param int max_size: store size limit in bytes, 0 for no limit
+        :param str tasks_dir: directory containing task directories
+        """
+        self.root_dir = root_dir
+        self.tasks_dir = tasks_dir
+        self.max_size = max_size
+        self.size = 0
+
+        self.hits = 0  # resources linked from the store
+        self.misses = 0  # resources downloaded
+        self.saved = 0  # bytes of downloaded files that were already stored
+        self.evictions = 0
+
+        self._lock = Lock()
+        self._files = OrderedDict()  # multihash -> size, least recent first
+        self._links = dict()  # path -> (multihash, task_id)
+        self._pinned = set()
+
+        self._load()
+
+    def get_path(self, multihash):
+        return os.path.join(self.root_dir, multihash)
+
+    def has_file(self, multihash):
+        return multihash in self._files
+
+    def add(self, path, task_id):
+        """ Store downloaded file or directory of a task, replacing files that
+        are already stored with links
+        """
+        with self._lock:
+            for file_path in self._walk(path):
+                self._add_file(file_path, task_id)
+            self.misses += 1
+            self._evict()
+
+    def copy(self, src_path, dst_path, task_id):
+        """ Link file or directory into a task directory. Source files that
+        are not stored yet are added to the store
+        """
+        src_path = os.path.normpath(src_path)
+        dst_path = os.path.normpath(dst_path)
+
+        with self._lock:
+            for file_path in self._walk(src_path):
+                multihash = self._add_file(file_path, None)
+                target = os.path.join(dst_path,
+                                      os.path.relpath(file_path, src_path)) \
+                    if file_path != src_path else dst_path
+                self._link(multihash, target, task_id)
+            self.hits += 1
+            self._evict()
+
+    def release(self, path):
+        """ Remove a link to a stored file before the file is overwritten,
+        so the stored file stays intact
+        """
+        with self._lock:
+            linked = self._links.pop(path, None)
+            # links created before a restart are not known
+            if linked or os.path.isfile(path) and os.stat(path).st_nlink > 1:
+                os.remove(path)
+
+    def pin(self, task_id):
+        """ Keep files of a task in the store """
+        with self._lock:
+            self._pinned.add(task_id)
+
+    def unpin(self, task_id):
+        with self._lock:
+            self._pinned.discard(task_id)
+            self._evict()
+
+    def remove_task(self, task_id):
+        """ Forget links of a task, its files stay in the task directory """
+        with self._lock:
+            self._pinned.discard(task_id)
+            for path, (_, link_task_id) in self._links.items():
+                if link_task_id == task_id:
+                    del self._links[path]
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return dict(
+            files=len(self._files),
+            size=self.size,
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=float(self.hits) / requests if requests else 0.,
+            saved=self.saved,
+            evictions=self.evictions
+        )
+
+    def _load(self):
+        if not os.path.isdir(self.root_dir):
+            os.makedirs(self.root_dir)
+
+        files = []
+        for name in os.listdir(self.root_dir):
+            stat = os.stat(self.get_path(name))
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, multihash, size in sorted(files):
+            self._files[multihash] = size
+            self.size += size
+
+    @staticmethod
+    def _walk(path):
+        if os.path.isdir(path):
+            for src_dir, _, files in os.walk(path):
+                for f in files:
+                    yield os.path.join(src_dir, f)
+        else:
+            yield path
+
+    def _add_file(self, path, task_id):
+        link = self._links.get(path)
+        if link and os.path.exists(path):
+            self._touch(link[0])
+            return link[0]
+
+        multihash = file_multihash(path)
+        stored_path = self.get_path(multihash)
+
+        if multihash in self._files:
+            if task_id is not None:
+                self.saved += self._files[multihash]
+                self._link(multihash, path, task_id)
+            else:
+                self._touch(multihash)
+            return multihash
+
+        if task_id is not None or self._in_tasks_dir(path):
+            link_file(path, stored_path)
+        else:
+            shutil.copyfile(path, stored_path)
+        size = os.path.getsize(stored_path)
+        self._files[multihash] = size
+        self.size += size
+        if task_id is not None:
+            self._links[path] = (multihash, task_id)
+        return multihash
+
+    def _in_tasks_dir(self, path):
+        if not self.tasks_dir:
+            return False
+        tasks_dir = os.path.join(os.path.abspath(self.tasks_dir), '')
+        return os.path.abspath(path).startswith(tasks_dir)
+
+    def _link(self, multihash, path, task_id):
+        parent = os.path.dirname(path)
+        if parent and not os.path.isdir(parent):
+            os.makedirs(parent)
+        if os.path.lexists(path):
+            os.remove(path)
+
+        link_file(self.get_path(multihash), path)
+        self._links[path] = (multihash, task_id)
+        self._touch(multihash)
+
+    def _touch(self, multihash):
+        self._files[multihash] = self._files.pop(multihash)
+
+    def _evict(self):
+        if self.max_size < 1 or self.size <= self.max_size:
+            return
+
+        pinned = set(multihash for multihash, task_id
+                     in self._links.values() if task_id in self._pinned)
+        links = dict()
+        for path, (multihash, _) in self._links.items():
+            links.setdefault(multihash, []).append(path)
+
+        for multihash in list(self._files):
+            if self.size <= self.max_size:
+                break
+            if multihash in pinned:
+                continue
+
+            for path in links.get(multihash, []):
+                del self._links[path]
+                self._remove(path)
+            self._remove(self.get_path(multihash))
+            self.size -= self._files.pop(multihash)
+            self.evictions += 1
+
+        if self.size > self.max_size:
+            logger.warning("Resource store: size %r exceeds the limit of %r "
+                           "bytes, files of pinned tasks can't be removed",
+                           self.size, self.max_size)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError as exc:
+            logger.warning("Resource store: can't remove %r: %r", path, exc)
@@ -114,6 +114,14 @@ class DirManager(object):
         full_path = self.__get_global_resource_path()
         return self.get_dir(full_path, create, "resource dir does not exist")
 
+    def get_resource_store_dir(self, create=True):
+        """ Get directory of the content-addressed resource store
+        :param bool create: *Default: True* should directory be created if it doesn't exist
+        :return str: path to directory
+        """
+        full_path = os.path.join(self.__get_global_resource_path(), "store")
+        return self.get_dir(full_path, create, "resource store dir does not exist")
+
     def get_task_temporary_dir(self, task_id, create=True):
         """ Get temporary directory
         :param task_id:
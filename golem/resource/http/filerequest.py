@@ -20,21 +20,44 @@ class FileRequest(Request):
 
 
 class DownloadFileRequest(FileRequest):
+    """ Downloads a file to a partial file first, which is renamed when
+    complete. When a download is retried, the partial file is resumed with
+    a range request if the server supports it. """
+
     def __init__(self, file_hash, file_path, stream=True, **kwargs):
         super(DownloadFileRequest, self).__init__(file_path)
         self.file_hash = file_hash
         self.stream = stream
+        self.part_path = '{}.{}.part'.format(file_path, file_hash)
 
     def run(self, url, headers=None, **kwargs):
+        headers = dict(headers or {})
+        offset = 0
+        if os.path.isfile(self.part_path):
+            offset = os.path.getsize(self.part_path)
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+
         r = requests.get(url + '/' + str(self.file_hash),
                          headers=headers,
                          stream=self.stream)
+        if offset and r.status_code == 416:
+            # partial file is not valid anymore
+            os.remove(self.part_path)
+            del headers['Range']
+            return self.run(url, headers=headers, **kwargs)
         r.raise_for_status()
 
-        with open(self.file_path, 'wb') as f:
+        # servers without range support send the whole file
+        mode = 'ab' if offset and r.status_code == 206 else 'wb'
+        with open(self.part_path, mode) as f:
             for chunk in r.iter_content(chunk_size=1024):
                 if chunk:
                     f.write(chunk)
+
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+        os.rename(self.part_path, self.file_path)
         return self.file_path
 
 
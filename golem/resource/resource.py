@@ -40,8 +40,9 @@ class TaskResourceHeader(object):
         cur_th = TaskResourceHeader(dir_name)
 
         abs_dirs = split_path(absolute_root)
+        hashes = SimpleHash.hash_files_base64(chosen_files)
 
-        for f in chosen_files:
+        for f, hsh in zip(chosen_files, hashes):
 
             dir_, file_name = os.path.split(f)
             dirs = split_path(dir_)[len(abs_dirs):]
@@ -57,7 +58,6 @@ class TaskResourceHeader(object):
                     last_header.sub_dir_headers.append(child_sub_dir_header)
                     last_header = child_sub_dir_header
 
-            hsh = SimpleHash.hash_file_base64(f)
             last_header.files_data.append((file_name, hsh))
 
         return cur_th
@@ -69,13 +69,10 @@ class TaskResourceHeader(object):
         dirs = [name for name in os.listdir(absolute_root) if os.path.isdir(os.path.join(absolute_root, name))]
         files = [name for name in os.listdir(absolute_root) if os.path.isfile(os.path.join(absolute_root, name))]
 
-        files_data = []
-        for f in files:
-            if chosen_files and os.path.join(absolute_root, f) not in chosen_files:
-                continue
-            hsh = SimpleHash.hash_file_base64(os.path.join(absolute_root, f))
-
-            files_data.append((f, hsh))
+        if chosen_files:
+            files = [f for f in files if os.path.join(absolute_root, f) in chosen_files]
+        hashes = SimpleHash.hash_files_base64([os.path.join(absolute_root, f) for f in files])
+        files_data = zip(files, hashes)
 
         # print "{}, {}, {}".format(relative_root, absolute_root, files_data)
 
@@ -98,8 +95,9 @@ class TaskResourceHeader(object):
         cur_th = TaskResourceHeader(header.dir_name)
 
         abs_dirs = split_path(absolute_root)
+        hashes = SimpleHash.hash_files_base64(chosen_files)
 
-        for file_ in chosen_files:
+        for file_, hsh in zip(chosen_files, hashes):
 
             dir_, file_name = os.path.split(file_)
             dirs = split_path(dir_)[len(abs_dirs):]
@@ -109,7 +107,6 @@ class TaskResourceHeader(object):
 
             last_header, last_ref_header, ref_header_found = cls.__resolve_dirs(dirs, last_header, last_ref_header)
 
-            hsh = SimpleHash.hash_file_base64(file_)
             if ref_header_found:
                 if last_ref_header.__has_file(file_name):
                     if hsh == last_ref_header.__get_file_hash(file_name):
@@ -125,8 +122,11 @@ class TaskResourceHeader(object):
         cur_th = TaskResourceHeader(header.dir_name)
         abs_dirs = split_path(absolute_root)
         delta_parts = []
+        res_files = res_parts.keys()
+        hashes = SimpleHash.hash_files_base64(res_files)
 
-        for file_, parts in res_parts.iteritems():
+        for file_, hsh in zip(res_files, hashes):
+            parts = res_parts[file_]
             dir_, file_name = os.path.split(file_)
             dirs = split_path(dir_)[len(abs_dirs):]
 
@@ -135,7 +135,6 @@ class TaskResourceHeader(object):
 
             last_header, last_ref_header, ref_header_found = cls.__resolve_dirs(dirs, last_header, last_ref_header)
 
-            hsh = SimpleHash.hash_file_base64(file_)
             if ref_header_found:
                 if last_ref_header.__has_file(file_name):
                     if hsh == last_ref_header.__get_file_hash(file_name):
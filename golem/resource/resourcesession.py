@@ -1,6 +1,7 @@
 import logging
 
 
+from golem.core.channelcipher import ChannelCipher
 from golem.network.transport import message
 from golem.network.transport.session import BasicSafeSession
 from golem.network.transport import tcpnetwork
@@ -73,6 +74,8 @@ class ResourceSession(BasicSafeSession):
         :return str: encrypted data or unchanged message
                      (if resource server doesn't exist)
         """
+        if self.send_cipher:
+            return self.send_cipher.encrypt(data)
         if self.resource_server:
             return self.resource_server.encrypt(data, self.key_id)
         logger.warning("Can't encrypt message - no resource_server")
@@ -85,6 +88,8 @@ class ResourceSession(BasicSafeSession):
         :param str data: data to be decrypted
         :return str: decrypted data
         """
+        if ChannelCipher.is_channel_frame(data):
+            return self._decrypt_channel_frame(data)
         if self.resource_server is None:
             return data
         try:
@@ -259,5 +264,6 @@ class ResourceSession(BasicSafeSession):
             return
         self.verified = True
         self.resource_server.verified_conn(self.conn_id)
+        self.start_channel()
         while self.msgs_to_send:
             self.send(self.msgs_to_send.pop(0))
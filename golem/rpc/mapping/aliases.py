@@ -25,6 +25,7 @@ class Environment(object):
     use_transaction_system  = 'env.use_transaction_system'
 
     datadir                 = 'env.datadir'
+    tick_stats              = 'env.tick.stats'
 
     evt_opts_changed        = 'evt.env.opts'
 
@@ -82,6 +83,8 @@ class Task(object):
     tasks_load_presets      = 'comp.tasks.preset.get'
     tasks_remove_preset     = 'comp.tasks.preset.delete'
     tasks_estimated_cost    = 'comp.tasks.estimated.cost'
+    tasks_verification_stats = 'comp.tasks.verification.stats'
+    tasks_signature_stats   = 'comp.tasks.signature.stats'
 
     task                    = 'comp.task'
     task_cost               = 'comp.task.cost'
@@ -118,6 +121,8 @@ class Resources(object):
 
     clear_directory         = 'res.dir.clear'
 
+    stream_stats            = 'res.stream.stats'
+
     evt_limit_exceeded      = 'evt.res.limit.exceeded'
 
 
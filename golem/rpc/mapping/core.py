@@ -6,6 +6,7 @@ CORE_METHOD_MAP = dict(
     get_setting=            Environment.opt,
     update_setting=         Environment.opt_update,
     get_datadir=            Environment.datadir,
+    get_tick_stats=         Environment.tick_stats,
     get_description=        Environment.opt_description,
     change_description=     Environment.opt_description_update,
 
@@ -49,6 +50,8 @@ CORE_METHOD_MAP = dict(
     get_task_presets=       Task.tasks_load_presets,
     delete_task_preset=     Task.tasks_remove_preset,
     get_estimated_cost=     Task.tasks_estimated_cost,
+    get_verification_stats= Task.tasks_verification_stats,
+    get_header_signature_stats=Task.tasks_signature_stats,
 
     get_task=               Task.task,
     get_task_cost=          Task.task_cost,
@@ -72,6 +75,7 @@ CORE_METHOD_MAP = dict(
     get_res_dir=            Resources.directory,
     get_res_dirs_sizes=     Resources.directories_size,
     clear_dir=              Resources.clear_directory,
+    get_stream_stats=       Resources.stream_stats,
 
     get_status=             Computation.status,
     get_environments=       Computation.environments,
@@ -1,10 +1,12 @@
 import abc
 import os
-import uuid
 import zipfile
+import zlib
+from contextlib import contextmanager
 
 from golem.core.fileencrypt import AESFileEncryptor
 from golem.core.simpleserializer import CBORSerializer
+from golem.core.zipstream import ZipStreamReader, ZipStreamWriter
 from golem.task.taskbase import result_types
 
 
@@ -73,50 +75,58 @@ class ZipPackager(Packager):
 
 
 class EncryptingPackager(Packager):
+    """ Creates encrypted zip packages in a single pass: files are
+    compressed and encrypted while they are read, and decrypted and
+    extracted while the package is read, without temporary files. """
 
-    creator_class = ZipPackager
     encryptor_class = AESFileEncryptor
 
-    def __init__(self, key_or_secret):
-
-        self._creator = self.creator_class()
+    # files in these formats are compressed already, they are only stored
+    stored_extensions = ('.exr', '.png', '.jpg', '.jpeg', '.gif', '.tga',
+                         '.zip', '.gz', '.bz2', '.7z')
+
+    def __init__(self, key_or_secret,
+                 compress_level=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        :param key_or_secret: encryption secret
+        :param int compress_level: zlib compression level, 0 stores files
+        without compression
+        """
         self.key_or_secret = key_or_secret
-
-    def create(self, output_path, disk_files=None, cbor_files=None, **kwargs):
-
-        output_dir = os.path.dirname(output_path)
-        pkg_file_path = os.path.join(output_dir, str(uuid.uuid4()) + ".pkg")
-        out_file_path = super(EncryptingPackager, self).create(pkg_file_path,
-                                                               disk_files=disk_files,
-                                                               cbor_files=cbor_files)
-
-        self.encryptor_class.encrypt(out_file_path,
-                                     output_path,
-                                     self.key_or_secret)
-        return output_path
+        self.compress_level = compress_level
 
     def extract(self, input_path, output_dir=None, **kwargs):
 
-        input_dir = os.path.dirname(input_path)
-        tmp_file_path = os.path.join(input_dir, str(uuid.uuid4()) + ".dec")
+        if not output_dir:
+            output_dir = os.path.dirname(input_path)
 
-        self.encryptor_class.decrypt(input_path,
-                                     tmp_file_path,
-                                     self.key_or_secret)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
 
-        os.remove(input_path)
-        os.rename(tmp_file_path, input_path)
+        with open(input_path, 'rb') as src:
+            reader = self.encryptor_class.decrypting_reader(src,
+                                                            self.key_or_secret)
+            extracted = ZipStreamReader(reader).extract_all(output_dir)
 
-        return self._creator.extract(input_path, output_dir=output_dir)
+        return extracted, output_dir
 
+    @contextmanager
     def generator(self, output_path):
-        return self._creator.generator(output_path)
+        with open(output_path, 'wb') as dst:
+            writer = self.encryptor_class.encrypting_writer(dst,
+                                                            self.key_or_secret)
+            with ZipStreamWriter(writer, self.compress_level) as zf:
+                yield zf
+            writer.close()
 
     def write_disk_file(self, obj, file_path, file_name):
-        self._creator.write_disk_file(obj, file_path, file_name)
+        compress_level = None
+        if os.path.splitext(file_name)[1].lower() in self.stored_extensions:
+            compress_level = 0
+        obj.write(file_path, file_name, compress_level=compress_level)
 
     def write_cbor_file(self, obj, file_name, cbord_data):
-        self._creator.write_cbor_file(obj, file_name, cbord_data)
+        obj.writestr(file_name, cbord_data)
 
 
 class TaskResultDescriptor(object):
@@ -137,9 +147,10 @@ class EncryptingTaskResultPackager(EncryptingPackager):
     descriptor_file_name = '.package_desc'
     result_file_name = '.result_cbor'
 
-    def __init__(self, key_or_secret):
+    def __init__(self, key_or_secret,
+                 compress_level=zlib.Z_DEFAULT_COMPRESSION):
         self.parent = super(EncryptingTaskResultPackager, self)
-        self.parent.__init__(key_or_secret)
+        self.parent.__init__(key_or_secret, compress_level)
 
     def create(self, output_path,
                disk_files=None, cbor_files=None,
@@ -212,11 +212,16 @@ class Task(object):
         return False
 
     @abc.abstractmethod
-    def computation_finished(self, subtask_id, task_result, result_type=0):
+    def computation_finished(self, subtask_id, task_result, result_type=0,
+                             verification_scheduler=None):
         """ Inform about finished subtask
         :param subtask_id: finished subtask id
         :param task_result: task result, can be binary data or list of files
         :param result_type: result_types representation
+        :param VerificationScheduler|None verification_scheduler: scheduler
+        that may be used to verify the result outside the reactor thread
+        :return None|Deferred: Deferred firing when the result has been
+        verified, if the verification has been scheduled
         """
         return  # Implement in derived class
 
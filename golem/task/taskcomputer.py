@@ -2,6 +2,7 @@ import logging
 import os
 import time
 import uuid
+from collections import deque
 from threading import Lock
 
 from pydispatch import dispatcher
@@ -38,6 +39,12 @@ class CompStats(object):
 class TaskComputer(object):
     """ TaskComputer is responsible for task computations that take place in Golem application. Tasks are started
     in separate threads.
+
+    Up to max_concurrent_subtasks subtasks are computed at the same time, each in its own computation slot with a
+    share of configured CPU cores and memory. Subtasks are negotiated one at a time: a new task is requested when
+    there's no pending request and fewer subtasks are computed, ready to compute or negotiated than there are slots
+    plus prefetch_subtasks. Prefetched subtasks get their resources while other subtasks are computed and start as
+    soon as a slot is freed.
     """
 
     lock = Lock()
@@ -59,6 +66,12 @@ class TaskComputer(object):
         self.current_computations = []
         self.last_task_request = time.time()
 
+        self.max_concurrent_subtasks = 1
+        self.prefetch_subtasks = 0
+        self.free_slots = [0]
+        self.computation_slots = {}  # subtask_id -> slot of a running computation
+        self.ready_subtasks = deque()  # subtasks waiting for a free slot
+
         self.waiting_ttl = 0
         self.last_checking = time.time()
 
@@ -93,10 +106,11 @@ class TaskComputer(object):
         self.stats = IntStatsKeeper(CompStats)
 
         self.assigned_subtasks = {}
-        self.task_to_subtask_mapping = {}
+        self.task_to_subtask_mapping = {}  # task_id -> ids of subtasks waiting for the task's resources
+        self.waiting_for_resources = None  # subtask which resources were requested last
         self.max_assigned_tasks = 1
 
-        self.delta = None
+        self.deltas = {}  # task_id -> resources delta to unpack
         self.last_task_timeout_checking = None
         self.support_direct_computation = False
         self.compute_tasks = task_server.config_desc.accept_tasks
@@ -105,22 +119,24 @@ class TaskComputer(object):
         if ctd.subtask_id not in self.assigned_subtasks:
             self.wait(ttl=self.waiting_for_task_timeout)
             self.assigned_subtasks[ctd.subtask_id] = ctd
-            self.task_to_subtask_mapping[ctd.task_id] = ctd.subtask_id
+            self.task_to_subtask_mapping.setdefault(ctd.task_id, []).append(ctd.subtask_id)
+            if ctd.deadline:
+                # resources of subtasks that are due sooner come first
+                self.task_server.set_resources_priority(ctd.task_id,
+                                                        -ctd.deadline)
             self.__request_resource(ctd.task_id, self.resource_manager.get_resource_header(ctd.task_id),
                                     ctd.return_address, ctd.return_port, ctd.key_id, ctd.task_owner)
+            self.waiting_for_resources = ctd.subtask_id
             return True
         else:
             return False
 
     def resource_given(self, task_id):
         if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping[task_id]
-            if subtask_id in self.assigned_subtasks:
-                subtask = self.assigned_subtasks[subtask_id]
-                timeout = deadline_to_timeout(subtask.deadline)
-                self.__compute_task(subtask_id, subtask.docker_images,
-                                    subtask.src_code, subtask.extra_data,
-                                    subtask.short_description, timeout)
+            subtask_ids = self.__pop_waiting_subtasks(task_id)
+            for subtask_id in subtask_ids:
+                self.__compute_task(subtask_id)
+            if subtask_ids:
                 self.waiting_for_task = None
                 return True
             else:
@@ -128,23 +144,23 @@ class TaskComputer(object):
 
     def task_resource_collected(self, task_id, unpack_delta=True):
         if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping[task_id]
-            if subtask_id in self.assigned_subtasks:
-                subtask = self.assigned_subtasks[subtask_id]
+            delta = self.deltas.pop(task_id, None)
+            subtask_ids = self.__pop_waiting_subtasks(task_id)
+            if subtask_ids:
                 if unpack_delta:
-                    self.task_server.unpack_delta(self.dir_manager.get_task_resource_dir(task_id), self.delta, task_id)
-                self.delta = None
+                    self.task_server.unpack_delta(self.dir_manager.get_task_resource_dir(task_id), delta, task_id)
                 self.last_task_timeout_checking = time.time()
-                self.__compute_task(subtask_id, subtask.docker_images, subtask.src_code, subtask.extra_data,
-                                    subtask.short_description, deadline_to_timeout(subtask.deadline))
+                # all subtasks of the task share its resources
+                for subtask_id in subtask_ids:
+                    self.__compute_task(subtask_id)
                 return True
             return False
 
     def task_resource_failure(self, task_id, reason):
         if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping.pop(task_id)
-            if subtask_id in self.assigned_subtasks:
-                subtask = self.assigned_subtasks.pop(subtask_id)
+            self.deltas.pop(task_id, None)
+            for subtask_id in self.__pop_waiting_subtasks(task_id):
+                subtask = self.__drop_subtask(subtask_id)
                 self.task_server.send_task_failed(subtask_id, subtask.task_id,
                                                   'Error downloading resources: {}'.format(reason),
                                                   subtask.return_address, subtask.return_port, subtask.key_id,
@@ -152,10 +168,8 @@ class TaskComputer(object):
             self.session_closed()
 
     def wait_for_resources(self, task_id, delta):
-        if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping[task_id]
-            if subtask_id in self.assigned_subtasks:
-                self.delta = delta
+        if self.__waiting_subtasks(task_id):
+            self.deltas[task_id] = delta
 
     def task_request_rejected(self, task_id, reason):
         logger.info("Task {} request rejected: {}".format(task_id, reason))
@@ -163,7 +177,13 @@ class TaskComputer(object):
     def resource_request_rejected(self, subtask_id, reason):
         logger.info("Task {} resource request rejected: {}".format(subtask_id,
                                                                    reason))
-        self.assigned_subtasks.pop(subtask_id, None)
+        # resources are requested for a task, so task id may be given
+        if subtask_id in self.task_to_subtask_mapping:
+            self.deltas.pop(subtask_id, None)
+            for id_ in self.__pop_waiting_subtasks(subtask_id):
+                self.__drop_subtask(id_)
+        else:
+            self.__drop_subtask(subtask_id)
         self.reset()
 
     def task_computed(self, task_thread):
@@ -175,12 +195,14 @@ class TaskComputer(object):
                 self.current_computations.remove(task_thread)
             except ValueError: # not in list
                 pass
+            self.__free_slot(task_thread.subtask_id)
+        # start a prefetched subtask before the results are handled
+        self.__compute_ready_subtasks()
 
         time_ = task_thread.end_time - task_thread.start_time
         subtask_id = task_thread.subtask_id
-        try:
-            subtask = self.assigned_subtasks.pop(subtask_id)
-        except KeyError:
+        subtask = self.__drop_subtask(subtask_id)
+        if subtask is None:
             logger.error("No subtask with id %r", subtask_id)
             return
 
@@ -206,24 +228,39 @@ class TaskComputer(object):
                                               subtask.return_address, subtask.return_port, subtask.key_id,
                                               subtask.task_owner, self.node_name)
             dispatcher.send(signal='golem.monitor', event='computation_time_spent', success=False, value=time_)
-        self.counting_task = None
+
+        if not self.current_computations:
+            self.counting_task = None
 
     def run(self):
-        if self.counting_task:
-            for task_thread in self.current_computations:
-                task_thread.check_timeout()
-        elif self.compute_tasks and self.runnable:
+        for task_thread in list(self.current_computations):
+            task_thread.check_timeout()
+        self.__drop_expired_subtasks()
+
+        if self.compute_tasks and self.runnable:
             if not self.waiting_for_task:
                 if time.time() - self.last_task_request > self.task_request_frequency:
-                    if len(self.current_computations) == 0:
+                    if self.can_take_subtask():
                         self.__request_task()
             elif self.use_waiting_ttl:
                 time_ = time.time()
                 self.waiting_ttl -= time_ - self.last_checking
                 self.last_checking = time_
                 if self.waiting_ttl < 0:
+                    # there was no answer for the resource request
+                    if self.waiting_for_resources in self.__waiting_subtasks():
+                        self.__drop_subtask(self.waiting_for_resources)
                     self.reset()
 
+    def can_take_subtask(self):
+        """ Check whether another subtask can be assigned, either to a free slot or to be prefetched. Computed
+        subtasks, subtasks ready to compute and the negotiated one are counted, so subtasks which resources
+        never come do not stop requesting new tasks """
+        used = len(self.computation_slots) + len(self.ready_subtasks)
+        if self.waiting_for_task:
+            used += 1
+        return used < self.max_concurrent_subtasks + self.prefetch_subtasks
+
     def get_progresses(self):
         ret = {}
         for c in self.current_computations:
@@ -240,7 +277,21 @@ class TaskComputer(object):
         self.waiting_for_task_timeout = config_desc.waiting_for_task_timeout
         self.waiting_for_task_session_timeout = config_desc.waiting_for_task_session_timeout
         self.compute_tasks = config_desc.accept_tasks
+        self.change_slots(config_desc.max_concurrent_subtasks, config_desc.prefetch_subtasks)
         self.change_docker_config(config_desc, run_benchmarks, in_background)
+
+    def change_slots(self, max_concurrent_subtasks, prefetch_subtasks=0):
+        try:
+            max_concurrent_subtasks = max(1, int(max_concurrent_subtasks))
+            prefetch_subtasks = max(0, int(prefetch_subtasks))
+        except (TypeError, ValueError):
+            max_concurrent_subtasks, prefetch_subtasks = 1, 0
+
+        with self.lock:
+            self.max_concurrent_subtasks = max_concurrent_subtasks
+            self.prefetch_subtasks = prefetch_subtasks
+            used = set(self.computation_slots.values())
+            self.free_slots = [slot for slot in xrange(self.max_concurrent_subtasks) if slot not in used]
     
     def _validate_task_state(self, task_state):
         td = task_state.definition
@@ -352,7 +403,7 @@ class TaskComputer(object):
         self.session_closed()
 
     def session_closed(self):
-        if not self.counting_task:
+        if not self.counting_task or self.can_take_subtask():
             self.reset()
 
     def wait(self, wait=True, ttl=None):
@@ -363,15 +414,17 @@ class TaskComputer(object):
             self.waiting_ttl = ttl
 
     def reset(self, computing_task=False):
-        self.counting_task = computing_task
+        if computing_task or not self.current_computations:
+            self.counting_task = computing_task
         self.use_waiting_ttl = False
         self.task_requested = False
         self.waiting_for_task = None
+        self.waiting_for_resources = None
         self.waiting_ttl = 0
 
     def __request_task(self):
         with self.lock:
-            perform_request = not self.waiting_for_task and not self.counting_task
+            perform_request = not self.waiting_for_task and self.can_take_subtask()
 
         if not perform_request:
             return
@@ -391,14 +444,83 @@ class TaskComputer(object):
                                                                   key_id,
                                                                   task_owner)
 
-    def __compute_task(self, subtask_id, docker_images,
-                       src_code, extra_data, short_desc, task_timeout):
-
+    def __compute_task(self, subtask_id):
         task_id = self.assigned_subtasks[subtask_id].task_id
-        working_dir = self.assigned_subtasks[subtask_id].working_directory
+        self.reset(computing_task=task_id)
+
+        with self.lock:
+            if subtask_id in self.ready_subtasks or subtask_id in self.computation_slots:
+                return
+            self.ready_subtasks.append(subtask_id)
+        self.__compute_ready_subtasks()
+
+    def __waiting_subtasks(self, task_id=None):
+        """ Return ids of assigned subtasks waiting for resources of a task or of any task """
+        if task_id is None:
+            ids = [id_ for ids in self.task_to_subtask_mapping.itervalues() for id_ in ids]
+        else:
+            ids = self.task_to_subtask_mapping.get(task_id, [])
+        return [id_ for id_ in ids if id_ in self.assigned_subtasks]
+
+    def __pop_waiting_subtasks(self, task_id):
+        subtask_ids = self.__waiting_subtasks(task_id)
+        self.task_to_subtask_mapping.pop(task_id, None)
+        return subtask_ids
+
+    def __drop_subtask(self, subtask_id):
+        """ Forget an assigned subtask. Resources of its task are released if no other subtask of the task is
+        assigned
+        :return: ComputeTaskDef of the subtask or None if it's not assigned
+        """
+        subtask = self.assigned_subtasks.pop(subtask_id, None)
+        if subtask is None:
+            return None
+
+        waiting = self.task_to_subtask_mapping.get(subtask.task_id)
+        if waiting and subtask_id in waiting:
+            waiting.remove(subtask_id)
+            if not waiting:
+                del self.task_to_subtask_mapping[subtask.task_id]
+                self.deltas.pop(subtask.task_id, None)
+
+        if not any(ctd.task_id == subtask.task_id for ctd in self.assigned_subtasks.itervalues()):
+            self.task_server.release_resources(subtask.task_id)
+        return subtask
+
+    def __drop_expired_subtasks(self):
+        # subtasks which resources didn't come before the deadline won't be computed
+        for subtask_id in self.__waiting_subtasks():
+            deadline = self.assigned_subtasks[subtask_id].deadline
+            if deadline and deadline_to_timeout(deadline) <= 0:
+                logger.info("Subtask %r resources were not received before the deadline", subtask_id)
+                self.__drop_subtask(subtask_id)
+
+    def __compute_ready_subtasks(self):
+        while True:
+            with self.lock:
+                if not (self.ready_subtasks and self.free_slots):
+                    return
+                subtask_id = self.ready_subtasks.popleft()
+                if subtask_id not in self.assigned_subtasks:
+                    continue
+                slot = self.free_slots.pop(0)
+                self.computation_slots[subtask_id] = slot
+
+            self.__start_computation(slot, subtask_id)
+
+    def __start_computation(self, slot, subtask_id):
+        subtask = self.assigned_subtasks[subtask_id]
+        task_id = subtask.task_id
+        working_dir = subtask.working_directory
+        docker_images = subtask.docker_images
+        src_code = subtask.src_code
+        extra_data = subtask.extra_data
+        short_desc = subtask.short_description
+        # prefetched subtasks wait for a slot, so the timeout is computed when the computation starts
+        task_timeout = deadline_to_timeout(subtask.deadline)
         unique_str = str(uuid.uuid4())
 
-        self.reset(computing_task=task_id)
+        self.counting_task = task_id
 
         with self.dir_lock:
             resource_dir = self.resource_manager.get_resource_dir(task_id)
@@ -409,25 +531,37 @@ class TaskComputer(object):
                 os.makedirs(temp_dir)
 
         if docker_images:
+            host_config = self.docker_manager.slot_host_config(slot, self.max_concurrent_subtasks)
             tt = DockerTaskThread(self, subtask_id, docker_images, working_dir,
                                   src_code, extra_data, short_desc,
-                                  resource_dir, temp_dir, task_timeout)
+                                  resource_dir, temp_dir, task_timeout,
+                                  host_config=host_config)
         elif self.support_direct_computation:
             tt = PyTaskThread(self, subtask_id, working_dir, src_code,
                               extra_data, short_desc, resource_dir, temp_dir,
                               task_timeout)
         else:
             logger.error("Cannot run PyTaskThread in this version")
-            subtask = self.assigned_subtasks.pop(subtask_id)
+            subtask = self.__drop_subtask(subtask_id)
             self.task_server.send_task_failed(subtask_id, subtask.task_id, "Host direct task not supported",
                                               subtask.return_address, subtask.return_port, subtask.key_id,
                                               subtask.task_owner, self.node_name)
-            self.counting_task = None
+            with self.lock:
+                self.__free_slot(subtask_id)
+                if not self.current_computations:
+                    self.counting_task = None
             return
 
-        self.current_computations.append(tt)
+        with self.lock:
+            self.current_computations.append(tt)
         tt.start()
 
+    def __free_slot(self, subtask_id):
+        slot = self.computation_slots.pop(subtask_id, None)
+        if slot is not None and slot < self.max_concurrent_subtasks:
+            self.free_slots.append(slot)
+            self.free_slots.sort()
+
     def quit(self):
         for t in self.current_computations:
             t.end_comp()
@@ -1,25 +1,46 @@
 from __future__ import division
 
+import bisect
+import hashlib
+import heapq
 import logging
 import math
 import pickle
 import random
 import time
+from collections import deque
 
 from semantic_version import Version
 
 from golem.core.common import HandleKeyError, get_timestamp_utc
+from golem.core.journal import Journal
 from golem.core.variables import APP_VERSION
 
 from .taskbase import TaskHeader, ComputeTaskDef
+from .taskscorer import ExpectedValueTaskScorer
 
 logger = logging.getLogger('golem.task.taskkeeper')
 
+# score heap is rebuilt when it holds this many times more entries than
+# there are supported tasks
+SCORE_HEAP_SLACK = 4
+
 
 def compute_subtask_value(price, computation_time):
     return int(math.ceil(price * computation_time / 3600))
 
 
+def compute_header_digest(signature):
+    """ Short digest identifying a version of a task header. Each update
+        of a header is signed again, so the signature is hashed
+    :param str signature: task header signature
+    :return str|None: hex digest or None for unsigned headers
+    """
+    if not signature:
+        return None
+    return hashlib.sha1(signature).hexdigest()[:16]
+
+
 class CompTaskInfo(object):
     def __init__(self, header, price):
         self.header = header
@@ -55,6 +76,8 @@ class CompTaskKeeper(object):
 
     handle_key_error = HandleKeyError(log_key_error)
 
+    JOURNAL_FILE_NAME = "comp_task_keeper.journal"
+
     def __init__(self, tasks_path, persist=True):
         """ Create new instance of compuatational task's definition's keeper
 
@@ -63,39 +86,53 @@ class CompTaskKeeper(object):
         # information about tasks that this node wants to compute
         self.active_tasks = {}
         self.subtask_to_task = {}  # maps subtasks id to tasks id
+        # all tasks dumped at once by older versions
         self.dump_path = tasks_path / "comp_task_keeper.pickle"
+        self._journal = Journal(str(tasks_path / self.JOURNAL_FILE_NAME))
         self.persist = persist
         self.restore()
 
-    def dump(self):
+    def dump(self, task_id, sync=False):
+        """ Append information about a task to the journal
+        :param task_id: id of an updated task
+        :param bool sync: wait until the journal is written to disk
+        """
         if not self.persist:
             return
-        logger.debug('COMPTASK DUMP: %s', self.dump_path)
-        with self.dump_path.open('wb') as f:
-            dump_data = self.active_tasks, self.subtask_to_task
-            from pprint import pformat
-            for task in self.active_tasks.values():
-                logger.debug('dump_data: %s', pformat(task))
-            pickle.dump(dump_data, f)
+        logger.debug('COMPTASK DUMP: %r', task_id)
+        self._journal.put(task_id, self.active_tasks[task_id])
+        self._journal.flush(sync)
 
     def restore(self):
         if not self.persist:
             return
-        logger.debug('COMPTASK RESTORE: %s', self.dump_path)
-        if not self.dump_path.exists():
-            logger.debug('No previous comptask dump found.')
-            return
+        logger.debug('COMPTASK RESTORE: %s', self._journal.path)
+        active_tasks = self._journal.load()
+        if self.dump_path.exists():
+            active_tasks = self._restore_legacy_dump(active_tasks)
+
+        self.active_tasks.update(active_tasks)
+        for task_id, task in active_tasks.items():
+            for subtask_id in task.subtasks:
+                self.subtask_to_task[subtask_id] = task_id
+
+    def _restore_legacy_dump(self, active_tasks):
         with self.dump_path.open('rb') as f:
             try:
-                active_tasks, subtask_to_task = pickle.load(f)
+                legacy_tasks, _ = pickle.load(f)
             except (pickle.UnpicklingError, EOFError):
                 logger.exception(
                     'Problem restoring dumpfile: %s',
                     self.dump_path
                 )
-                return
-        self.active_tasks.update(active_tasks)
-        self.subtask_to_task.update(subtask_to_task)
+                return active_tasks
+        for task_id, task in legacy_tasks.items():
+            if task_id not in active_tasks:
+                active_tasks[task_id] = task
+                self._journal.put(task_id, task)
+        self._journal.flush(sync=True)
+        self.dump_path.unlink()
+        return active_tasks
 
     def add_request(self, theader, price):
         logger.debug('CT.add_request()')
@@ -111,7 +148,7 @@ class CompTaskKeeper(object):
             self.active_tasks[task_id].requests += 1
         else:
             self.active_tasks[task_id] = CompTaskInfo(theader, price)
-        self.dump()
+        self.dump(task_id)
 
     @handle_key_error
     def get_subtask_ttl(self, task_id):
@@ -132,7 +169,7 @@ class CompTaskKeeper(object):
         task.requests -= 1
         task.subtasks[comp_task_def.subtask_id] = comp_task_def
         self.subtask_to_task[comp_task_def.subtask_id] = comp_task_def.task_id
-        self.dump()
+        self.dump(comp_task_def.task_id, sync=True)
         return True
 
     def get_task_id_for_subtask(self, subtask_id):
@@ -156,7 +193,53 @@ class CompTaskKeeper(object):
     def request_failure(self, task_id):
         logger.debug('CT.request_failure(%r)', task_id)
         self.active_tasks[task_id].requests -= 1
-        self.dump()
+        self.dump(task_id)
+
+
+class IndexedSet(object):
+    """ Set that also gives O(1) access to its elements by position.
+    Removing an element moves the last one into its place, so the order
+    is not preserved.
+    """
+
+    def __init__(self, iterable=()):
+        self._items = []
+        self._positions = {}
+        for item in iterable:
+            self.add(item)
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def clear(self):
+        del self._items[:]
+        self._positions.clear()
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return "IndexedSet(%r)" % (self._items,)
 
 
 class TaskHeaderKeeper(object):
@@ -171,16 +254,47 @@ class TaskHeaderKeeper(object):
             min_price=0.0,
             app_version=APP_VERSION,
             remove_task_timeout=180,
-            verification_timeout=3600
+            verification_timeout=3600,
+            task_scorer=None,
+            rescore_interval=60
             ):
         # all computing tasks that this node knows about
         self.task_headers = {}
+        # digests of known task headers, exchanged with peers so that only
+        # new and updated headers are sent
+        self.digests = {}
         # ids of tasks that this node may try to compute
-        self.supported_tasks = []
+        self.supported_tasks = IndexedSet()
         # tasks that were removed from network recently, so they won't
         # be added again to task_headers
         self.removed_tasks = {}
 
+        # (deadline, task_id) heap of known tasks; entries of removed or
+        # updated headers are skipped when they reach the top
+        self._deadlines = []
+        # (remove time, task_id) of removed_tasks in removal order
+        self._removals = deque()
+        # task ids by environment and by max price, so only the affected
+        # headers are checked again when environment or price changes
+        self._env_buckets = {}
+        self._price_buckets = {}
+        self._prices = []
+        self._owner_buckets = {}
+
+        # scorer ranking tasks for get_task, cached scores of known tasks
+        # and a (-score, tie breaker, task_id) heap of supported tasks;
+        # outdated entries are skipped when they reach the top; scores
+        # depend on time left to the deadline, so they are recomputed
+        # every rescore_interval seconds
+        self.task_scorer = task_scorer or ExpectedValueTaskScorer()
+        self._scores = {}
+        self._score_heap = []
+        self.rescore_interval = rescore_interval
+        self._last_rescore = time.time()
+        # number of rejected requests by task id and by requestor
+        self._rejections = {}
+        self._owner_rejections = {}
+
         self.min_price = min_price
         self.app_version = app_version
         self.verification_timeout = verification_timeout
@@ -283,16 +397,69 @@ class TaskHeaderKeeper(object):
         """Change config options, ie. minimal price that this node may offer
            for computation. If a minimal price didn't change it won't do
            anything. If it has changed it will try again to check which
-           tasks are supported.
+           tasks with max price between the old and the new minimal price
+           are supported.
         :param ClientConfigDescriptor config_desc: new config descriptor
         """
         if config_desc.min_price == self.min_price:
             return
+        low, high = sorted([self.min_price, config_desc.min_price])
         self.min_price = config_desc.min_price
-        self.supported_tasks = []
-        for id_, th in self.task_headers.iteritems():
-            if self.is_supported(th.__dict__):
-                self.supported_tasks.append(id_)
+
+        start = bisect.bisect_left(self._prices, low)
+        end = bisect.bisect_right(self._prices, high)
+        for price in self._prices[start:end]:
+            self._update_supported(self._price_buckets[price])
+
+    def update_environment(self, env_id):
+        """Check again which tasks requiring given environment are
+           supported, ie. after the environment was enabled or disabled.
+        :param str env_id: environment id
+        """
+        self._update_supported(self._env_buckets.get(env_id, ()))
+
+    def _update_supported(self, task_ids):
+        for id_ in task_ids:
+            if self.is_supported(self.task_headers[id_].__dict__):
+                self._add_supported(id_)
+            else:
+                self.supported_tasks.discard(id_)
+
+    def _add_supported(self, task_id):
+        if task_id not in self.supported_tasks:
+            self.supported_tasks.add(task_id)
+            self._push_score(task_id)
+
+    def _score_task(self, task_id):
+        self._scores[task_id] = self._compute_score(task_id)
+        if task_id in self.supported_tasks:
+            self._push_score(task_id)
+
+    def _compute_score(self, task_id):
+        header = self.task_headers[task_id]
+        return self.task_scorer.score(
+            header,
+            self._rejections.get(task_id, 0),
+            self._owner_rejections.get(header.task_owner_key_id, 0)
+        )
+
+    def _push_score(self, task_id):
+        heapq.heappush(self._score_heap,
+                       (-self._scores[task_id], random.random(), task_id))
+        if len(self._score_heap) > \
+                SCORE_HEAP_SLACK * max(len(self.supported_tasks), 1):
+            self._rebuild_score_heap()
+
+    def _rebuild_score_heap(self):
+        """ Drop outdated entries of the score heap """
+        self._score_heap = [(-self._scores[id_], random.random(), id_)
+                            for id_ in self.supported_tasks]
+        heapq.heapify(self._score_heap)
+
+    def _rescore_tasks(self):
+        for id_ in self.task_headers:
+            self._scores[id_] = self._compute_score(id_)
+        self._rebuild_score_heap()
 
     def add_task_header(self, th_dict_repr):
         """This function will try to add to or update a task header
@@ -305,25 +472,32 @@ class TaskHeaderKeeper(object):
         """
         try:
             id_ = th_dict_repr["task_id"]
-            update = id_ in self.task_headers.keys()
+            old_header = self.task_headers.get(id_)
+            update = old_header is not None
             is_correct, err = self.is_correct(th_dict_repr)
             if not is_correct:
                 raise TypeError(err)
 
-            if id_ not in self.removed_tasks.keys():  # not removed recently
-                self.task_headers[id_] = TaskHeader.from_dict(th_dict_repr)
+            if id_ not in self.removed_tasks:  # not removed recently
+                # headers may come without a signature
+                digest = compute_header_digest(th_dict_repr.get('signature'))
+                header = TaskHeader.from_dict(th_dict_repr)
+                self.task_headers[id_] = header
+                self.digests[id_] = digest
+                if self._index_header(header, old_header):
+                    self._score_task(id_)
                 is_supported = self.is_supported(th_dict_repr)
 
                 if update:
-                    if not is_supported and id_ in self.supported_tasks:
-                        self.supported_tasks.remove(id_)
+                    if not is_supported:
+                        self.supported_tasks.discard(id_)
                 elif is_supported:
                     logger.info(
                         "Adding task %r is_supported=%r",
                         id_,
                         is_supported
                     )
-                    self.supported_tasks.append(id_)
+                    self._add_supported(id_)
 
             return True
         except (KeyError, TypeError) as err:
@@ -333,33 +507,115 @@ class TaskHeaderKeeper(object):
     def remove_task_header(self, task_id):
         """ Removes task with given id from a list of known task headers.
         """
-        if task_id in self.task_headers:
-            del self.task_headers[task_id]
-        if task_id in self.supported_tasks:
-            self.supported_tasks.remove(task_id)
-        self.removed_tasks[task_id] = time.time()
+        header = self.task_headers.pop(task_id, None)
+        self.digests.pop(task_id, None)
+        if header is not None:
+            self._unindex_header(header)
+            if header.task_owner_key_id not in self._owner_buckets:
+                self._owner_rejections.pop(header.task_owner_key_id, None)
+        self.supported_tasks.discard(task_id)
+        self._scores.pop(task_id, None)
+        now = time.time()
+        self.removed_tasks[task_id] = now
+        self._removals.append((now, task_id))
 
     def get_task(self):
         """ Returns random task from supported tasks that may be computed
         :return TaskHeader|None: returns either None if there are no tasks
                                  that this node may want to compute
         """
-        if len(self.supported_tasks) > 0:
-            tn = random.randrange(0, len(self.supported_tasks))
-            task_id = self.supported_tasks[tn]
-            return self.task_headers[task_id]
+        while self._score_heap:
+            neg_score, _, task_id = self._score_heap[0]
+            if task_id in self.supported_tasks \
+                    and self._scores.get(task_id) == -neg_score:
+                return self.task_headers[task_id]
+            heapq.heappop(self._score_heap)
 
     def remove_old_tasks(self):
-        for t in self.task_headers.values():
-            cur_time = get_timestamp_utc()
-            if cur_time > t.deadline:
-                logger.warning("Task {} dies".format(t.task_id))
-                self.remove_task_header(t.task_id)
-
-        for task_id, remove_time in self.removed_tasks.items():
-            cur_time = time.time()
-            if cur_time - remove_time > self.removed_task_timeout:
+        cur_time = get_timestamp_utc()
+        while self._deadlines and self._deadlines[0][0] < cur_time:
+            deadline, task_id = heapq.heappop(self._deadlines)
+            header = self.task_headers.get(task_id)
+            if header is None:
+                self._rejections.pop(task_id, None)
+                continue  # removed since
+            if header.deadline != deadline:
+                continue  # updated since
+            logger.warning("Task {} dies".format(task_id))
+            self.remove_task_header(task_id)
+
+        cur_time = time.time()
+        while self._removals and \
+                cur_time - self._removals[0][0] > self.removed_task_timeout:
+            remove_time, task_id = self._removals.popleft()
+            if self.removed_tasks.get(task_id) == remove_time:
                 del self.removed_tasks[task_id]
 
+        if cur_time - self._last_rescore >= self.rescore_interval:
+            self._last_rescore = cur_time
+            self._rescore_tasks()
+
+    def _index_header(self, header, old_header=None):
+        """ Index new or updated header
+        :return bool: True if the header is new or its indexed or scored
+                      properties have changed
+        """
+        if old_header is not None:
+            if self._header_key(old_header) == self._header_key(header):
+                return False
+            self._unindex_header(old_header)
+        id_ = header.task_id
+        if old_header is None or old_header.deadline != header.deadline:
+            heapq.heappush(self._deadlines, (header.deadline, id_))
+        self._env_buckets.setdefault(header.environment, set()).add(id_)
+        price = header.max_price
+        if price not in self._price_buckets:
+            self._price_buckets[price] = set()
+            bisect.insort(self._prices, price)
+        self._price_buckets[price].add(id_)
+        self._owner_buckets.setdefault(header.task_owner_key_id,
+                                       set()).add(id_)
+        return True
+
+    @staticmethod
+    def _header_key(header):
+        return (header.deadline, header.environment, header.max_price,
+                header.task_owner_key_id,
+                getattr(header, 'resource_size', None),
+                getattr(header, 'subtask_timeout', None))
+
+    def _unindex_header(self, header):
+        id_ = header.task_id
+        bucket = self._env_buckets.get(header.environment)
+        if bucket is not None:
+            bucket.discard(id_)
+            if not bucket:
+                del self._env_buckets[header.environment]
+        price = header.max_price
+        bucket = self._price_buckets.get(price)
+        if bucket is not None:
+            bucket.discard(id_)
+            if not bucket:
+                del self._price_buckets[price]
+                del self._prices[bisect.bisect_left(self._prices, price)]
+        owner = header.task_owner_key_id
+        bucket = self._owner_buckets.get(owner)
+        if bucket is not None:
+            bucket.discard(id_)
+            if not bucket:
+                del self._owner_buckets[owner]
+
     def request_failure(self, task_id):
+        """ Remove task which request has failed or has been rejected and
+        lower scores of other tasks of the same requestor.
+        """
+        self._rejections[task_id] = self._rejections.get(task_id, 0) + 1
+        header = self.task_headers.get(task_id)
+        if header is not None:
+            owner = header.task_owner_key_id
+            self._owner_rejections[owner] = \
+                self._owner_rejections.get(owner, 0) + 1
+            for id_ in self._owner_buckets[owner]:
+                if id_ != task_id:
+                    self._score_task(id_)
         self.remove_task_header(task_id)
@@ -1,15 +1,18 @@
+import heapq
 import logging
 import pickle
 import time
 
 from pathlib import Path
 from pydispatch import dispatcher
+from twisted.internet import defer
 
 from apps.appsmanager import AppsManager
 from apps.rendering.task.framerenderingtask import FrameRenderingTask
 from golem.core.common import HandleKeyError, get_timestamp_utc, \
     timeout_to_deadline, to_unicode, update_dict
 from golem.core.hostaddress import get_external_address
+from golem.core.journal import Journal
 from golem.manager.nodestatesnapshot import LocalTaskStateSnapshot
 from golem.network.transport.tcpnetwork import SocketAddress
 from golem.resource.dirmanager import DirManager
@@ -19,6 +22,7 @@ from golem.task.taskbase import ComputeTaskDef, TaskEventListener, Task
 from golem.task.taskkeeper import CompTaskKeeper, compute_subtask_value
 from golem.task.taskstate import TaskState, TaskStatus, SubtaskStatus, \
     SubtaskState
+from golem.task.verificationscheduler import VerificationScheduler
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +44,8 @@ subtask_priority = {
     SubtaskStatus.resent: 2,
     SubtaskStatus.starting: 3,
     SubtaskStatus.downloading: 4,
-    SubtaskStatus.finished: 5
+    SubtaskStatus.verifying: 5,
+    SubtaskStatus.finished: 6
 }
 
 
@@ -50,9 +55,16 @@ class TaskManager(TaskEventListener):
     handle_task_key_error = HandleKeyError(log_task_key_error)
     handle_subtask_key_error = HandleKeyError(log_subtask_key_error)
 
+    JOURNAL_FILE_NAME = 'tasks.journal'
+
+    # Seconds between a task update and writing it to the journal, all updates
+    # of a task made in the meantime are written at once
+    dump_delay = 1.0
+
     def __init__(self, node_name, node, keys_auth, listen_address="",
                  listen_port=0, root_path="res", use_distributed_resources=True,
-                 tasks_dir="tasks", task_persistence=False):
+                 tasks_dir="tasks", task_persistence=False,
+                 max_verification_workers=2):
         super(TaskManager, self).__init__()
 
         self.apps_manager = AppsManager()
@@ -71,6 +83,13 @@ class TaskManager(TaskEventListener):
         self.tasks_states = {}
         self.subtask2task_mapping = {}
 
+        # heap of (deadline, task_id, subtask_id) checked by check_timeouts,
+        # subtask_id is None for the deadline of the whole task
+        self._deadlines = []
+        # deadlines that passed while their task was paused or waiting
+        # to be restarted, by task id
+        self._inactive_deadlines = {}
+
         self.listen_address = listen_address
         self.listen_port = listen_port
 
@@ -92,8 +111,17 @@ class TaskManager(TaskEventListener):
 
         self.activeStatus = [TaskStatus.computing, TaskStatus.starting,
                              TaskStatus.waiting, TaskStatus.restarted]
+        self.finishedStatus = [TaskStatus.finished, TaskStatus.aborted,
+                               TaskStatus.timeout]
         self.use_distributed_resources = use_distributed_resources
 
+        self.verification_scheduler = VerificationScheduler(
+            max_verification_workers)
+
+        self._journal = Journal(str(self.tasks_dir / self.JOURNAL_FILE_NAME))
+        self._dirty_tasks = set()
+        self._dump_call = None
+
         self.comp_task_keeper = CompTaskKeeper(self.tasks_dir, persist=self.task_persistence)
         if self.task_persistence:
             self.restore_tasks()
@@ -153,6 +181,7 @@ class TaskManager(TaskEventListener):
 
         self.tasks[task.header.task_id] = task
         self.tasks_states[task.header.task_id] = ts
+        self._push_deadline(task.header.deadline, task.header.task_id)
 
     @handle_task_key_error
     def start_task(self, task_id):
@@ -168,42 +197,76 @@ class TaskManager(TaskEventListener):
         task.register_listener(self)
 
         if self.task_persistence:
-            self.dump_task(task.header.task_id)
             logger.info("Task {} added".format(task.header.task_id))
-            self.notice_task_updated(task.header.task_id)
+            self.notice_task_updated(task.header.task_id, flush=True)
 
     def dump_task(self, task_id):
-        logger.debug('DUMP TASK')
+        """ Append current task and its state to the tasks journal """
+        logger.debug('DUMP TASK %r', task_id)
+        self._dirty_tasks.discard(task_id)
         try:
             data = self.tasks[task_id], self.tasks_states[task_id]
-            filepath = self.tasks_dir / ('%s.pickle' % (task_id,))
-            logger.debug('DUMP TASK %r', filepath)
-            with filepath.open('wb') as f:
-                pickle.dump(data, f, protocol=2)
+            self._journal.put(task_id, data)
         except:
             logger.exception('DUMP ERROR task_id: %r task: %r state: %r', task_id, self.tasks.get(task_id, '<not found>'), self.tasks_states.get(task_id, '<not found>'))
-            if filepath.exists():
-                filepath.unlink()
             raise
 
+    def dump_dirty_tasks(self, sync=False):
+        """ Write all tasks updated since they were last dumped
+        :param bool sync: wait until the journal is written to disk
+        """
+        if self._dump_call and self._dump_call.active():
+            self._dump_call.cancel()
+        self._dump_call = None
+
+        for task_id in list(self._dirty_tasks):
+            if task_id not in self.tasks:
+                self._dirty_tasks.discard(task_id)
+                continue
+            try:
+                self.dump_task(task_id)
+            except Exception:  # logged in dump_task, don't stop other dumps
+                pass
+        self._journal.flush(sync)
+
     def restore_tasks(self):
         logger.debug('RESTORE TASKS')
-        for path in self.tasks_dir.iterdir():
-            logger.debug('RESTORE TASKS %r', path)
-            if not path.suffix == '.pickle':
+        restored = self._journal.load()
+
+        # Tasks dumped to separate files by older versions
+        legacy_paths = []
+        for path in self.tasks_dir.glob('*.pickle'):
+            if path == self.comp_task_keeper.dump_path:
                 continue
-            logger.debug('RESTORE TASKS really %r', path)
+            logger.debug('RESTORE TASKS %r', path)
+            legacy_paths.append(path)
             with path.open('rb') as f:
                 try:
                     task, state = pickle.load(f)
-                    self.tasks[task.header.task_id] = task
-                    self.tasks_states[task.header.task_id] = state
                 except (pickle.UnpicklingError, EOFError, ImportError):
                     logger.exception('Problem restoring task from: %s', path)
-                    path.unlink()
                     continue
+            restored[task.header.task_id] = task, state
+            self._journal.put(task.header.task_id, (task, state))
+        self._journal.flush(sync=True)
+        for path in legacy_paths:
+            path.unlink()
+
+        for task_id, (task, state) in restored.items():
+            self.tasks[task_id] = task
+            self.tasks_states[task_id] = state
+            self._push_deadline(task.header.deadline, task_id)
+            for ss in state.subtask_states.values():
+                if SubtaskStatus.is_computed(ss.subtask_status):
+                    self._push_deadline(ss.deadline, task_id, ss.subtask_id)
             dispatcher.send(signal='golem.taskmanager', event='task_restored', task=task, state=state)
 
+    def quit(self):
+        """ Write pending task updates """
+        if self.task_persistence:
+            self.dump_dirty_tasks(sync=True)
+            self._journal.close()
+
     @handle_task_key_error
     def resources_send(self, task_id):
         self.tasks_states[task_id].status = TaskStatus.waiting
@@ -284,7 +347,8 @@ class TaskManager(TaskEventListener):
 
         self.subtask2task_mapping[ctd.subtask_id] = task_id
         self.__add_subtask_to_tasks_states(node_name, node_id, price, ctd, address)
-        self.notice_task_updated(task_id)
+        # the subtask is sent to the provider, so it has to survive a restart
+        self.notice_task_updated(task_id, flush=True)
         return ctd, False, extra_data.should_wait
 
     def get_tasks_headers(self):
@@ -348,6 +412,13 @@ class TaskManager(TaskEventListener):
 
     @handle_subtask_key_error
     def computed_task_received(self, subtask_id, result, result_type):
+        """ Verify received subtask result in the verification scheduler
+        :param subtask_id: id of a computed subtask
+        :param result: subtask result
+        :param result_type: result_types representation
+        :return Deferred: fires with True if the result was accepted, False
+        otherwise
+        """
         task_id = self.subtask2task_mapping[subtask_id]
 
         subtask_state = self.tasks_states[task_id].subtask_states[subtask_id]
@@ -357,10 +428,37 @@ class TaskManager(TaskEventListener):
             logger.warning("Result for subtask {} when subtask state is {}"
                            .format(subtask_id, subtask_status))
             self.notice_task_updated(task_id)
-            return False
+            return defer.succeed(False)
+
+        subtask_state.subtask_status = SubtaskStatus.verifying
+        self.notice_task_updated(task_id)
 
-        self.tasks[task_id].computation_finished(subtask_id, result, result_type)
+        deferred = defer.maybeDeferred(
+            self.tasks[task_id].computation_finished,
+            subtask_id, result, result_type,
+            verification_scheduler=self.verification_scheduler)
+        deferred.addCallbacks(
+            lambda _: self.__subtask_verified(task_id, subtask_id),
+            lambda failure: self.__subtask_verification_error(
+                failure, task_id, subtask_id))
+        return deferred
+
+    def __subtask_verification_error(self, failure, task_id, subtask_id):
+        logger.error("Cannot verify subtask {}: {}"
+                     .format(subtask_id, failure.getErrorMessage()))
         ss = self.tasks_states[task_id].subtask_states[subtask_id]
+        ss.subtask_status = SubtaskStatus.failure
+        self.tasks[task_id].computation_failed(subtask_id)
+        self.notice_task_updated(task_id)
+        return False
+
+    def __subtask_verified(self, task_id, subtask_id):
+        ss = self.tasks_states[task_id].subtask_states[subtask_id]
+        if ss.subtask_status != SubtaskStatus.verifying:
+            logger.info("Subtask {} was restarted during verification"
+                        .format(subtask_id))
+            return False
+
         ss.subtask_progress = 1.0
         ss.subtask_rem_time = 0.0
         ss.subtask_status = SubtaskStatus.finished
@@ -383,7 +481,7 @@ class TaskManager(TaskEventListener):
                     self.tasks_states[task_id].status = TaskStatus.finished
                 else:
                     logger.debug("Task {} not accepted".format(task_id))
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, flush=True)
         return True
 
     @handle_subtask_key_error
@@ -430,29 +528,78 @@ class TaskManager(TaskEventListener):
 
     # CHANGE TO RETURN KEY_ID (check IF SUBTASK COMPUTER HAS KEY_ID
     def check_timeouts(self):
+        """ Mark active tasks and computed subtasks whose deadlines have
+        passed as timed out. Only expired entries of the deadline heap are
+        looked at.
+        :return list: ids of nodes that didn't compute subtasks in time
+        """
         nodes_with_timeouts = []
-        for t in self.tasks.values():
-            th = t.header
-            if self.tasks_states[th.task_id].status not in self.activeStatus:
+        cur_time = get_timestamp_utc()
+        self.__reactivate_deadlines()
+
+        # task activity is checked once per call, subtasks of a task that
+        # dies now still time out
+        active = {}
+        while self._deadlines and self._deadlines[0][0] < cur_time:
+            entry = heapq.heappop(self._deadlines)
+            _, task_id, subtask_id = entry
+            if not self.__is_deadline_current(entry):
                 continue
-            cur_time = get_timestamp_utc()
-            if cur_time > th.deadline:
-                logger.info("Task {} dies".format(th.task_id))
+            if task_id not in active:
+                active[task_id] = \
+                    self.tasks_states[task_id].status in self.activeStatus
+            if not active[task_id]:
+                if self.tasks_states[task_id].status not in \
+                        self.finishedStatus:
+                    self._inactive_deadlines.setdefault(task_id, []) \
+                        .append(entry)
+                continue
+
+            t = self.tasks[task_id]
+            if subtask_id is None:
+                logger.info("Task {} dies".format(task_id))
                 t.task_stats = TaskStatus.timeout
-                self.tasks_states[th.task_id].status = TaskStatus.timeout
-                self.notice_task_updated(th.task_id)
-            ts = self.tasks_states[th.task_id]
-            for s in ts.subtask_states.values():
-                if SubtaskStatus.is_computed(s.subtask_status):
-                    if cur_time > s.deadline:
-                        logger.info("Subtask {} dies".format(s.subtask_id))
-                        s.subtask_status = SubtaskStatus.failure
-                        nodes_with_timeouts.append(s.computer.node_id)
-                        t.computation_failed(s.subtask_id)
-                        s.stderr = "[GOLEM] Timeout"
-                        self.notice_task_updated(th.task_id)
+                self.tasks_states[task_id].status = TaskStatus.timeout
+                self.notice_task_updated(task_id)
+            else:
+                s = self.tasks_states[task_id].subtask_states[subtask_id]
+                logger.info("Subtask {} dies".format(subtask_id))
+                s.subtask_status = SubtaskStatus.failure
+                nodes_with_timeouts.append(s.computer.node_id)
+                t.computation_failed(subtask_id)
+                s.stderr = "[GOLEM] Timeout"
+                self.notice_task_updated(task_id)
         return nodes_with_timeouts
 
+    def _push_deadline(self, deadline, task_id, subtask_id=None):
+        heapq.heappush(self._deadlines, (deadline, task_id, subtask_id))
+
+    def __is_deadline_current(self, entry):
+        """ Entries are not removed from the heap when deadlines change or
+        tasks are deleted, such entries are skipped when they expire """
+        deadline, task_id, subtask_id = entry
+        if task_id not in self.tasks:
+            return False
+        if subtask_id is None:
+            return self.tasks[task_id].header.deadline == deadline
+        ss = self.tasks_states[task_id].subtask_states.get(subtask_id)
+        return ss is not None and ss.deadline == deadline \
+            and SubtaskStatus.is_computed(ss.subtask_status)
+
+    def __reactivate_deadlines(self):
+        """ Check again expired deadlines of tasks that became active, eg.
+        after they were resumed. Deadlines of deleted tasks and tasks that
+        have finished, were aborted or timed out are dropped; restarting
+        such a task sets new deadlines. """
+        for task_id, entries in self._inactive_deadlines.items():
+            state = self.tasks_states.get(task_id)
+            if state is None or state.status in self.finishedStatus:
+                del self._inactive_deadlines[task_id]
+            elif state.status in self.activeStatus:
+                del self._inactive_deadlines[task_id]
+                for entry in entries:
+                    heapq.heappush(self._deadlines, entry)
+
     def get_progresses(self):
         tasks_progresses = {}
 
@@ -480,6 +627,7 @@ class TaskManager(TaskEventListener):
         self.tasks_states[task_id].status = TaskStatus.restarted
         task.header.deadline = timeout_to_deadline(
             task.task_definition.full_task_timeout)
+        self._push_deadline(task.header.deadline, task_id)
         self.tasks_states[task_id].time_started = time.time()
 
         for ss in self.tasks_states[task_id].subtask_states.values():
@@ -488,7 +636,7 @@ class TaskManager(TaskEventListener):
 
         task.header.signature = self.sign_task_header(task.header)
 
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, flush=True)
 
     @handle_subtask_key_error
     def restart_subtask(self, subtask_id):
@@ -527,7 +675,7 @@ class TaskManager(TaskEventListener):
             del self.subtask2task_mapping[sub.subtask_id]
         self.tasks_states[task_id].subtask_states.clear()
 
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, flush=True)
 
     @handle_task_key_error
     def pause_task(self, task_id):
@@ -557,6 +705,11 @@ class TaskManager(TaskEventListener):
         del self.tasks[task_id]
         del self.tasks_states[task_id]
 
+        if self.task_persistence:
+            self._dirty_tasks.discard(task_id)
+            self._journal.delete(task_id)
+            self._journal.flush(sync=True)
+
         self.dir_manager.clear_temporary(task_id)
 
     @handle_task_key_error
@@ -595,6 +748,7 @@ class TaskManager(TaskEventListener):
     def change_timeouts(self, task_id, full_task_timeout, subtask_timeout):
         task = self.tasks[task_id]
         task.header.deadline = timeout_to_deadline(full_task_timeout)
+        self._push_deadline(task.header.deadline, task_id)
         task.header.subtask_timeout = subtask_timeout
         task.full_task_timeout = full_task_timeout
         task.header.last_checking = time.time()
@@ -710,13 +864,24 @@ class TaskManager(TaskEventListener):
         ss.value = 0
 
         self.tasks_states[ctd.task_id].subtask_states[ctd.subtask_id] = ss
+        self._push_deadline(ss.deadline, ctd.task_id, ctd.subtask_id)
 
     def notify_update_task(self, task_id):
         self.notice_task_updated(task_id)
 
     @handle_task_key_error
-    def notice_task_updated(self, task_id):
-        # self.save_state()
+    def notice_task_updated(self, task_id, flush=False):
+        """ Mark task as updated, it's written to the journal after
+        dump_delay
+        :param bool flush: write updated tasks to disk right away, used
+        after changes that were acknowledged to the user or other nodes
+        """
         if self.task_persistence:
-            self.dump_task(task_id)
+            self._dirty_tasks.add(task_id)
+            if flush:
+                self.dump_dirty_tasks(sync=True)
+            elif not self._dump_call:
+                from twisted.internet import reactor
+                self._dump_call = reactor.callLater(self.dump_delay,
+                                                    self.dump_dirty_tasks)
         dispatcher.send(signal='golem.taskmanager', event='task_status_updated', task_id=task_id)
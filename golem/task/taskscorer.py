@@ -0,0 +1,97 @@
+import random
+import time
+
+from golem.core.common import get_timestamp_utc
+
+
+class TaskScorer(object):
+    """ Scores task headers known by TaskHeaderKeeper. A task with
+    the highest score is the first one to be requested. Scores are computed
+    when a header is added or changed and when a request for a task of
+    the same requestor is rejected.
+    """
+
+    def score(self, header, rejections=0, owner_rejections=0):
+        """ Return score of a task
+        :param TaskHeader header: header of a scored task
+        :param int rejections: number of rejected requests for this task
+        :param int owner_rejections: number of rejected requests for all tasks
+                                     of this task's requestor
+        :return float: non-negative score, higher is better
+        """
+        raise NotImplementedError
+
+
+class RandomTaskScorer(TaskScorer):
+    """ Choose tasks at random """
+
+    def score(self, header, rejections=0, owner_rejections=0):
+        return random.random()
+
+
+class ExpectedValueTaskScorer(TaskScorer):
+    """ Scores tasks by expected value of a CPU-second spent on them, ie.
+    the price of a CPU-second multiplied by the part of time that is actually
+    paid for (resource download is not), the likelihood that the subtask is
+    computed before the task's deadline and the likelihood that the request
+    is accepted and the requestor pays.
+    """
+
+    def __init__(self, get_trust=None, bandwidth=1024 * 1024,
+                 rejection_factor=0.5, owner_rejection_factor=0.8,
+                 trust_timeout=60.0):
+        """
+        :param get_trust: function returning requesting trust of a node
+                          (from -1.0 to 1.0) or None if it's unknown
+        :param int bandwidth: expected download speed in bytes per second
+        :param float rejection_factor: score multiplier applied for each
+                                       rejected request for the task
+        :param float owner_rejection_factor: score multiplier applied for each
+                                             rejected request for any task
+                                             of the same requestor
+        :param float trust_timeout: seconds for which the trust of
+                                    a requestor is cached
+        """
+        self.get_trust = get_trust
+        self.bandwidth = bandwidth
+        self.rejection_factor = rejection_factor
+        self.owner_rejection_factor = owner_rejection_factor
+        self.trust_timeout = trust_timeout
+        self._trust = {}  # node id -> (expiration time, trust factor)
+
+    def score(self, header, rejections=0, owner_rejections=0):
+        subtask_timeout = max(getattr(header, 'subtask_timeout', 0) or 0, 1)
+        resource_size = getattr(header, 'resource_size', 0) or 0
+        download_time = resource_size / float(self.bandwidth)
+        paid_part = subtask_timeout / (subtask_timeout + download_time)
+
+        # max_price is a price of an hour of computation
+        price = max(getattr(header, 'max_price', 0) or 0, 0) / 3600.0
+        # subtasks that can't be finished before the deadline won't be paid
+        remaining = (getattr(header, 'deadline', 0) or 0) - get_timestamp_utc()
+        in_time = max(0.0, min(remaining / (subtask_timeout + download_time),
+                               1.0))
+
+        acceptance = self._trust_factor(header.task_owner_key_id)
+        acceptance *= self.rejection_factor ** rejections
+        acceptance *= self.owner_rejection_factor ** owner_rejections
+        return price * paid_part * in_time * acceptance
+
+    def _trust_factor(self, node_id):
+        # scores are computed for every received header, while trust is
+        # read from the ranking database
+        now = time.time()
+        expires, factor = self._trust.get(node_id, (0, None))
+        if expires > now:
+            return factor
+
+        try:
+            trust = float(self.get_trust(node_id))
+        except (TypeError, ValueError):  # no trust function or unknown trust
+            trust = 0.0
+        factor = (1.0 + max(-1.0, min(trust, 1.0))) / 2.0
+
+        for key in [k for k, (e, _) in self._trust.iteritems() if e <= now]:
+            del self._trust[key]
+        self._trust[node_id] = (now + self.trust_timeout, factor)
+        return factor
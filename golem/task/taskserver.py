@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from collections import deque
+from collections import deque, OrderedDict
+import copy
 import datetime
 import itertools
 import logging
@@ -8,6 +9,7 @@ from pydispatch import dispatcher
 import time
 
 from golem import model
+from golem.core.common import get_timestamp_utc
 from golem.network.transport.network import ProtocolFactory, SessionFactory
 from golem.network.transport.tcpnetwork import TCPNetwork, TCPConnectInfo, SocketAddress, MidAndFilesProtocol
 from golem.network.transport.tcpserver import PendingConnectionsServer, PenConnStatus
@@ -15,8 +17,9 @@ from golem.ranking.helper.trust import Trust
 from golem.task.deny import get_deny_set
 from golem.task.taskbase import TaskHeader
 from golem.task.taskconnectionshelper import TaskConnectionsHelper
+from golem.task.taskscorer import ExpectedValueTaskScorer
 from taskcomputer import TaskComputer
-from taskkeeper import TaskHeaderKeeper
+from taskkeeper import TaskHeaderKeeper, compute_header_digest
 from taskmanager import TaskManager
 from tasksession import TaskSession
 import weakref
@@ -35,15 +38,18 @@ class TaskServer(PendingConnectionsServer):
         self.config_desc = config_desc
 
         self.node = node
-        self.task_keeper = TaskHeaderKeeper(client.environments_manager, min_price=config_desc.min_price)
+        self.task_keeper = TaskHeaderKeeper(client.environments_manager, min_price=config_desc.min_price,
+                                            task_scorer=ExpectedValueTaskScorer(client.get_requesting_trust))
         self.task_manager = TaskManager(config_desc.node_name, self.node, self.keys_auth,
                                         root_path=TaskServer.__get_task_manager_root(client.datadir),
                                         use_distributed_resources=config_desc.use_distributed_resource_management,
-                                        tasks_dir=os.path.join(client.datadir, 'tasks'))
+                                        tasks_dir=os.path.join(client.datadir, 'tasks'),
+                                        max_verification_workers=config_desc.max_verification_workers)
         self.task_computer = TaskComputer(config_desc.node_name, task_server=self,
                                           use_docker_machine_manager=use_docker_machine_manager)
         self.task_connections_helper = TaskConnectionsHelper()
         self.task_connections_helper.task_server = self
+        self.header_sig_cache = HeaderSignatureCache()
         self.task_sessions = {}
         self.task_sessions_incoming = weakref.WeakSet()
 
@@ -126,8 +132,8 @@ class TaskServer(PendingConnectionsServer):
                     'estimated_performance': performance,
                     'price': self.config_desc.min_price,
                     'max_resource_size': self.config_desc.max_resource_size,
-                    'max_memory_size': self.config_desc.max_memory_size,
-                    'num_cores': self.config_desc.num_cores
+                    'max_memory_size': self._slot_share(self.config_desc.max_memory_size),
+                    'num_cores': self._slot_share(self.config_desc.num_cores)
                 }
                 self._add_pending_request(TASK_CONN_TYPES['task_request'], theader.task_owner, theader.task_owner_port, theader.task_owner_key_id, args)
 
@@ -136,6 +142,14 @@ class TaskServer(PendingConnectionsServer):
             logger.warning("Cannot send request for task: {}".format(err))
             self.task_keeper.remove_task_header(theader.task_id)
 
+    def _slot_share(self, value):
+        """ Part of a resource offered to one of the subtasks computed
+        at the same time """
+        slots = self.config_desc.max_concurrent_subtasks
+        if slots > 1:
+            return max(1, value // slots)
+        return value
+
     def request_resource(self, subtask_id, resource_header, address, port, key_id, task_owner):
         if subtask_id in self.task_sessions:
             session = self.task_sessions[subtask_id]
@@ -147,6 +161,14 @@ class TaskServer(PendingConnectionsServer):
     def pull_resources(self, task_id, resources, client_options=None):
         self.client.pull_resources(task_id, resources, client_options=client_options)
 
+    def set_resources_priority(self, task_id, priority):
+        """ Resources of tasks with higher priority are downloaded first """
+        self.client.set_resources_priority(task_id, priority)
+
+    def release_resources(self, task_id):
+        """ Resources of the task are no longer used for computation """
+        self.client.release_resources(task_id)
+
     def send_results(self, subtask_id, task_id, result, computing_time,
                      owner_address, owner_port, owner_key_id, owner,
                      node_name):
@@ -207,14 +229,35 @@ class TaskServer(PendingConnectionsServer):
             except Exception as exc:
                 logger.error("Error closing incoming session: %s", exc)
 
-    def get_tasks_headers(self):
+    def get_tasks_headers(self, known_digests=None):
+        """ Return known and own task headers
+        :param dict|None known_digests: task id -> header digest known to
+                                        the requesting peer; headers with
+                                        matching digests are omitted
+        :return list: list of task header dictionaries
+        """
         ths = self.task_keeper.get_all_tasks() + \
               self.task_manager.get_tasks_headers()
+        if isinstance(known_digests, dict) and known_digests:
+            digests = self.get_tasks_digests()
+            ths = [th for th in ths
+                   if digests.get(th.task_id) is None
+                   or known_digests.get(th.task_id) != digests[th.task_id]]
         return [th.to_dict() for th in ths]
 
+    def get_tasks_digests(self):
+        """ Return digests of known and own task headers
+        :return dict: task id -> header digest
+        """
+        digests = dict(self.task_keeper.digests)
+        for th in self.task_manager.get_tasks_headers():
+            digests[th.task_id] = compute_header_digest(th.signature)
+        return digests
+
     def add_task_header(self, th_dict_repr):
         try:
-            if not self.verify_header_sig(th_dict_repr):
+            if not self.header_sig_cache.verify(th_dict_repr,
+                                                self.verify_header_sig):
                 raise Exception("Invalid signature")
 
             task_id = th_dict_repr["task_id"]
@@ -243,6 +286,9 @@ class TaskServer(PendingConnectionsServer):
     def remove_task_header(self, task_id):
         self.task_keeper.remove_task_header(task_id)
 
+    def task_request_rejected(self, task_id):
+        self.task_keeper.request_failure(task_id)
+
     def add_task_session(self, subtask_id, session):
         self.task_sessions[subtask_id] = session
 
@@ -312,6 +358,8 @@ class TaskServer(PendingConnectionsServer):
         self.last_message_time_threshold = config_desc.task_session_timeout
         self.task_manager.change_config(self.__get_task_manager_root(self.client.datadir),
                                         config_desc.use_distributed_resource_management)
+        self.task_manager.verification_scheduler.set_max_workers(
+            config_desc.max_verification_workers)
         self.task_computer.change_config(config_desc, run_benchmarks=run_benchmarks)
         self.task_keeper.change_config(config_desc)
 
@@ -490,6 +538,7 @@ class TaskServer(PendingConnectionsServer):
 
     def quit(self):
         self.task_computer.quit()
+        self.task_manager.quit()
 
     def receive_subtask_computation_time(self, subtask_id, computation_time):
         self.task_manager.set_computation_time(subtask_id, computation_time)
@@ -1111,6 +1160,77 @@ class WaitingTaskFailure(object):
         self.err_msg = err_msg
 
 
+class HeaderSignatureCache(object):
+    """ Bounded LRU cache of task header signature verification results
+    keyed by (task id, signature, owner key). The same header is relayed
+    by every peer, so it is verified once and the result is kept until the
+    header deadline. A cached result is used only if the signed content of
+    the header is equal to the verified one. Expired results are removed
+    at most once per sweep_interval seconds. """
+
+    def __init__(self, max_size=4096, sweep_interval=60):
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self.hits = 0
+        self.misses = 0
+        # key -> (deadline, signed header content, result)
+        self._results = OrderedDict()
+        self._last_sweep = get_timestamp_utc()
+
+    @staticmethod
+    def _signed_content(th_dict_repr):
+        # fields that are not signed, see TaskHeader.dict_to_binary
+        content = dict(th_dict_repr)
+        content.pop('last_checking', None)
+        content.pop('signature', None)
+        return content
+
+    def verify(self, th_dict_repr, verify_fn):
+        """ Return cached verification result for given header or verify it
+        :param dict th_dict_repr: task header dictionary representation
+        :param func verify_fn: called with the header on cache miss
+        :return bool: verification result
+        """
+        key = (th_dict_repr["task_id"], th_dict_repr["signature"],
+               th_dict_repr["task_owner_key_id"])
+        now = get_timestamp_utc()
+        content = self._signed_content(th_dict_repr)
+
+        entry = self._results.pop(key, None)
+        if entry is not None and entry[0] > now and entry[1] == content:
+            self.hits += 1
+            self._results[key] = entry
+            return entry[2]
+        self.misses += 1
+
+        result = verify_fn(th_dict_repr)
+        deadline = th_dict_repr.get("deadline")
+        if isinstance(deadline, (int, long, float)) and deadline > now:
+            self._results[key] = (deadline, copy.deepcopy(content), result)
+            self._evict(now)
+        return result
+
+    def _evict(self, now):
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            for key in [k for k, e in self._results.iteritems()
+                        if e[0] <= now]:
+                del self._results[key]
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+    def get_stats(self):
+        """ Return cache size, skipped (hits) and performed (misses)
+        verifications
+        :return dict:
+        """
+        return {'size': len(self._results), 'hits': self.hits,
+                'misses': self.misses}
+
+    def __len__(self):
+        return len(self._results)
+
+
 # TODO: Get rid of archaic int labels and use plain strings instead.
 TASK_CONN_TYPES = {
     'task_request': 1,
@@ -7,6 +7,9 @@ import os
 import struct
 import time
 
+from twisted.internet import defer
+
+from golem.core.channelcipher import ChannelCipher
 from golem.core.common import HandleAttributeError
 from golem.core.simpleserializer import CBORSerializer
 from golem.decorators import log_error
@@ -24,7 +27,7 @@ from golem.transactions.ethereum.ethereumpaymentskeeper import EthAccountInfo
 logger = logging.getLogger(__name__)
 
 
-TASK_PROTOCOL_ID = 15
+TASK_PROTOCOL_ID = 16
 
 
 def drop_after_attr_error(*args, **kwargs):
@@ -119,6 +122,8 @@ class TaskSession(MiddlemanSafeSession):
         :return str: encrypted data or unchanged message
                      (if server doesn't exist)
         """
+        if self.send_cipher:
+            return self.send_cipher.encrypt(data)
         if self.task_server:
             return self.task_server.encrypt(data, self.key_id)
         logger.warning("Can't encrypt message - no task server")
@@ -131,6 +136,8 @@ class TaskSession(MiddlemanSafeSession):
         :param str data: data to be decrypted
         :return str|None: decrypted data
         """
+        if ChannelCipher.is_channel_frame(data):
+            return self._decrypt_channel_frame(data)
         if self.task_server is None:
             logger.warning("Can't decrypt data - no task server")
             return data
@@ -229,9 +236,9 @@ class TaskSession(MiddlemanSafeSession):
         self.conn.producer = None
         self.dropped()
 
-    @dropped_after()
     def result_received(self, extra_data, decrypt=True):
-        """ Inform server about received result
+        """ Inform server about received result. The session is dropped
+        after the provider is informed about the verification outcome
         :param dict extra_data: dictionary with information about
                                 received result
         :param bool decrypt: tells whether result decryption should
@@ -243,11 +250,13 @@ class TaskSession(MiddlemanSafeSession):
 
         if not subtask_id:
             logger.error("No task_id value in extra_data for received data ")
+            self.dropped()
             return
 
         if result_type is None:
             logger.error("No information about result_type for received data ")
             self._reject_subtask_result(subtask_id)
+            self.dropped()
             return
 
         if result_type == result_types['data']:
@@ -258,19 +267,32 @@ class TaskSession(MiddlemanSafeSession):
             except Exception as err:
                 logger.error("Can't load result data {}".format(err))
                 self._reject_subtask_result(subtask_id)
+                self.dropped()
                 return
 
-        self.task_manager.computed_task_received(
+        deferred = defer.maybeDeferred(
+            self.task_manager.computed_task_received,
             subtask_id,
             result,
             result_type
         )
+        deferred.addCallback(lambda _: self._result_verified(subtask_id))
+        deferred.addErrback(self._result_verification_error, subtask_id)
+
+    def _result_verified(self, subtask_id):
         if not self.task_manager.verify_subtask(subtask_id):
             self._reject_subtask_result(subtask_id)
-            return
+        else:
+            self.task_server.accept_result(subtask_id, self.result_owner)
+            self.send(message.MessageSubtaskResultAccepted(
+                subtask_id=subtask_id))
+        self.dropped()
 
-        self.task_server.accept_result(subtask_id, self.result_owner)
-        self.send(message.MessageSubtaskResultAccepted(subtask_id=subtask_id))
+    def _result_verification_error(self, failure, subtask_id):
+        logger.error("Cannot verify result of subtask {}: {}"
+                     .format(subtask_id, failure.getErrorMessage()))
+        self._reject_subtask_result(subtask_id)
+        self.dropped()
 
     @log_error()
     def inform_worker_about_payment(self, payment):
@@ -548,7 +570,7 @@ class TaskSession(MiddlemanSafeSession):
 
     def _react_to_cannot_assign_task(self, msg):
         self.task_computer.task_request_rejected(msg.task_id, msg.reason)
-        self.task_server.remove_task_header(msg.task_id)
+        self.task_server.task_request_rejected(msg.task_id)
         self.task_computer.session_closed()
         self.dropped()
 
@@ -711,6 +733,7 @@ class TaskSession(MiddlemanSafeSession):
         if self.rand_val == msg.rand_val:
             self.verified = True
             self.task_server.verified_conn(self.conn_id, )
+            self.start_channel()
             for msg in self.msgs_to_send:
                 self.send(msg)
             self.msgs_to_send = []
@@ -752,6 +775,7 @@ class TaskSession(MiddlemanSafeSession):
 
     def _react_to_being_middleman_accepted(self, msg):
         self.key_id = self.asking_node_key_id
+        self.reset_channel()
 
     def _react_to_middleman_accepted(self, msg):
         self.send(message.MessageMiddlemanReady())
@@ -92,6 +92,7 @@ class TaskStatus(object):
 class SubtaskStatus(object):
     starting = u"Starting"
     downloading = u"Downloading"
+    verifying = u"Verifying"
     resent = u"Failed - Resent"
     finished = u"Finished"
     failure = u"Failure"
@@ -0,0 +1,90 @@
+import heapq
+import itertools
+import logging
+import time
+
+from twisted.internet import defer, threads
+from twisted.python.failure import Failure
+
+logger = logging.getLogger("golem.task")
+
+
+class VerificationScheduler(object):
+    """ Runs subtask result verifications in a bounded pool of reactor
+    threads. Verifications waiting for a free worker are started in order of
+    their task deadlines, so tasks close to their deadline are verified
+    first. Must be used from the reactor thread. """
+
+    def __init__(self, max_workers=2):
+        """
+        :param int max_workers: maximum number of verifications running
+        at the same time, at least one
+        """
+        self.max_workers = max(1, max_workers)
+        self.running = 0
+        self.finished = 0
+        self.failed = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_wait_time = 0.0
+
+        self._queue = []
+        self._counter = itertools.count()
+
+    def schedule(self, deadline, verify, *args, **kwargs):
+        """ Queue verification
+        :param float deadline: timestamp of the task deadline, used as
+        the verification priority
+        :param verify: function performing the verification, called in
+        a worker thread with given args and kwargs
+        :return Deferred: fires with the verify function result
+        """
+        deferred = defer.Deferred()
+        heapq.heappush(self._queue, (deadline, next(self._counter),
+                                     time.time(), deferred, verify, args,
+                                     kwargs))
+        self._start_next()
+        return deferred
+
+    def set_max_workers(self, max_workers):
+        self.max_workers = max(1, max_workers)
+        self._start_next()
+
+    def get_stats(self):
+        done = self.finished + self.failed
+        return {
+            u'queued': len(self._queue),
+            u'running': self.running,
+            u'max_workers': self.max_workers,
+            u'finished': self.finished,
+            u'failed': self.failed,
+            u'avg_wait_time': self.total_wait_time / done if done else 0.0,
+            u'max_wait_time': self.max_wait_time,
+            u'avg_run_time': self.total_run_time / done if done else 0.0
+        }
+
+    def _start_next(self):
+        while self._queue and self.running < self.max_workers:
+            _, _, queued, deferred, verify, args, kwargs = \
+                heapq.heappop(self._queue)
+            started = time.time()
+            wait_time = started - queued
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            self.running += 1
+
+            result = threads.deferToThread(verify, *args, **kwargs)
+            result.addBoth(self._verification_done, started)
+            result.chainDeferred(deferred)
+
+    def _verification_done(self, result, started):
+        self.running -= 1
+        self.total_run_time += time.time() - started
+        if isinstance(result, Failure):
+            self.failed += 1
+            logger.warning("Verification failed: %s",
+                           result.getErrorMessage())
+        else:
+            self.finished += 1
+        self._start_next()
+        return result
@@ -15,7 +15,16 @@ class IncomesKeeper(object):
     """Keeps information about payments received from other nodes
     """
     def run_once(self):
+        self.notify_expected(self.update_expected())
+
+    def update_expected(self):
+        """ Remove expected incomes that were received. Incomes that are
+        still expected are returned, their payments should be requested
+        again, see notify_expected
+        :return list: ExpectedIncome instances
+        """
         delta = datetime.datetime.now() - datetime.timedelta(minutes=10)
+        expected = []
         with db.atomic():
             for expected_income in ExpectedIncome\
                     .select()\
@@ -33,13 +42,22 @@ class IncomesKeeper(object):
                     with db.atomic():
                         expected_income.modified_date = datetime.datetime.now()
                         expected_income.save()
-                    dispatcher.send(
-                        signal="golem.transactions",
-                        event="expected_income",
-                        expected_income=expected_income
-                    )
+                    expected.append(expected_income)
                     continue
                 expected_income.delete_instance()
+        return expected
+
+    @staticmethod
+    def notify_expected(expected_incomes):
+        """ Send signals for incomes that are still expected. Listeners of
+        the signal are not thread-safe, it should be sent from the reactor
+        thread """
+        for expected_income in expected_incomes:
+            dispatcher.send(
+                signal="golem.transactions",
+                event="expected_income",
+                expected_income=expected_income
+            )
 
     def received(self, sender_node_id, task_id, subtask_id, transaction_id,
                  block_number, value):
@@ -83,7 +83,6 @@ class TransactionSystem(object):
         #         del self.completed[subtask_id]
         # return after_deadline
 
-        self.incomes_keeper.run_once()
         return []
 
     def sync(self):
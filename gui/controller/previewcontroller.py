@@ -17,10 +17,11 @@ logger = getLogger("gui")
 
 def subtasks_priority(sub):
     priority = {
-        SubtaskStatus.restarted: 6,
-        SubtaskStatus.failure: 5,
-        SubtaskStatus.resent: 4,
-        SubtaskStatus.finished: 3,
+        SubtaskStatus.restarted: 7,
+        SubtaskStatus.failure: 6,
+        SubtaskStatus.resent: 5,
+        SubtaskStatus.finished: 4,
+        SubtaskStatus.verifying: 3,
         SubtaskStatus.starting: 2,
         SubtaskStatus.downloading: 1}
 
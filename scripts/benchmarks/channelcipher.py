@@ -0,0 +1,45 @@
+import time
+
+import click
+
+from golem.core.channelcipher import ChannelCipher
+from golem.core.crypto import ECCx
+
+
+def ecies_round_trip(receiver, data):
+    return receiver.ecies_decrypt(
+        ECCx.ecies_encrypt(data, receiver.raw_pubkey))
+
+
+def channel_round_trip(sender, receiver, data):
+    return receiver.decrypt(sender.encrypt(data))
+
+
+def measure(fn, count):
+    start = time.time()
+    for _ in xrange(count):
+        fn()
+    return count / (time.time() - start)
+
+
+@click.command()
+@click.option("--count", default=2000, help="Number of messages to send")
+@click.option("--size", default=200, help="Size of a serialized message")
+def run_benchmark(count, size):
+    data = "x" * size
+
+    receiver = ECCx()
+    ecies = measure(lambda: ecies_round_trip(receiver, data), count)
+
+    key = ChannelCipher.gen_key()
+    sender, channel_receiver = ChannelCipher(key), ChannelCipher(key)
+    channel = measure(
+        lambda: channel_round_trip(sender, channel_receiver, data), count)
+
+    print "message size: {} B".format(size)
+    print "ECIES:   {:10.1f} msg/s".format(ecies)
+    print "channel: {:10.1f} msg/s ({:.1f}x)".format(channel, channel / ecies)
+
+
+if __name__ == "__main__":
+    run_benchmark()
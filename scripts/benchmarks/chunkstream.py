@@ -0,0 +1,98 @@
+import os
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+
+import click
+import requests
+
+from golem.http.stream import ChunkStream, StreamFileObject
+
+
+class ChunkedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    chunk = ''
+    count = 0
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'application/octet-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        data = '{:x}\r\n{}\r\n'.format(len(self.chunk), self.chunk)
+        for _ in xrange(self.count):
+            self.wfile.write(data)
+        self.wfile.write('0\r\n\r\n')
+        self.close_connection = 1
+
+    def log_message(self, *_):
+        pass
+
+
+def read_stream(addr, read_size):
+    stream = ChunkStream(addr, '/')
+    stream.connect()
+    received = 0
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            break
+        received += len(data)
+    stream.disconnect()
+    return received
+
+
+def write_stream(addr, _):
+    with open(os.devnull, 'wb') as f:
+        stream = ChunkStream(addr, '/')
+        stream.connect()
+        received = stream.write_to(f.fileno())
+        stream.disconnect()
+    return received
+
+
+def read_requests(addr, read_size):
+    response = requests.get('http://{}:{}/'.format(*addr), stream=True)
+    stream = StreamFileObject(response)
+    received = 0
+    while True:
+        data = stream.read(read_size)
+        if not data:
+            break
+        received += len(data)
+    return received
+
+
+def measure(fn, addr, read_size):
+    start = time.time()
+    received = fn(addr, read_size)
+    return received / (time.time() - start) / 2 ** 20
+
+
+@click.command()
+@click.option("--size", default=256, help="Size of transferred data in MiB")
+@click.option("--chunk-size", default=64, help="Size of HTTP chunks in KiB")
+@click.option("--read-size", default=4096, help="Size of stream reads")
+def run_benchmark(size, chunk_size, read_size):
+    ChunkedHandler.chunk = os.urandom(chunk_size * 1024)
+    ChunkedHandler.count = size * 1024 / chunk_size
+
+    httpd = HTTPServer(('127.0.0.1', 0), ChunkedHandler)
+    thread = Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    print "transfer: {} MiB in {} KiB chunks".format(size, chunk_size)
+    try:
+        for name, fn in [("ChunkStream.read", read_stream),
+                         ("ChunkStream.write_to", write_stream),
+                         ("requests", read_requests)]:
+            print "{:22} {:8.1f} MiB/s".format(
+                name, measure(fn, httpd.server_address, read_size))
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    run_benchmark()
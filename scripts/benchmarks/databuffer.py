@@ -0,0 +1,86 @@
+import struct
+import timeit
+
+import click
+
+from golem.core.databuffer import DataBuffer
+from golem.core.variables import LONG_STANDARD_SIZE
+
+
+class StringDataBuffer:
+    """ Previous, string-concatenating DataBuffer implementation (framing
+    part only), kept here for comparison """
+    def __init__(self):
+        self.buffered_data = ""
+
+    def append_string(self, data):
+        self.buffered_data = "".join([self.buffered_data, data])
+
+    def data_size(self):
+        return len(self.buffered_data)
+
+    def peek_ulong(self):
+        (ret_val,) = struct.unpack("!L",
+                                   self.buffered_data[0:LONG_STANDARD_SIZE])
+        return ret_val
+
+    def read_ulong(self):
+        val_ = self.peek_ulong()
+        self.buffered_data = self.buffered_data[4:]
+        return val_
+
+    def read_string(self, num_chars):
+        val_ = self.buffered_data[:num_chars]
+        self.buffered_data = self.buffered_data[num_chars:]
+        return val_
+
+    def get_len_prefixed_string(self):
+        while (self.data_size() > LONG_STANDARD_SIZE and
+               self.data_size() >= (self.peek_ulong() + LONG_STANDARD_SIZE)):
+            num_chars = self.read_ulong()
+            yield self.read_string(num_chars)
+
+
+def build_stream(count, size):
+    msg = struct.pack("!L", size) + "x" * size
+    return msg * count
+
+
+def feed(buffer_cls, stream, chunk_size):
+    db = buffer_cls()
+    received = 0
+    for i in xrange(0, len(stream), chunk_size):
+        db.append_string(stream[i:i + chunk_size])
+        for _ in db.get_len_prefixed_string():
+            received += 1
+    return received
+
+
+@click.command()
+@click.option("--small-count", default=20000, help="Number of small messages")
+@click.option("--small-size", default=100, help="Size of a small message")
+@click.option("--large-count", default=3, help="Number of large messages")
+@click.option("--large-size", default=4 * 1024 * 1024,
+              help="Size of a large message")
+@click.option("--chunk-size", default=2 * 1024 * 1024,
+              help="Size of a chunk passed to dataReceived")
+@click.option("--repeat", default=3)
+def run_benchmark(small_count, small_size, large_count, large_size,
+                  chunk_size, repeat):
+    scenarios = [
+        ("small", build_stream(small_count, small_size)),
+        ("large", build_stream(large_count, large_size)),
+    ]
+
+    for name, stream in scenarios:
+        for buffer_cls in (StringDataBuffer, DataBuffer):
+            best = min(timeit.repeat(
+                lambda: feed(buffer_cls, stream, chunk_size),
+                repeat=repeat, number=1))
+            print "{:6} {:17} {:8.4f} s  {:8.2f} MB/s".format(
+                name, buffer_cls.__name__, best,
+                len(stream) / best / 1024 / 1024)
+
+
+if __name__ == "__main__":
+    run_benchmark()
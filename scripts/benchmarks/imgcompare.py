@@ -0,0 +1,72 @@
+import collections
+import timeit
+
+import click
+import numpy
+from PIL import Image
+
+from apps.rendering.resources.imgcompare import calculate_mse
+from apps.rendering.resources.imgrepr import EXRImgRepr, PILImgRepr
+
+Point = collections.namedtuple('Point', ['x', 'y'])
+Window = collections.namedtuple('Window', ['min', 'max'])
+
+
+def loop_calculate_mse(img1, img2, start1=(0, 0), start2=(0, 0), box=None):
+    """ Previous, per-pixel implementation, kept here for comparison """
+    mse = 0
+    if box is None:
+        (res_x, res_y) = img1.get_size()
+    else:
+        (res_x, res_y) = box
+    for i in range(0, res_x):
+        for j in range(0, res_y):
+            [r1, g1, b1] = img1.get_pixel((start1[0] + i, start1[1] + j))
+            [r2, g2, b2] = img2.get_pixel((start2[0] + i, start2[1] + j))
+            mse += (r1 - r2) * (r1 - r2) + \
+                   (g1 - g2) * (g1 - g2) + \
+                   (b1 - b2) * (b1 - b2)
+    mse /= res_x * res_y * 3
+    return mse
+
+
+def make_pil(res_x, res_y):
+    img = PILImgRepr()
+    data = numpy.random.randint(0, 256, (res_y, res_x, 3)).astype(numpy.uint8)
+    img.img = Image.fromarray(data, 'RGB')
+    return img
+
+
+def make_exr(res_x, res_y):
+    img = EXRImgRepr()
+    img.dw = Window(Point(0, 0), Point(res_x - 1, res_y - 1))
+    img.rgb = [Image.fromarray(numpy.random.rand(res_y, res_x)
+                               .astype(numpy.float32), 'F')
+               for _ in xrange(3)]
+    return img
+
+
+@click.command()
+@click.option("--resolution", "-r", multiple=True,
+              default=["320x240", "800x600", "1920x1080"],
+              help="Compared image resolution, eg. 800x600")
+@click.option("--repeat", default=3)
+def run_benchmark(resolution, repeat):
+    for res in resolution:
+        res_x, res_y = [int(v) for v in res.split('x')]
+        for kind, make in [("PIL", make_pil), ("EXR", make_exr)]:
+            img1, img2 = make(res_x, res_y), make(res_x, res_y)
+            old = loop_calculate_mse(img1, img2)
+            new = calculate_mse(img1, img2)
+            assert abs(old - new) <= 1e-9 * max(abs(old), 1)
+
+            loop = min(timeit.repeat(lambda: loop_calculate_mse(img1, img2),
+                                     repeat=1, number=1))
+            vectorized = min(timeit.repeat(lambda: calculate_mse(img1, img2),
+                                           repeat=repeat, number=1))
+            print "{:>10} {}  loop: {:8.3f} s  numpy: {:8.4f} s ({:.0f}x)"\
+                .format(res, kind, loop, vectorized, loop / vectorized)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,97 @@
+import collections
+import timeit
+
+import click
+
+from golem.core.common import to_unicode
+from golem.core.simplehash import SimpleHash
+from golem.core.simpleserializer import CBORSerializer
+from golem.network.transport.message import Message, init_messages
+
+
+def sort_obj(v):
+    """ Previous hashing: recursive sorted copy of the dictionary
+    representation, kept here for comparison """
+    if isinstance(v, dict):
+        return sort_dict(v)
+    elif hasattr(v, '__dict__'):
+        return sort_dict(v.__dict__, filter_properties=True)
+    elif isinstance(v, basestring):
+        return to_unicode(v)
+    elif isinstance(v, collections.Iterable):
+        return v.__class__([sort_obj(_v) for _v in v])
+    return v
+
+
+def sort_dict(dictionary, filter_properties=False):
+    result = dict()
+    for k, v in dictionary.iteritems():
+        if filter_properties and (k.startswith('_') or callable(v)):
+            continue
+        result[to_unicode(k)] = sort_obj(v)
+    return sorted(result.items())
+
+
+def old_send(msg):
+    msg.sig = SimpleHash.hash(CBORSerializer.dumps(sort_obj(msg.dict_repr())))
+    return CBORSerializer.dumps(
+        [msg.TYPE, msg.sig, msg.timestamp, msg.dict_repr()])
+
+
+def old_receive(data):
+    msg_repr = CBORSerializer.loads(data)
+    msg = Message.registered_message_types[msg_repr[0]](
+        sig=msg_repr[1], timestamp=msg_repr[2], dict_repr=msg_repr[3])
+    SimpleHash.hash(CBORSerializer.dumps(sort_obj(msg.dict_repr())))
+    return msg
+
+
+def new_send(msg):
+    msg.sig = msg.get_short_hash()
+    return msg.serialize()
+
+
+def new_receive(data):
+    msg = Message.deserialize_message(data)
+    msg.get_short_hash()
+    return msg
+
+
+def build_messages():
+    """ One instance of every registered message type, with all payload
+    fields filled in """
+    init_messages()
+    messages = []
+    for msg_type in sorted(Message.registered_message_types):
+        msg = Message.registered_message_types[msg_type]()
+        for attr_name in getattr(msg, 'MAPPING', {}):
+            if getattr(msg, attr_name) is None:
+                setattr(msg, attr_name, "f" * 128)
+        messages.append(msg)
+    return messages
+
+
+@click.command()
+@click.option("--number", default=200, help="Round trips per message type")
+@click.option("--repeat", default=3)
+def run_benchmark(number, repeat):
+    messages = build_messages()
+
+    def measure(send, receive):
+        def round_trip():
+            for msg in messages:
+                # Fresh payload, as for a newly created message
+                msg._payload = None
+                receive(send(msg))
+        best = min(timeit.repeat(round_trip, repeat=repeat, number=number))
+        return number * len(messages) / best
+
+    old = measure(old_send, old_receive)
+    new = measure(new_send, new_receive)
+    print "message types: {}".format(len(messages))
+    print "sorted copy: {:10.1f} msg/s".format(old)
+    print "canonical:   {:10.1f} msg/s ({:.2f}x)".format(new, new / old)
+
+
+if __name__ == "__main__":
+    run_benchmark()
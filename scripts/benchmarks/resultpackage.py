@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import click
+
+from golem.core.fileencrypt import AESFileEncryptor
+from golem.task.result.resultpackage import EncryptingPackager, ZipPackager
+
+
+def create_files(directory, count, size, compressible):
+    chunk = 2 ** 20
+    paths = []
+    for i in xrange(count):
+        path = os.path.join(directory, 'file_{}'.format(i))
+        with open(path, 'wb') as f:
+            written = 0
+            while written < size:
+                n = min(chunk, size - written)
+                f.write('x' * n if compressible else os.urandom(n))
+                written += n
+        paths.append(path)
+    return paths
+
+
+def two_pass(paths, work_dir, secret):
+    # zip to a temporary file and encrypt it, then decrypt to another
+    # temporary file and unzip
+    pkg_path = os.path.join(work_dir, 'result.pkg')
+    out_path = os.path.join(work_dir, 'result.enc')
+    ZipPackager().create(pkg_path, paths)
+    AESFileEncryptor.encrypt(pkg_path, out_path, secret)
+    os.remove(pkg_path)
+
+    dec_path = out_path + '.dec'
+    AESFileEncryptor.decrypt(out_path, dec_path, secret)
+    with zipfile.ZipFile(dec_path) as zf:
+        zf.extractall(os.path.join(work_dir, 'two_pass'))
+    os.remove(dec_path)
+    return os.path.getsize(out_path)
+
+
+def streaming(paths, work_dir, secret, compress_level):
+    out_path = os.path.join(work_dir, 'result.stream')
+    packager = EncryptingPackager(secret, compress_level=compress_level)
+    packager.create(out_path, paths)
+    packager.extract(out_path, os.path.join(work_dir, 'streaming'))
+    return os.path.getsize(out_path)
+
+
+def measure(fn, *args):
+    start = time.time()
+    size = fn(*args)
+    return time.time() - start, size
+
+
+@click.command()
+@click.option("--count", default=4, help="Number of result files")
+@click.option("--size", default=64, help="Size of a result file in MiB")
+@click.option("--compress-level", default=0,
+              help="zlib compression level, ZipPackager only stores files")
+@click.option("--compressible/--random", default=False,
+              help="Contents of result files")
+def run_benchmark(count, size, compress_level, compressible):
+    work_dir = tempfile.mkdtemp()
+    secret = os.urandom(32)
+    try:
+        paths = create_files(work_dir, count, size * 2 ** 20, compressible)
+        total = count * size
+
+        old, old_size = measure(two_pass, paths, work_dir, secret)
+        new, new_size = measure(streaming, paths, work_dir, secret,
+                                compress_level)
+    finally:
+        shutil.rmtree(work_dir)
+
+    print "results: {} x {} MiB".format(count, size)
+    print "two pass:  {:8.2f} s {:8.1f} MiB/s {:12} B".format(
+        old, total / old, old_size)
+    print "streaming: {:8.2f} s {:8.1f} MiB/s {:12} B ({:.1f}x)".format(
+        new, total / new, new_size, old / new)
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+import timeit
+
+import click
+from mock import Mock, patch
+
+from golem.core.common import get_timestamp_utc, timeout_to_deadline
+from golem.network.p2p.node import Node
+from golem.task.taskbase import ComputeTaskDef, Task, TaskHeader
+from golem.task.taskmanager import TaskManager
+from golem.task.taskstate import SubtaskStatus, TaskStatus
+
+
+class BenchmarkTask(Task):
+    def query_extra_data(self, *args, **kwargs):
+        pass
+
+    def computation_failed(self, subtask_id):
+        pass
+
+
+def scan_timeouts(tm):
+    """ Previous check_timeouts implementation, iterating over all tasks
+    and subtasks, kept here for comparison """
+    nodes_with_timeouts = []
+    for t in tm.tasks.values():
+        th = t.header
+        if tm.tasks_states[th.task_id].status not in tm.activeStatus:
+            continue
+        cur_time = get_timestamp_utc()
+        if cur_time > th.deadline:
+            t.task_stats = TaskStatus.timeout
+            tm.tasks_states[th.task_id].status = TaskStatus.timeout
+            tm.notice_task_updated(th.task_id)
+        ts = tm.tasks_states[th.task_id]
+        for s in ts.subtask_states.values():
+            if SubtaskStatus.is_computed(s.subtask_status):
+                if cur_time > s.deadline:
+                    s.subtask_status = SubtaskStatus.failure
+                    nodes_with_timeouts.append(s.computer.node_id)
+                    t.computation_failed(s.subtask_id)
+                    s.stderr = "[GOLEM] Timeout"
+                    tm.notice_task_updated(th.task_id)
+    return nodes_with_timeouts
+
+
+def create_task_manager(path, tasks, subtasks, expired):
+    """ Create task manager with `tasks` tasks, each with `subtasks`
+    computed subtasks; `expired` subtasks of each task are timed out """
+    keys_auth = Mock()
+    keys_auth.get_key_id.return_value = 'KEYID'
+    keys_auth.sign.return_value = 'sig'
+    with patch('apps.appsmanager.AppsManager.load_apps'):
+        tm = TaskManager("bench", Node(), keys_auth, root_path=path,
+                         tasks_dir=path + "/tasks")
+    tm.listen_address, tm.listen_port = "10.10.10.10", 2222
+    add_subtask = tm._TaskManager__add_subtask_to_tasks_states
+
+    for i in xrange(tasks):
+        task_id = "task{}".format(i)
+        header = TaskHeader("bench", task_id, "10.10.10.10", 2222, "KEYID",
+                            "env", deadline=timeout_to_deadline(3600))
+        tm.add_new_task(BenchmarkTask(header, src_code=''))
+        tm.start_task(task_id)
+        for j in xrange(subtasks):
+            ctd = ComputeTaskDef()
+            ctd.task_id = task_id
+            ctd.subtask_id = "{}-{}".format(task_id, j)
+            ctd.deadline = timeout_to_deadline(-1 if j < expired else 3600)
+            add_subtask("node", "node{}".format(j), 1, ctd, "10.10.10.10")
+            tm.subtask2task_mapping[ctd.subtask_id] = task_id
+    return tm
+
+
+@click.command()
+@click.option("--tasks", default=10, help="Number of active tasks")
+@click.option("--subtasks", default=1000,
+              help="Number of computed subtasks of each task")
+@click.option("--expired", default=1,
+              help="Number of subtasks of each task that time out")
+@click.option("--ticks", default=100,
+              help="Number of check_timeouts calls measured")
+def run_benchmark(tasks, subtasks, expired, ticks):
+    path = tempfile.mkdtemp()
+    try:
+        for name, check in [("scan", scan_timeouts),
+                            ("heap", TaskManager.check_timeouts)]:
+            tm = create_task_manager(path, tasks, subtasks, expired)
+            # the first tick handles expired subtasks, the next ones are idle
+            first = timeit.timeit(lambda: check(tm), number=1)
+            idle = timeit.timeit(lambda: check(tm), number=ticks) / ticks
+            print "{:5} first tick: {:8.3f} ms  idle tick: {:8.3f} ms".format(
+                name, first * 1000, idle * 1000)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    run_benchmark()
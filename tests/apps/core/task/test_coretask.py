@@ -6,6 +6,7 @@ import zlib
 from copy import copy
 
 from mock import MagicMock
+from twisted.internet import defer
 
 
 from golem.core.common import is_linux
@@ -251,6 +252,25 @@ class TestCoreTask(LogTestCase, TestDirFixture):
         assert task.subtasks_given["def"]["status"] == SubtaskStatus.restarted
         assert task.subtasks_given["ghi"]["status"] == SubtaskStatus.resent
         assert task.subtasks_given["jkl"]["status"] == SubtaskStatus.restarted
+        assert sorted(sub for _, sub in task.failed_subtasks) \
+            == ["def", "jkl", "xyz"]
+
+    def test_restore_failed_subtasks(self):
+        task = self._get_core_task()
+        task.subtasks_given["abc"] = {'status': SubtaskStatus.failure,
+                                      'start_task': 4}
+        task.subtasks_given["def"] = {'status': SubtaskStatus.finished,
+                                      'start_task': 2}
+        task.subtasks_given["ghi"] = {'status': SubtaskStatus.restarted,
+                                      'start_task': 1}
+        state = task.__getstate__()
+        del state['failed_subtasks']
+
+        restored = CoreTask.__new__(CoreTask)
+        restored.__setstate__(state)
+        assert restored._pop_failed_subtask() == "ghi"
+        assert restored._pop_failed_subtask() == "abc"
+        assert restored._pop_failed_subtask() is None
 
     @staticmethod
     def __compress_and_dump_file(file_name, data):
@@ -394,6 +414,29 @@ class TestCoreTask(LogTestCase, TestDirFixture):
         c._mark_subtask_failed("subtask1")
         assert c._accept_client("Node 1") == AcceptClientVerdict.REJECTED
 
+    def test_computation_finished_with_scheduler(self):
+        c = self._get_core_task()
+        scheduler = MagicMock()
+        scheduler.schedule.side_effect = \
+            lambda deadline, verify, *args: defer.maybeDeferred(verify, *args)
+        files = self.additional_dir_content([1])
+
+        c.subtasks_given["subtask1"] = {"node_id": "Node 1",
+                                        "status": SubtaskStatus.downloading}
+        deferred = c.computation_finished("subtask1", files,
+                                          result_types['files'], scheduler)
+        assert deferred.called
+        assert scheduler.schedule.call_args[0][0] == c.header.deadline
+        assert c.subtasks_given["subtask1"]["status"] == SubtaskStatus.finished
+
+        c.subtasks_given["subtask2"] = {"node_id": "Node 1",
+                                        "status": SubtaskStatus.downloading}
+        c.verificator.verify = MagicMock(side_effect=ValueError("wrong"))
+        with self.assertLogs(logger, level="ERROR"):
+            c.computation_finished("subtask2", files, result_types['files'],
+                                   scheduler)
+        assert c.subtasks_given["subtask2"]["status"] == SubtaskStatus.failure
+
     def test_create_path_in_load_task_result(self):
         c = self._get_core_task()
         assert not os.path.isdir(os.path.join(c.tmp_dir, "subtask1"))
@@ -0,0 +1,95 @@
+import unittest
+
+from apps.lux.task.flmmerger import FlmMergeTree
+
+
+class TestFlmMergeTree(unittest.TestCase):
+
+    @staticmethod
+    def _merge(tree):
+        path = tree.merge_name()
+        tree.merge_finished(path)
+        return path
+
+    def test_incremental_merges(self):
+        tree = FlmMergeTree(arity=2)
+        tree.add(1, 'a.flm')
+        assert tree.next_merge() is None
+        tree.add(2, 'b.flm')
+        films = tree.next_merge()
+        assert [p for _, p in films] == ['a.flm', 'b.flm']
+
+        # only one merge at a time
+        tree.add(3, 'c.flm')
+        tree.add(4, 'd.flm')
+        assert tree.next_merge() is None
+        ab = self._merge(tree)
+        assert tree.levels[1] == [(frozenset([1, 2]), ab)]
+
+        films = tree.next_merge()
+        assert [p for _, p in films] == ['c.flm', 'd.flm']
+        cd = self._merge(tree)
+
+        # merged films are merged again
+        films = tree.next_merge()
+        assert [p for _, p in films] == [ab, cd]
+        abcd = self._merge(tree)
+        assert tree.next_merge() is None
+        assert tree.result() == abcd
+
+    def test_final_merge(self):
+        tree = FlmMergeTree(arity=3)
+        for i in xrange(4):
+            tree.add(i, '{}.flm'.format(i))
+        tree.next_merge()
+        merged = self._merge(tree)
+        tree.add(4, '4.flm')
+        assert tree.result() is None
+
+        films = tree.next_merge(final=True)
+        assert sorted(p for _, p in films) == ['3.flm', '4.flm', merged]
+        tree.merge_finished('final.flm')
+        assert tree.result() == 'final.flm'
+        assert tree.next_merge(final=True) is None
+
+    def test_replaced_result(self):
+        tree = FlmMergeTree(arity=2)
+        tree.add(1, 'a.flm')
+        tree.add(2, 'b.flm')
+        tree.add(3, 'c.flm')
+        tree.next_merge()
+        self._merge(tree)
+
+        # result merged before is replaced
+        tree.add(1, 'a2.flm')
+        assert sorted(p for f in tree.levels for _, p in f) \
+            == ['a2.flm', 'b.flm', 'c.flm']
+
+        # result is replaced during the merge
+        films = tree.next_merge()
+        key, = films[0][0]
+        tree.add(key, 'x.flm')
+        self._merge(tree)
+        assert tree.levels[1] == []
+        assert len(tree.levels[0]) == 3
+
+    def test_merge_failed(self):
+        tree = FlmMergeTree(arity=2)
+        tree.add(1, 'a.flm')
+        tree.add(2, 'b.flm')
+        tree.next_merge()
+        tree.merge_failed()
+        assert tree.failed
+        assert len(tree.levels[0]) == 2
+        tree.add(3, 'c.flm')
+        assert tree.next_merge() is None
+        assert len(tree.next_merge(final=True)) == 3
+
+    def test_cancel(self):
+        tree = FlmMergeTree(arity=2)
+        tree.add(1, 'a.flm')
+        tree.add(2, 'b.flm')
+        tree.next_merge()
+        tree.cancel()
+        assert tree.running is None
+        assert sorted(p for _, p in tree.levels[0]) == ['a.flm', 'b.flm']
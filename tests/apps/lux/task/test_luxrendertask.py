@@ -185,6 +185,129 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
         assert luxtask.num_tasks_received == 1
         assert luxtask.collected_file_names[1] == flm_file
 
+    @patch("apps.lux.task.luxrendertask.LocalComputer")
+    def test_merge_flms(self, local_computer):
+        luxtask = self.get_test_lux_task()
+        luxtask.total_tasks = 5
+        luxtask.res_x, luxtask.res_y = 10, 10
+        luxtask.output_file = os.path.join(self.path, "outputfile")
+        luxtask.verificator.advanced_verification = False
+        luxtask._update_preview = Mock()
+
+        def accept(num):
+            flm = os.path.join(self.path, "result{}.flm".format(num))
+            open(flm, 'w').close()
+            subtask_id = "SUBTASK{}".format(num)
+            luxtask.subtasks_given[subtask_id] = {"start_task": num,
+                                                  "node_id": "NODE"}
+            luxtask._accept_client("NODE")
+            luxtask.accept_results(subtask_id, [flm])
+            return flm
+
+        def merged(name):
+            out_dir = os.path.join(self.path, "out")
+            if not os.path.isdir(out_dir):
+                os.makedirs(out_dir)
+            flm = os.path.join(out_dir, name + ".flm")
+            log = os.path.join(out_dir, "stdout.log")
+            for f in [flm, log]:
+                open(f, 'w').close()
+            args, _ = local_computer.call_args
+            args[2]({'data': [flm, log]}, 1)
+
+        files = [accept(num) for num in xrange(1, 4)]
+        local_computer.assert_not_called()
+
+        # first results are merged before all of them are received
+        files.append(accept(4))
+        assert local_computer.call_count == 1
+        _, kwargs = local_computer.call_args
+        assert kwargs['additional_resources'] == files
+        ctd = local_computer.call_args[0][4]()
+        assert ctd.extra_data['flm_files'] == \
+            [os.path.basename(f) for f in files]
+        merged("merged_1")
+        assert luxtask.flm_merges.levels[1][0][1].endswith("merged_1.flm")
+
+        # the final merge only has to add the last result and it's finished
+        # before the result is accepted
+        local_computer.return_value.tt.join.reset_mock()
+        last = accept(5)
+        assert local_computer.call_count == 2
+        assert local_computer.return_value.tt.join.called
+        _, kwargs = local_computer.call_args
+        assert len(kwargs['additional_resources']) == 2
+        assert last in kwargs['additional_resources']
+        assert local_computer.call_args[0][4]().extra_data['output_flm'] \
+            == luxtask.output_file
+        with patch.object(luxtask, "_LuxTask__generate_final_file") as gen:
+            merged("outputfile")
+        gen.assert_called_once_with(luxtask.output_file + ".flm")
+
+        # restarted task merges everything again
+        luxtask.restart()
+        assert luxtask.flm_merges.sources == {}
+
+    @patch("apps.lux.task.luxrendertask.LocalComputer")
+    def test_merge_finished_with_last_result(self, local_computer):
+        luxtask = self.get_test_lux_task()
+        luxtask.total_tasks = 5
+        luxtask.res_x, luxtask.res_y = 10, 10
+        luxtask.output_file = os.path.join(self.path, "outputfile")
+        luxtask.verificator.advanced_verification = False
+        luxtask._update_preview = Mock()
+
+        for num in xrange(1, 6):
+            flm = os.path.join(self.path, "result{}.flm".format(num))
+            open(flm, 'w').close()
+            subtask_id = "SUBTASK{}".format(num)
+            luxtask.subtasks_given[subtask_id] = {"start_task": num,
+                                                  "node_id": "NODE"}
+            luxtask._accept_client("NODE")
+            if num == 5:
+                # the background merge finishes in its thread while the
+                # last result is accepted
+                merged = os.path.join(self.path, "merged_1.flm")
+                open(merged, 'w').close()
+                callback = local_computer.call_args[0][2]
+                local_computer.return_value.tt.join.side_effect = \
+                    lambda: callback({'data': [merged]}, 1)
+            luxtask.accept_results(subtask_id, [flm])
+
+        # it doesn't start the final merge, only the last result does
+        assert local_computer.call_count == 2
+        _, kwargs = local_computer.call_args
+        assert len(kwargs['additional_resources']) == 2
+        assert local_computer.call_args[0][4]().extra_data['output_flm'] \
+            == luxtask.output_file
+
+    @patch("apps.lux.task.luxrendertask.LocalComputer")
+    def test_final_merge_failure(self, local_computer):
+        luxtask = self.get_test_lux_task()
+        luxtask.total_tasks = 2
+        luxtask.res_x, luxtask.res_y = 10, 10
+        luxtask.verificator.advanced_verification = False
+        luxtask._update_preview = Mock()
+
+        for num in [1, 2]:
+            flm = os.path.join(self.path, "result{}.flm".format(num))
+            open(flm, 'w').close()
+            subtask_id = "SUBTASK{}".format(num)
+            luxtask.subtasks_given[subtask_id] = {"start_task": num,
+                                                  "node_id": "NODE"}
+            luxtask._accept_client("NODE")
+            luxtask.accept_results(subtask_id, [flm])
+
+        assert local_computer.call_count == 1
+        with self.assertLogs(logger, level="ERROR"):
+            local_computer.call_args[0][3]("merge error")
+        # task without the final film is not finished
+        assert luxtask.final_merge_failed
+        assert not luxtask.verify_task()
+
+        luxtask.restart()
+        assert not luxtask.final_merge_failed
+
     def test_pickling(self):
         """Test for issue #873
 
@@ -1,4 +1,5 @@
 import os
+import random
 
 from PIL import Image
 
@@ -158,6 +159,40 @@ class TestCompareImgFunctions(TempDirFixture, LogTestCase):
 
         assert calculate_mse(img1, img2, start1=(0, 0), start2=(2, 2), box=(7, 7)) == 0
 
+    def test_calculate_mse_per_pixel(self):
+        def per_pixel_mse(img1, img2, start1, start2, box):
+            mse = 0
+            for i in range(box[0]):
+                for j in range(box[1]):
+                    p1 = img1.get_pixel((start1[0] + i, start1[1] + j))
+                    p2 = img2.get_pixel((start2[0] + i, start2[1] + j))
+                    mse += sum((c1 - c2) ** 2 for c1, c2 in zip(p1, p2))
+            return mse / float(box[0] * box[1] * 3)
+
+        img1 = get_pil_img_repr(self.temp_file_name("img1.png"), (20, 15))
+        img2 = get_pil_img_repr(self.temp_file_name("img2.png"), (20, 15))
+        random.seed(0)
+        for img in [img1, img2]:
+            for _ in range(100):
+                img.set_pixel((random.randrange(20), random.randrange(15)),
+                              [random.randrange(256) for _ in range(3)])
+
+        for start1, start2, box in [((0, 0), (0, 0), (20, 15)),
+                                    ((3, 2), (1, 4), (10, 7)),
+                                    ((19, 14), (0, 0), (1, 1))]:
+            expected = per_pixel_mse(img1, img2, start1, start2, box)
+            mse = calculate_mse(img1, img2, start1, start2, box)
+            assert mse == int(expected)
+
+        exr_img1 = get_exr_img_repr()
+        exr_img2 = get_exr_img_repr(alt=True)
+        expected = per_pixel_mse(exr_img1, exr_img2, (2, 1), (0, 3), (8, 7))
+        mse = calculate_mse(exr_img1, exr_img2, (2, 1), (0, 3), (8, 7))
+        self.assertAlmostEqual(mse, expected)
+
+        with self.assertRaises(ValueError):
+            calculate_mse(img1, img2, start1=(-1, 0), box=(5, 5))
+
     def test_compare_imgs(self):
         img1_path = self.temp_file_name("img1.png")
         img2_path = self.temp_file_name("img2.png")
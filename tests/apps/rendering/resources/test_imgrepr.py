@@ -86,6 +86,16 @@ class TestPILImgRepr(TempDirFixture):
         assert p_copy.get_pixel((5, 3)) == [200, 210, 220]
         assert p.get_pixel((5, 3)) == [255, 0, 0]
 
+    def test_to_array(self):
+        img_path = self.temp_file_name('img.png')
+        p = get_pil_img_repr(img_path, size=(10, 5))
+        p.set_pixel((3, 1), [10, 11, 12])
+        arr = p.to_array()
+        assert arr.shape == (5, 10, 3)
+        assert list(arr[1, 3]) == [10, 11, 12]
+        assert list(arr[0, 0]) == [255, 0, 0]
+        assert (arr == ImgRepr.to_array(p)).all()
+
 
 def almost_equal(v1, v2):
     assert abs(v1 - v2) < 0.001
@@ -182,6 +192,13 @@ class TestExrImgRepr(TempDirFixture):
         img3 = img_alt.to_pil(use_extremas=True)
         assert isinstance(img3, Image.Image)
 
+    def test_to_array(self):
+        e = get_exr_img_repr()
+        arr = e.to_array()
+        assert arr.shape == (10, 10, 3)
+        assert list(arr[5, 5]) == e.get_pixel((5, 5))
+        assert (arr == ImgRepr.to_array(e)).all()
+
     def test_to_l_image(self):
         e = get_exr_img_repr()
         img = e.to_l_image()
@@ -0,0 +1,79 @@
+import os
+
+from mock import patch
+from PIL import Image
+
+from apps.rendering.task.previewcompositor import PreviewCompositor
+from golem.testutils import TempDirFixture
+
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+
+
+class TestPreviewCompositor(TempDirFixture):
+
+    def setUp(self):
+        super(TestPreviewCompositor, self).setUp()
+        self.path = os.path.join(self.tempdir, 'task_preview.png')
+        self.base_path = os.path.join(self.tempdir, 'preview.png')
+        Image.new("RGB", (40, 30), BLUE).save(self.base_path, "PNG")
+
+    def _saved_pixel(self, xy):
+        img = Image.open(self.path)
+        try:
+            return img.getpixel(xy)
+        finally:
+            img.close()
+
+    def test_update(self):
+        compositor = PreviewCompositor(self.path, (40, 30))
+        compositor.update({(0, 0, 40, 10): GREEN, (0, 10, 40, 20): RED},
+                          self.base_path)
+        assert not compositor.dirty
+        assert self._saved_pixel((5, 5)) == GREEN
+        assert self._saved_pixel((5, 15)) == RED
+        assert self._saved_pixel((5, 25)) == BLUE
+
+        compositor.save_interval = 3600
+        compositor.update({(0, 10, 40, 20): GREEN}, self.base_path)
+        assert compositor.dirty
+        assert compositor.image.getpixel((5, 5)) == BLUE
+        assert compositor.image.getpixel((5, 15)) == GREEN
+        assert self._saved_pixel((5, 15)) == RED
+
+        compositor.flush()
+        assert not compositor.dirty
+        assert self._saved_pixel((5, 5)) == BLUE
+        assert self._saved_pixel((5, 15)) == GREEN
+
+    def test_update_only_changed_areas(self):
+        compositor = PreviewCompositor(self.path, (40, 30))
+        compositor.update({(0, 0, 40, 10): GREEN}, self.base_path)
+        with patch.object(compositor, '_fill') as fill:
+            compositor.update({(0, 0, 40, 10): GREEN, (0, 10, 40, 20): RED},
+                              self.base_path)
+        fill.assert_called_once_with((0, 10, 40, 20), RED)
+
+        compositor.flush()
+        compositor.update({(0, 0, 40, 10): GREEN, (0, 10, 40, 20): RED},
+                          self.base_path)
+        assert not compositor.dirty
+
+    def test_base_changed(self):
+        compositor = PreviewCompositor(self.path, (40, 30))
+        compositor.update({(0, 0, 40, 10): GREEN}, self.base_path)
+
+        Image.new("RGB", (80, 60), RED).save(self.base_path, "PNG")
+        os.utime(self.base_path, (0, 0))
+        compositor.update({(0, 0, 40, 10): GREEN}, self.base_path)
+        compositor.flush()
+        assert self._saved_pixel((5, 5)) == GREEN
+        assert self._saved_pixel((5, 25)) == RED
+
+    def test_no_base(self):
+        compositor = PreviewCompositor(self.path, (40, 30))
+        compositor.update({(0, 0, 40, 10): GREEN, (0, 10, 0, 20): RED},
+                          os.path.join(self.tempdir, 'missing.png'))
+        assert self._saved_pixel((5, 5)) == GREEN
+        assert self._saved_pixel((5, 15)) == (0, 0, 0)
@@ -2,6 +2,7 @@ import ntpath
 from os import makedirs, path, remove
 
 from mock import Mock, patch, ANY
+from PIL import Image
 
 from apps.core.task.coretaskstate import Options, TaskDefinition, TaskState
 from apps.core.task.coretask import logger as core_logger
@@ -155,6 +156,32 @@ class TestRenderingTask(TestDirFixture, LogTestCase):
         task.update_task_state(state)
         assert state.extra_data["result_preview"] == "preview_file"
 
+    def test_update_task_preview(self):
+        task = self.task
+        task.subtasks_given["a"] = {'status': SubtaskStatus.starting,
+                                    'start_task': 2, 'end_task': 2}
+        task.subtasks_given["b"] = {'status': SubtaskStatus.failure,
+                                    'start_task': 3, 'end_task': 3}
+        task.subtasks_given["c"] = {'status': SubtaskStatus.starting,
+                                    'start_task': 3, 'end_task': 3}
+        task._update_task_preview()
+
+        def pixels():
+            img = Image.open(task.preview_task_file_path)
+            result = [img.getpixel((0, y)) for y in [0, 8, 14]]
+            img.close()
+            return result
+
+        assert pixels() == [(0, 0, 0), (0, 255, 0), (255, 0, 0)]
+
+        compositor = task._task_previews[task.preview_task_file_path]
+        compositor.save_interval = 3600
+        task.subtasks_given["a"]['status'] = SubtaskStatus.finished
+        task._update_task_preview()
+        assert pixels() == [(0, 0, 0), (0, 255, 0), (255, 0, 0)]
+        task.update_task_state(TaskState())
+        assert pixels() == [(0, 0, 0), (0, 0, 0), (255, 0, 0)]
+
     def test_mode_and_ext_in_open_preview(self):
         task = self.task
         preview = task._open_preview()
@@ -290,6 +317,32 @@ class TestRenderingTask(TestDirFixture, LogTestCase):
         task.last_task = 10
         assert task._get_next_task() == (None, None)
 
+    def test_get_next_task_resends_failed(self):
+        task = self.task
+        task.total_tasks = 10
+        task.last_task = 10
+        task.counting_nodes = {'node': Mock()}
+        for i in [7, 3, 5]:
+            task.subtasks_given['sub{}'.format(i)] = {
+                'status': SubtaskStatus.starting,
+                'start_task': i,
+                'end_task': i,
+                'node_id': 'node'
+            }
+        task.computation_failed('sub7')
+        task.computation_failed('sub3')
+        task.restart_subtask('sub5')
+        assert task.num_failed_subtasks == 3
+
+        assert task._get_next_task() == (3, 3)
+        assert task.subtasks_given['sub3']['status'] == SubtaskStatus.resent
+
+        # subtasks already sent again are skipped
+        task.subtasks_given['sub5']['status'] = SubtaskStatus.resent
+        assert task._get_next_task() == (7, 7)
+        assert task._get_next_task() == (None, None)
+        assert task.failed_subtasks == []
+
     def test_put_collected_files_together(self):
         output_name = self.temp_file_name("output.exr")
         exr1 = _get_test_exr()
@@ -0,0 +1,66 @@
+import unittest
+
+from golem.core.channelcipher import ChannelCipher, ChannelDecryptionError
+
+
+class TestChannelCipher(unittest.TestCase):
+
+    def setUp(self):
+        key = ChannelCipher.gen_key()
+        self.sender = ChannelCipher(key)
+        self.receiver = ChannelCipher(key)
+
+    def test_key_length(self):
+        with self.assertRaises(ValueError):
+            ChannelCipher("too short")
+
+    def test_encrypt_decrypt(self):
+        for data in ["", "abc", "abcdefghijklm" * 1000]:
+            frame = self.sender.encrypt(data)
+            assert ChannelCipher.is_channel_frame(frame)
+            assert len(frame) == len(data) + ChannelCipher.overhead_length
+            assert self.receiver.decrypt(frame) == data
+
+    def test_is_channel_frame(self):
+        assert not ChannelCipher.is_channel_frame("")
+        assert not ChannelCipher.is_channel_frame(chr(0x04) + "a" * 100)
+        assert not ChannelCipher.is_channel_frame(chr(0x05))
+
+    def test_wrong_key(self):
+        frame = self.sender.encrypt("data")
+        other = ChannelCipher(ChannelCipher.gen_key())
+        with self.assertRaises(ChannelDecryptionError):
+            other.decrypt(frame)
+
+    def test_tampered(self):
+        frame = self.sender.encrypt("data")
+        tampered = frame[:10] + chr(ord(frame[10]) ^ 1) + frame[11:]
+        with self.assertRaises(ChannelDecryptionError):
+            self.receiver.decrypt(tampered)
+        # Counter is authenticated too
+        tampered = frame[:8] + chr(ord(frame[8]) ^ 1) + frame[9:]
+        with self.assertRaises(ChannelDecryptionError):
+            self.receiver.decrypt(tampered)
+        assert self.receiver.decrypt(frame) == "data"
+
+    def test_replay(self):
+        frames = [self.sender.encrypt(str(i)) for i in xrange(5)]
+        assert self.receiver.decrypt(frames[0]) == "0"
+        with self.assertRaises(ChannelDecryptionError):
+            self.receiver.decrypt(frames[0])
+
+        # Reordered frames within the window are accepted once
+        assert self.receiver.decrypt(frames[3]) == "3"
+        assert self.receiver.decrypt(frames[1]) == "1"
+        assert self.receiver.decrypt(frames[4]) == "4"
+        assert self.receiver.decrypt(frames[2]) == "2"
+        for frame in frames:
+            with self.assertRaises(ChannelDecryptionError):
+                self.receiver.decrypt(frame)
+
+    def test_replay_window(self):
+        old = self.sender.encrypt("old")
+        for _ in xrange(ChannelCipher.replay_window):
+            self.receiver.decrypt(self.sender.encrypt("data"))
+        with self.assertRaises(ChannelDecryptionError):
+            self.receiver.decrypt(old)
@@ -0,0 +1,97 @@
+import struct
+import unittest
+
+from golem.core.databuffer import DataBuffer, MAX_BUFFER_SIZE
+
+
+class TestDataBuffer(unittest.TestCase):
+
+    def test_ulong(self):
+        db = DataBuffer()
+        with self.assertRaises(AttributeError):
+            db.append_ulong(-1)
+        with self.assertRaises(ValueError):
+            db.peek_ulong()
+
+        assert db.append_ulong(7) == struct.pack("!L", 7)
+        db.append_ulong(2 ** 32 - 1)
+        assert db.data_size() == 8
+        assert db.peek_ulong() == 7
+        assert db.read_ulong() == 7
+        assert db.read_ulong() == 2 ** 32 - 1
+        assert db.data_size() == 0
+
+    def test_string(self):
+        db = DataBuffer()
+        db.append_string("abc")
+        db.append_string("def")
+        assert db.buffered_data == "abcdef"
+        assert db.peek_string(2) == "ab"
+        assert db.read_string(2) == "ab"
+        assert db.buffered_data == "cdef"
+        with self.assertRaises(AttributeError):
+            db.read_string(5)
+        assert db.read_all() == "cdef"
+        assert db.data_size() == 0
+        assert db.read_all() == ""
+
+    def test_len_prefixed_strings(self):
+        db = DataBuffer()
+        strings = ["string {}".format(i) * i for i in xrange(1, 100)]
+        for s in strings:
+            db.append_len_prefixed_string(s)
+
+        assert list(db.get_len_prefixed_string()) == strings
+        assert db.data_size() == 0
+        assert db.read_len_prefixed_string() is None
+
+    def test_partial_data(self):
+        src = DataBuffer()
+        src.append_len_prefixed_string("first message")
+        src.append_len_prefixed_string("second message")
+        data = src.read_all()
+
+        db = DataBuffer()
+        result = []
+        for i in xrange(len(data)):
+            db.append_string(data[i])
+            msg = db.read_len_prefixed_string()
+            if msg:
+                result.append(msg)
+
+        assert result == ["first message", "second message"]
+        assert db.data_size() == 0
+
+    def test_compaction(self):
+        db = DataBuffer()
+        for i in xrange(1000):
+            db.append_len_prefixed_string(str(i))
+            db.append_string("x")
+            assert db.read_len_prefixed_string() == str(i)
+            assert db.read_string(1) == "x"
+        assert db.data_size() == 0
+
+        db.append_string("abcd")
+        db.read_string(3)
+        db.append_string("efgh")
+        assert db.buffered_data == "defgh"
+
+    def test_overflow(self):
+        db = DataBuffer()
+        db.append_string("a" * 10)
+        db.append_len_prefixed_string("b" * MAX_BUFFER_SIZE)
+
+        assert db.data_size() == MAX_BUFFER_SIZE + 4
+        assert db.read_len_prefixed_string() == "b" * MAX_BUFFER_SIZE
+
+        db.append_string("c" * 10)
+        db.append_string("d" * MAX_BUFFER_SIZE, check_size=False)
+        assert db.data_size() == MAX_BUFFER_SIZE + 10
+
+    def test_clear_buffer(self):
+        db = DataBuffer()
+        db.append_len_prefixed_string("abc")
+        db.read_ulong()
+        db.clear_buffer()
+        assert db.data_size() == 0
+        assert db.buffered_data == ""
@@ -1,5 +1,6 @@
 import os
 import random
+from cStringIO import StringIO
 
 from golem.core.fileencrypt import FileHelper, FileEncryptor, AESFileEncryptor
 from golem.resource.dirmanager import DirManager
@@ -93,6 +94,34 @@ class TestAESFileEncryptor(TestDirFixture):
 
         self.assertFalse(decrypted)
 
+    def test_stream(self):
+        """ Test encrypting and decrypting streams """
+        secret = FileEncryptor.gen_secret(10, 20)
+        with open(self.test_file_path, 'rb') as f:
+            data = f.read()
+
+        for size in [0, 15, 16, 17, len(data)]:
+            dst = StringIO()
+            writer = AESFileEncryptor.encrypting_writer(dst, secret)
+            # writes not aligned to blocks
+            for i in xrange(0, size, 7):
+                writer.write(data[i:min(i + 7, size)])
+            writer.close()
+
+            src = StringIO(dst.getvalue())
+            reader = AESFileEncryptor.decrypting_reader(src, secret)
+            chunks = iter(lambda: reader.read(5), '')
+            self.assertEqual(''.join(chunks), data[:size])
+
+            # compatible with file encryption
+            with open(self.enc_file_path, 'wb') as f:
+                f.write(dst.getvalue())
+            decrypted_path = self.test_file_path + ".dec"
+            AESFileEncryptor.decrypt(self.enc_file_path, decrypted_path,
+                                     secret)
+            with open(decrypted_path, 'rb') as f:
+                self.assertEqual(f.read(), data[:size])
+
     def test_get_key_and_iv(self):
         """ Test helper methods: gen_salt and get_key_and_iv """
         salt = AESFileEncryptor.gen_salt(AESFileEncryptor.block_size)
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import time
+
+from mock import patch
+
+from golem.core.filehash import FileHasher
+from golem.testutils import TempDirFixture
+
+
+class TestFileHasher(TempDirFixture):
+
+    def setUp(self):
+        super(TestFileHasher, self).setUp()
+        self.index_path = os.path.join(self.tempdir, 'index.json')
+        self.hasher = FileHasher(self.index_path)
+        self.files = [self._create_file(str(i), str(i) * 1000)
+                      for i in xrange(4)]
+
+    def _create_file(self, name, data, age=60):
+        file_path = os.path.join(self.tempdir, name)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+        past = time.time() - age
+        os.utime(file_path, (past, past))
+        return file_path
+
+    def test_digest(self):
+        for algorithm in ['sha1', 'sha256']:
+            for file_path in self.files:
+                with open(file_path, 'rb') as f:
+                    expected = hashlib.new(algorithm, f.read()).digest()
+                assert self.hasher.digest(file_path, algorithm) == expected
+
+        with patch.object(self.hasher, 'block_size', 7):
+            digest = self.hasher._compute(self.files[0], 'sha1')
+        assert digest == self.hasher.digest(self.files[0])
+
+    def test_index(self):
+        with patch.object(FileHasher, '_compute',
+                          wraps=self.hasher._compute) as compute:
+            first = self.hasher.digest(self.files[0])
+            assert self.hasher.digest(self.files[0]) == first
+            assert compute.call_count == 1
+            assert self.hasher.get_stats() == {'size': 1, 'hits': 1,
+                                               'misses': 1}
+
+            # Changed file is hashed again
+            self._create_file('0', 'changed')
+            assert self.hasher.digest(self.files[0]) != first
+            assert compute.call_count == 2
+
+            # Recently modified file is not remembered
+            fresh = self._create_file('fresh', 'data', age=0)
+            self.hasher.digest(fresh)
+            self.hasher.digest(fresh)
+            assert compute.call_count == 4
+
+    def test_digests(self):
+        expected = [self.hasher.digest(f) for f in self.files]
+        self.hasher.clear()
+        for workers in [1, 4]:
+            self.hasher.workers = workers
+            assert self.hasher.digests(self.files) == expected
+        assert self.hasher.get_stats()['hits'] == len(self.files)
+
+    def test_persistence(self):
+        digests = self.hasher.digests(self.files, 'sha256')
+        assert os.path.isfile(self.index_path)
+
+        hasher = FileHasher(self.index_path)
+        with patch.object(FileHasher, '_compute') as compute:
+            assert hasher.digests(self.files, 'sha256') == digests
+            assert not compute.called
+
+        hasher = FileHasher()
+        hasher.initialize(self.tempdir)
+        assert hasher.index_path == os.path.join(self.tempdir,
+                                                 FileHasher.INDEX_FILE_NAME)
+        assert hasher.get_stats()['size'] == 0
+
+        with open(self.index_path, 'w') as f:
+            f.write('not json')
+        assert FileHasher(self.index_path).get_stats()['size'] == 0
+
+    def test_max_entries(self):
+        self.hasher.max_entries = 2
+        for file_path in self.files[:3]:
+            self.hasher.digest(file_path)
+        self.hasher.digest(self.files[1])
+        self.hasher.digest(self.files[3])
+
+        # least recently used digests are dropped
+        with patch.object(FileHasher, '_compute') as compute:
+            self.hasher.digest(self.files[1])
+            self.hasher.digest(self.files[3])
+            assert not compute.called
+        assert self.hasher.get_stats()['size'] == 2
+
+        self.hasher.save()
+        hasher = FileHasher(self.index_path, max_entries=1)
+        assert hasher.get_stats()['size'] == 1
+
+    def test_missing_files_dropped(self):
+        self.hasher.digests(self.files)
+        os.remove(self.files[0])
+
+        hasher = FileHasher(self.index_path)
+        assert hasher.get_stats()['size'] == len(self.files) - 1
+        hasher.save()
+        assert FileHasher(self.index_path).get_stats()['size'] == \
+            len(self.files) - 1
@@ -0,0 +1,94 @@
+import os
+
+from golem.core.journal import Journal
+from golem.testutils import TempDirFixture
+
+
+class TestJournal(TempDirFixture):
+
+    def setUp(self):
+        super(TestJournal, self).setUp()
+        self.path = os.path.join(self.tempdir, 'test.journal')
+
+    def _reload(self, **kwargs):
+        journal = Journal(self.path, **kwargs)
+        return journal, journal.load()
+
+    def test_load_missing(self):
+        journal = Journal(self.path)
+        assert journal.load() == {}
+        journal.delete(u'xyz')
+        journal.flush()
+        assert not os.path.exists(self.path)
+
+    def test_put_and_delete(self):
+        journal = Journal(self.path)
+        journal.put(u'a', [1, 2])
+        journal.put(u'b', {'x': 1})
+        journal.put(u'a', [3])
+        journal.put(u'c', None)
+        journal.delete(u'c')
+        journal.flush(sync=True)
+
+        journal, values = self._reload()
+        assert values == {u'a': [3], u'b': {'x': 1}}
+
+        journal.delete(u'b')
+        journal.put(u'd', u'\u0105')
+        journal.flush()
+        _, values = self._reload()
+        assert values == {u'a': [3], u'd': u'\u0105'}
+
+    def test_torn_record(self):
+        journal = Journal(self.path)
+        journal.put(u'a', 1)
+        journal.put(u'b', 2)
+        journal.flush()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(size - 1)
+
+        journal, values = self._reload()
+        assert values == {u'a': 1}
+        assert os.path.getsize(self.path) == journal.size
+
+        journal.put(u'c', 3)
+        journal.flush()
+        _, values = self._reload()
+        assert values == {u'a': 1, u'c': 3}
+
+    def test_corrupted_record(self):
+        journal = Journal(self.path)
+        journal.put(u'a', 1)
+        journal.put(u'b', 2)
+        journal.flush()
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'X')
+
+        _, values = self._reload()
+        assert values == {u'a': 1}
+
+    def test_compact(self):
+        journal = Journal(self.path, min_compact_size=0)
+        for i in xrange(10):
+            journal.put(u'a', i)
+        journal.put(u'b', 'b' * 100)
+        journal.flush()
+        assert journal.size == journal.live_size
+        assert os.path.getsize(self.path) == journal.size
+
+        journal, values = self._reload()
+        assert values == {u'a': 9, u'b': 'b' * 100}
+
+    def test_compact_ratio(self):
+        journal = Journal(self.path, compact_ratio=3.0, min_compact_size=0)
+        journal.put(u'a', 0)
+        journal.put(u'a', 1)
+        journal.put(u'a', 2)
+        journal.flush()
+        assert journal.size == 3 * journal.live_size
+
+        journal.put(u'a', 3)
+        journal.flush()
+        assert journal.size == journal.live_size
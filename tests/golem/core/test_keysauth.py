@@ -3,7 +3,8 @@ from os import path
 from random import random, randint
 
 from golem.core.crypto import ECCx
-from golem.core.keysauth import KeysAuth, EllipticalKeysAuth, RSAKeysAuth, get_random, get_random_float, sha2, sha3
+from golem.core.keysauth import KeysAuth, EllipticalKeysAuth, RSAKeysAuth, VerifierCache, get_random, get_random_float, sha2, \
+    sha3
 from golem.core.simpleserializer import CBORSerializer
 from golem.network.transport.message import MessageWantToComputeTask
 from golem.tools.testwithappconfig import TestWithKeysAuth
@@ -174,6 +175,37 @@ class TestEllipticalKeysAuth(TestWithKeysAuth):
         self.assertFalse(ek.verify(sig2, data1))
         self.assertFalse(ek.verify(None, data1))
 
+    def test_verifier_cache(self):
+        ek = EllipticalKeysAuth(self.path)
+        ecc = ECCx()
+        data = "qaz123WSX./;'[]"
+        sig = ecc.sign(sha3(data))
+        for _ in xrange(3):
+            self.assertTrue(ek.verify(sig, data, ecc.raw_pubkey.encode('hex')))
+        self.assertTrue(ek.verify(sig, data, ecc.raw_pubkey))
+        self.assertFalse(ek.verify(sig, data))
+        self.assertEqual(ek.verifier_cache.get_stats(), {'size': 2, 'hits': 3, 'misses': 2})
+
+        # Invalid keys are not cached
+        self.assertFalse(ek.verify(sig, data, "\x01" * 64))
+        self.assertFalse(ek.verify(sig, data, "abc"))
+        self.assertEqual(len(ek.verifier_cache), 2)
+
+    def test_verifier_cache_eviction(self):
+        cache = VerifierCache(max_size=2)
+        keys = [ECCx().raw_pubkey for _ in xrange(3)]
+        first = cache.get(keys[0])
+        cache.get(keys[1])
+        self.assertIs(cache.get(keys[0]), first)
+        cache.get(keys[2])
+        self.assertEqual(len(cache), 2)
+        # keys[1] was least recently used
+        self.assertIs(cache.get(keys[0]), first)
+        cache.get(keys[1])
+        self.assertEqual(cache.get_stats(), {'size': 2, 'hits': 2, 'misses': 4})
+        cache.clear()
+        self.assertEqual(cache.get_stats(), {'size': 0, 'hits': 0, 'misses': 0})
+
     def test_save_load_keys(self):
         """ Tests for saving and loading keys """
         from os.path import join
@@ -212,7 +244,7 @@ class TestEllipticalKeysAuth(TestWithKeysAuth):
     def test_fixed_sign_verify_elliptical(self):
         public_key = "cdf2fa12bef915b85d94a9f210f2e432542f249b8225736d923fb07ac7ce38fa29dd060f1ea49c75881b6222d26db1c8b0dd1ad4e934263cc00ed03f9a781444"
         private_key = "1aab847dd0aa9c3993fea3c858775c183a588ac328e5deb9ceeee3b4ac6ef078"
-        expected_result = "c76bd0e19f1b3e2587b9ff9c6230fe0eed7d25de95fdfd4719e13c1be4fadcbe405f700743f9d2ff32843bd249891e929e478e716afd4b5aa081c68e732d369901"
+        expected_result = "519023599f4e5b11a397bbc853aa75241d32498a1bc50110faddc437ebca7b584a0bca880cc76c4d99bc632328b77aa7712d9b255322e94813448a5671f38a8400"
 
         EllipticalKeysAuth.set_keys_dir(self.path)
         ek = EllipticalKeysAuth(self.path)
@@ -169,3 +169,32 @@ class TestCBORSerializer(unittest.TestCase):
         deserialized = CBORSerializer.loads(serialized)
         assert_properties(deserialized, obj)
 
+
+    def test_canonical(self):
+        first = {u'b': 1, u'aa': [2, {u'y': 'x', u'x': 'y'}], u'a': None, 10: 3.5}
+        second = dict()
+        for k in [u'a', 10, u'aa', u'b']:
+            second[k] = first[k]
+        second[u'aa'] = [2, {u'x': 'y', u'y': 'x'}]
+
+        serialized = CBORSerializer.dumps_canonical(first)
+        assert serialized == CBORSerializer.dumps_canonical(second)
+        # Shorter keys first, then sorted bytewise
+        assert serialized.startswith('\xa4\x0a')
+        assert serialized.index('\x61a\xf6') < serialized.index('\x61b\x01') < serialized.index('\x62aa')
+        assert CBORSerializer.loads(serialized) == first
+
+        obj = MockSerializationSubject()
+        deserialized = CBORSerializer.loads(CBORSerializer.dumps_canonical(obj))
+        assert_properties(deserialized, obj)
+
+    def test_loads_items(self):
+        items = [1, u'abc', {u'a': [1, 2]}]
+        serialized = CBORSerializer.dumps_canonical(items)
+        result = CBORSerializer.loads_items(serialized)
+        assert [item for item, _ in result] == items
+        assert [raw for _, raw in result] == [CBORSerializer.dumps_canonical(i) for i in items]
+
+        for payload in ['', CBORSerializer.dumps({u'a': 1}), '\x9f\x01\xff']:
+            with self.assertRaises(ValueError):
+                CBORSerializer.loads_items(payload)
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
+
+from golem.core.timers import SubsystemTimers, TickHistogram
+
+
+class TestTickHistogram(TestCase):
+
+    def test_add(self):
+        histogram = TickHistogram(buckets=(0.01, 0.1))
+        for duration in [0.001, 0.01, 0.05, 2.]:
+            histogram.add(duration)
+
+        stats = histogram.to_dict()
+        assert stats['ticks'] == 4
+        assert stats['max'] == 2.
+        assert stats['buckets'] == [[0.01, 2], [0.1, 1], [None, 1]]
+        assert abs(stats['mean'] - 2.061 / 4) < 1e-9
+
+        assert TickHistogram().to_dict()['mean'] == 0.0
+
+
+class TestSubsystemTimers(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.timers = SubsystemTimers(clock=self.clock)
+
+    def test_intervals(self):
+        fast = Mock(return_value=None)
+        slow = Mock(return_value=None)
+        self.timers.add('fast', 1, fast)
+        self.timers.add('slow', 5, slow)
+
+        self.timers.start()
+        assert self.timers.running
+        self.clock.pump([1] * 10)
+        assert fast.call_count == 10
+        assert slow.call_count == 2
+
+        stats = self.timers.get_stats()
+        assert stats['fast']['ticks'] == 10
+        assert stats['slow']['ticks'] == 2
+        assert stats['slow']['interval'] == 5
+
+        self.timers.stop()
+        assert not self.timers.running
+        self.clock.pump([1] * 10)
+        assert fast.call_count == 10
+
+    @patch('golem.core.timers.logger')
+    def test_errors(self, logger):
+        tick = Mock(side_effect=Exception("error"))
+        self.timers.add('failing', 1, tick)
+        self.timers.start()
+        self.clock.pump([1] * 3)
+
+        # ticks continue after an error
+        assert tick.call_count == 3
+        assert self.timers['failing'].errors == 3
+        assert logger.exception.call_count == 3
+
+    @patch('golem.core.timers.logger')
+    def test_deferred_ticks(self, logger):
+        deferreds = []
+
+        def tick():
+            deferreds.append(Deferred())
+            return deferreds[-1]
+
+        self.timers.add('threaded', 1, tick)
+        self.timers.start()
+        self.clock.pump([1] * 3)
+        # next tick waits for the previous one to finish
+        assert len(deferreds) == 1
+
+        deferreds[0].errback(Exception("error"))
+        assert self.timers['threaded'].errors == 1
+        assert logger.error.called
+        self.clock.pump([1])
+        assert len(deferreds) == 2
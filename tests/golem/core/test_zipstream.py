@@ -0,0 +1,98 @@
+import os
+import zipfile
+from cStringIO import StringIO
+
+from golem.core.zipstream import ZipStreamReader, ZipStreamWriter
+from golem.testutils import TempDirFixture
+
+
+class TestZipStream(TempDirFixture):
+
+    def setUp(self):
+        TempDirFixture.setUp(self)
+        self.files = {
+            'empty': '',
+            'text': 'text ' * 1000,
+            'random.exr': os.urandom(3 * 2 ** 20 + 5),
+        }
+        self.paths = []
+        for name, data in self.files.iteritems():
+            path = os.path.join(self.tempdir, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            self.paths.append(path)
+
+    def _write(self, **kwargs):
+        dst = StringIO()
+        with ZipStreamWriter(dst, **kwargs) as zf:
+            for path in self.paths:
+                zf.write(path, compress_level=0 if path.endswith('.exr')
+                         else None)
+            zf.writestr(u'data', 'cbor data')
+        return dst.getvalue()
+
+    def _check_extracted(self, names, output_dir):
+        assert sorted(names) == sorted(self.files.keys() + [u'data'])
+        for name, data in self.files.iteritems():
+            with open(os.path.join(output_dir, name), 'rb') as f:
+                assert f.read() == data
+
+    def test_round_trip(self):
+        data = self._write()
+        # text is compressed, random data is stored
+        assert len(data) < sum(len(d) for d in self.files.values())
+
+        output_dir = os.path.join(self.tempdir, 'output')
+        names = ZipStreamReader(StringIO(data)).extract_all(output_dir)
+        self._check_extracted(names, output_dir)
+        with open(os.path.join(output_dir, u'data'), 'rb') as f:
+            assert f.read() == 'cbor data'
+
+    def test_zipfile_compatibility(self):
+        # archives written by ZipStreamWriter are read by zipfile
+        with zipfile.ZipFile(StringIO(self._write())) as zf:
+            assert zf.testzip() is None
+            for name, data in self.files.iteritems():
+                assert zf.read(name) == data
+
+        # and archives written by zipfile are streamed by ZipStreamReader
+        for compression in [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]:
+            dst = StringIO()
+            with zipfile.ZipFile(dst, 'w', compression) as zf:
+                for path in self.paths:
+                    zf.write(path, os.path.basename(path))
+                zf.writestr(u'data', 'cbor data')
+
+            output_dir = os.path.join(self.tempdir, str(compression))
+            names = ZipStreamReader(StringIO(dst.getvalue())) \
+                .extract_all(output_dir)
+            self._check_extracted(names, output_dir)
+
+    def test_bad_crc(self):
+        data = bytearray(self._write(compress_level=0))
+        offset = data.index('text text')
+        data[offset] = 'T'
+
+        with self.assertRaises(zipfile.BadZipfile):
+            ZipStreamReader(StringIO(str(data))).extract_all(self.tempdir)
+
+    def test_not_a_zip_file(self):
+        for data in ['', 'not a zip file', os.urandom(100)]:
+            with self.assertRaises(zipfile.BadZipfile):
+                ZipStreamReader(StringIO(data)).extract_all(self.tempdir)
+
+        # an archive without files ends with the central directory records
+        dst = StringIO()
+        ZipStreamWriter(dst).close()
+        reader = ZipStreamReader(StringIO(dst.getvalue()))
+        assert reader.extract_all(self.tempdir) == []
+
+    def test_unsafe_names(self):
+        dst = StringIO()
+        with ZipStreamWriter(dst) as zf:
+            zf.writestr('../../outside', 'data')
+            zf.writestr('/absolute', 'data')
+
+        output_dir = os.path.join(self.tempdir, 'output')
+        ZipStreamReader(StringIO(dst.getvalue())).extract_all(output_dir)
+        assert sorted(os.listdir(output_dir)) == ['absolute', 'outside']
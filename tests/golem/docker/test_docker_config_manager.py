@@ -32,6 +32,21 @@ class TestDockerConfigManager(unittest.TestCase):
         assert cm.container_host_config['cpuset']
         assert cm.container_host_config['mem_limit']
 
+    def test_slot_host_config(self):
+        cm = DockerConfigManager()
+        cm.container_host_config.update(cpuset='0,1,2,3,4', mem_limit=3000)
+
+        assert cm.slot_host_config(0, 1) == cm.container_host_config
+
+        configs = [cm.slot_host_config(slot, 2) for slot in xrange(2)]
+        assert [c['cpuset'] for c in configs] == ['0,1,2', '3,4']
+        assert all(c['mem_limit'] == 1500 for c in configs)
+        assert cm.container_host_config['cpuset'] == '0,1,2,3,4'
+
+        # more slots than cores
+        configs = [cm.slot_host_config(slot, 6) for slot in xrange(6)]
+        assert [c['cpuset'] for c in configs] == ['0', '1', '2', '3', '4', '0']
+
     def test_failing_build_config(self):
 
         cm = DockerConfigManager()
@@ -1,10 +1,13 @@
+import os
 import socket
+import tempfile
 import time
 import unittest
 import uuid
 from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from threading import Thread
 
+from mock import patch
 from requests.exceptions import HTTPError
 
 from golem.http.stream import StreamMonitor, ChunkStream, StreamFileObject
@@ -45,6 +48,34 @@ class MockHttpServer(BaseHTTPRequestHandler):
         return httpd
 
 
+class MockChunkedHttpServer(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    chunks = []
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-type', 'application/octet-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in self.chunks:
+            self.wfile.write('{:x};ext=1\r\n{}\r\n'.format(len(chunk),
+                                                             chunk))
+        self.wfile.write('0\r\n\r\n')
+        self.close_connection = 1
+
+    def log_message(self, *_):
+        pass
+
+    @staticmethod
+    def serve(chunks):
+        MockChunkedHttpServer.chunks = chunks
+        httpd = HTTPServer(('127.0.0.1', 0), MockChunkedHttpServer)
+        thread = Thread(target=httpd.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return httpd
+
+
 class MockIterator:
     def __init__(self, src, chunk):
         self.src = src
@@ -105,6 +136,89 @@ class TestStreamMonitor(unittest.TestCase):
         httpd.server_close()
 
 
+    @patch.object(StreamMonitor, 'stream_timeout', 0.1)
+    def test_expired_streams(self):
+        streams = [MockStream(time.time()) for _ in xrange(5)]
+        timed_out = StreamMonitor.stats()['timed_out']
+
+        for stream in streams:
+            StreamMonitor.monitor(stream)
+
+        deadline = time.time() + 5
+        while time.time() < deadline and not all(s.cancelled
+                                                 for s in streams):
+            time.sleep(0.01)
+
+        assert all(s.cancelled for s in streams)
+        assert StreamMonitor.stats()['timed_out'] == timed_out + 5
+
+    def test_pop_expired(self):
+
+        class Monitor(StreamMonitor):
+            stream_timeout = 10
+            # streams are not closed by the monitor thread
+            _initialized = True
+            _streams = {}
+            _deadlines = []
+
+        now = time.time()
+        active = MockStream(now - 15)
+        expired = MockStream(now - 15)
+        finished = MockStream(now - 5)
+        finished.done = True
+
+        for stream in [active, expired, finished]:
+            Monitor.monitor(stream)
+
+        # the active stream has received data since it was registered
+        active.timestamp = now - 5
+        popped = Monitor._pop_expired(now)
+        assert [data['stream'] for _, data in popped] == [expired]
+        assert Monitor.stats()['active'] == 2
+
+        popped = Monitor._pop_expired(now + 5)
+        assert set(data['stream'] for _, data in popped) == {active, finished}
+        assert not Monitor._deadlines
+
+    def test_unregister(self):
+
+        class Monitor(StreamMonitor):
+            stream_timeout = 10
+            _initialized = True
+            _streams = {}
+            _deadlines = []
+            timed_out = 0
+            finished = 0
+
+        streams = [MockStream(time.time()) for _ in xrange(2)]
+        for stream in streams:
+            Monitor.monitor(stream)
+
+        # finished streams are removed right away, not at their deadline
+        streams[0].done = True
+        Monitor.unregister(streams[0])
+        Monitor.unregister(streams[0])
+        assert Monitor.stats() == dict(active=1, timed_out=0, finished=1)
+        assert Monitor._pop_expired(time.time() + 10) == \
+            [(streams[1].monitor_id, dict(stream=streams[1], socket=None))]
+
+        # streams that are not monitored are ignored
+        Monitor.unregister(MockStream(time.time()))
+        assert Monitor.stats()['finished'] == 1
+
+
+class MockStream(object):
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+        self.monitor_id = None
+        self.done = False
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
 class TestSocketStream(unittest.TestCase):
 
     def testFailedConnection(self):
@@ -173,6 +287,53 @@ class TestSocketStream(unittest.TestCase):
         httpd.server_close()
 
 
+class TestChunkedTransfer(unittest.TestCase):
+
+    chunks = ['a' * 10, os.urandom(100 * 1024), '\r\n' * 10]
+
+    def setUp(self):
+        self.httpd = MockChunkedHttpServer.serve(self.chunks)
+        self.addr = self.httpd.server_address
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _stream(self):
+        # headers and size lines cross buffer boundaries
+        with patch.object(ChunkStream, 'buf_size', 16):
+            stream = ChunkStream(self.addr, '/')
+        stream.connect()
+        return stream
+
+    def test_read(self):
+        stream = self._stream()
+        received = []
+        while True:
+            data = stream.read(1024)
+            if not data:
+                break
+            received.append(data)
+        stream.disconnect()
+
+        assert ''.join(received) == ''.join(self.chunks)
+        assert stream.data_read == len(''.join(self.chunks))
+
+    def test_write_to(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            stream = self._stream()
+            written = stream.write_to(fd)
+            stream.disconnect()
+            os.close(fd)
+
+            assert written == len(''.join(self.chunks))
+            with open(path, 'rb') as f:
+                assert f.read() == ''.join(self.chunks)
+        finally:
+            os.remove(path)
+
+
 class TestStreamFileObject(unittest.TestCase):
 
     def test(self):
@@ -9,7 +9,8 @@ from golem.network.p2p.node import Node
 from golem.network.p2p.p2pservice import P2PService
 from golem.network.p2p.peersession import (PeerSession, logger, P2P_PROTOCOL_ID,
     PeerSessionInfo)
-from golem.network.transport.message import MessageHello, MessageStopGossip
+from golem.network.transport.message import (MessageChannelKey,
+    MessageChannelKeyAck, MessageHello, MessageStopGossip)
 from golem.tools.assertlogs import LogTestCase
 from golem.tools.testwithappconfig import TestWithKeysAuth
 
@@ -69,6 +70,44 @@ class TestPeerSession(TestWithKeysAuth, LogTestCase, testutils.PEP8MixIn):
             self.assertEqual(ps2.decrypt(data), data)
         self.assertTrue(any("not encrypted" in log for log in l.output))
 
+    @mock.patch('golem.network.transport.session.BasicSession.send')
+    def test_channel(self, send_mock):
+        ps = PeerSession(MagicMock())
+        ps2 = PeerSession(MagicMock())
+        ps.p2p_service.encrypt = ps2.p2p_service.encrypt = \
+            lambda data, _: chr(0x04) + data
+        ps.verified = ps2.verified = True
+
+        data = "abcdefghijklm" * 1000
+        assert ps.encrypt(data) == chr(0x04) + data
+
+        ps.start_channel()
+        key_msg = send_mock.call_args[0][1]
+        assert isinstance(key_msg, MessageChannelKey)
+        # Key is not used before the peer confirms it
+        assert ps.encrypt(data) == chr(0x04) + data
+        ps.start_channel()
+        assert send_mock.call_count == 1
+
+        ps2._react_to_channel_key(key_msg)
+        ack_msg = send_mock.call_args[0][1]
+        assert isinstance(ack_msg, MessageChannelKeyAck)
+        ps._react_to_channel_key_ack(ack_msg)
+
+        for _ in xrange(3):
+            enc_data = ps.encrypt(data)
+            assert enc_data != chr(0x04) + data
+            assert ps2.decrypt(enc_data) == data
+        # Other direction still uses ECIES until ps2 starts its own channel
+        assert ps2.encrypt(data) == chr(0x04) + data
+
+        ps2.disconnect = MagicMock()
+        assert ps2.decrypt(enc_data) is None
+        ps2.disconnect.assert_called_once_with(PeerSession.DCRWrongEncryption)
+
+        ps.reset_channel()
+        assert ps.encrypt(data) == chr(0x04) + data
+
     def test_react_to_hello(self):
 
         conn = MagicMock()
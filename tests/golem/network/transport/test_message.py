@@ -92,6 +92,26 @@ class TestMessages(unittest.TestCase, PEP8MixIn):
                                               extra_data=message.MessageWantToComputeTask("ABC", "xyz", 1000, 20, 4, 5, 3))
         assert m.get_short_hash()
 
+    def test_payload(self):
+        m = message.MessageWantToComputeTask("ABC", "xyz", 1000, 20, 4, 5, 3)
+        with mock.patch.object(m, 'dict_repr', wraps=m.dict_repr) as dict_repr:
+            short_hash = m.get_short_hash()
+            m.sig = "signature"
+            serialized = m.serialize()
+            assert dict_repr.call_count == 1
+
+        m2 = message.Message.deserialize_message(serialized)
+        assert m2.sig == "signature"
+        assert m2.dict_repr() == m.dict_repr()
+        assert m2.get_payload() == m.get_payload()
+        assert m2.get_short_hash() == short_hash
+
+        # Payload is encoded again after a change
+        m.task_id = "abc"
+        assert m.get_short_hash() != short_hash
+        assert message.Message.deserialize_message(m.serialize()).task_id \
+            == "abc"
+
     def test_serialization(self):
         m = message.MessageReportComputedTask("xxyyzz", 0, 12034, "ABC", "10.10.10.1", 1023, "KEY_ID", "NODE", "ETH", {})
         assert m.serialize()
@@ -231,6 +251,18 @@ class TestMessages(unittest.TestCase, PEP8MixIn):
             expected = {}
             self.assertEquals(expected, msg.dict_repr())
 
+    def test_message_get_tasks(self):
+        digests = {'task_1': 'abcd', 'task_2': '1234'}
+        msg = message.MessageGetTasks(digests=digests)
+        assert msg.dict_repr() == {'DIGESTS': digests}
+
+        deserialized = message.Message.deserialize_message(msg.serialize())
+        assert deserialized.digests == digests
+
+        # requests of nodes not sending digests
+        msg = message.MessageGetTasks(dict_repr={})
+        assert msg.digests is None
+
     def test_list_messages(self):
         for message_class, key in (
                 (message.MessagePeers, 'PEERS'),
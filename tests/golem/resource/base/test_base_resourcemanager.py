@@ -2,7 +2,7 @@ import os
 import unittest
 import uuid
 
-from mock import patch
+from mock import Mock, patch
 
 from golem.resource.base import resourcesmanager
 from golem.resource.dirmanager import DirManager
@@ -148,6 +148,44 @@ class TestResourceCache(unittest.TestCase):
         self.cache.clear()
         assert self._all_default_empty()
 
+    def test_remove_shared_hash(self):
+        resource = resourcesmanager.FileResource(
+            'name', self.resource_hash, task_id=self.task_id, path='path_1')
+        other = resourcesmanager.FileResource(
+            'name', self.resource_hash, task_id='other', path='path_2')
+        self.cache.add_resource(other)
+        self.cache.add_resource(resource)
+
+        # resources of other tasks are still found by hash
+        self.cache.remove('other')
+        assert self.cache.get_by_hash(self.resource_hash) is resource
+        self.cache.add_resource(other)
+        self.cache.remove(self.task_id)
+        assert self.cache.get_by_hash(self.resource_hash) is other
+        assert self.cache.get_by_path('path_1') is None
+
+    def test_memory_usage(self):
+        empty = self.cache.memory_usage()
+        task_id = u''.join([u'task', self.task_id])
+
+        for i in xrange(100):
+            resource = resourcesmanager.FileResource(
+                'name_{}'.format(i), str(uuid.uuid4()),
+                # equal, but not the same strings
+                task_id=u''.join([u'task', self.task_id]),
+                path='path_{}'.format(i))
+            self.cache.add_resource(resource)
+
+        resources = self.cache.get_resources(task_id)
+        assert len(resources) == 100
+        assert all(r.task_id is resources[0].task_id for r in resources)
+        assert not hasattr(resources[0], '__dict__')
+
+        usage = self.cache.memory_usage()
+        assert usage > empty
+        self.cache.remove(task_id)
+        assert self.cache.memory_usage() < usage
+
     def _add_all(self):
         resource = resourcesmanager.FileResource(
             self.resource_path,
@@ -329,6 +367,64 @@ class TestAbstractResourceManager(_Common.ResourceSetUp):
             )
             assert logger.error.called
 
+    def test_pull_resource(self):
+        manager = self.resource_manager
+        manager.config.max_concurrent_downloads = 1
+        file_name = os.path.basename(self.test_dir_file)
+        entries = [[file_name, 'hash_1'], [file_name, 'hash_1'],
+                   ['other_file', 'hash_2']]
+        success, error = Mock(), Mock()
+
+        with patch.object(manager, '_async_call') as async_call:
+            for entry in entries:
+                manager.pull_resource(entry, self.task_id, success, error)
+
+            # the same resource is downloaded once, other one is queued
+            assert async_call.call_count == 1
+            assert manager.download_scheduler.queued == 1
+            assert async_call.call_args[1]['multihash'] == 'hash_1'
+
+            # the file is downloaded
+            open(os.path.join(self.resources_dir, file_name), 'w').close()
+            _, on_success, _ = async_call.call_args[0]
+            on_success(dict(Name=file_name, Hash='hash_1'))
+            assert success.call_count == 2
+            assert async_call.call_count == 2
+            assert async_call.call_args[1]['multihash'] == 'hash_2'
+
+            _, _, on_error = async_call.call_args[0]
+            on_error(Exception('Unknown error'))
+            assert error.call_count == 1
+            assert error.call_args[0][1:] == (entries[2], self.task_id)
+            assert manager.download_scheduler.running == 0
+
+    def test_pulled_resources_pinned_until_released(self):
+        manager = self.resource_manager
+        store = manager.storage.store
+        file_name = 'pulled_file'
+        file_path = os.path.join(self.resources_dir, file_name)
+
+        with patch.object(manager, '_async_call') as async_call:
+            manager.pull_resource([file_name, 'hash_1'], self.task_id,
+                                  Mock(), Mock())
+            with open(file_path, 'w') as f:
+                f.write('pulled content')
+            _, on_success, _ = async_call.call_args[0]
+            on_success(dict(Name=file_name, Hash='hash_1'))
+
+        # the task is being computed, its files are not evicted
+        other_task_file = os.path.join(self.path, 'other_file')
+        with open(other_task_file, 'w') as f:
+            f.write('other content')
+        store.max_size = 1
+        store.add(other_task_file, 'other_task')
+        assert os.path.exists(file_path)
+
+        manager.set_download_priority(self.task_id, 10)
+        manager.release_task(self.task_id)
+        assert not os.path.exists(file_path)
+        assert self.task_id not in manager.download_scheduler.task_priorities
+
     def test_to_from_wire(self):
         entries = []
         for resource in self.joined_resources:
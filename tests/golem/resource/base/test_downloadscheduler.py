@@ -0,0 +1,108 @@
+import unittest
+
+from mock import patch
+
+from golem.resource.base.downloadscheduler import DownloadScheduler
+
+
+class TestDownloadScheduler(unittest.TestCase):
+
+    def test_shared_download(self):
+        scheduler = DownloadScheduler(limit=2)
+        assert scheduler.add('r1', 'task', 'params', 'waiter_1')
+        assert not scheduler.add('r1', 'task', 'other', 'waiter_2')
+        assert scheduler.queued == 1
+
+        download = scheduler.next()
+        assert download.params == 'params'
+        assert scheduler.next() is None
+        assert not scheduler.add('r1', 'task', 'params', 'waiter_3')
+
+        assert scheduler.finish('r1') == ['waiter_1', 'waiter_2', 'waiter_3']
+        assert scheduler.running == 0
+        assert scheduler.finish('r1') == []
+
+        # finished resource is downloaded again when requested
+        assert scheduler.add('r1', 'task', 'params', 'waiter_4')
+        scheduler.next()
+        assert scheduler.fail('r1') == ['waiter_4']
+
+    def test_limit(self):
+        scheduler = DownloadScheduler(limit=2)
+        for i in xrange(3):
+            scheduler.add(i, 'task', None, None)
+
+        assert scheduler.next().key == 0
+        assert scheduler.next().key == 1
+        assert scheduler.next() is None
+        assert scheduler.running == 2
+        assert scheduler.queued == 1
+
+        scheduler.fail(0)
+        assert scheduler.next().key == 2
+
+        scheduler = DownloadScheduler(limit=0)
+        for i in xrange(10):
+            scheduler.add(i, 'task', None, None)
+        assert all(scheduler.next() for _ in xrange(10))
+
+    def test_priority(self):
+        scheduler = DownloadScheduler(limit=1)
+        scheduler.set_task_priority('high', 2)
+        scheduler.add('low_1', 'low', None, None)
+        scheduler.add('low_2', 'low', None, None)
+        scheduler.add('high_1', 'high', None, None)
+        scheduler.add('mid_1', 'mid', None, None)
+
+        # priority of queued downloads is changed too
+        scheduler.set_task_priority('mid', 1)
+
+        keys = []
+        for _ in xrange(4):
+            download = scheduler.next()
+            keys.append(download.key)
+            scheduler.finish(download.key)
+        assert keys == ['high_1', 'mid_1', 'low_1', 'low_2']
+        assert scheduler.next() is None
+
+    @patch('golem.resource.base.downloadscheduler.time')
+    def test_adapt(self, time_mock):
+        time_mock.time.return_value = 0.
+        scheduler = DownloadScheduler(limit=2, max_limit=3)
+        assert scheduler.max_limit == 3
+
+        def download_window(size, now):
+            for i in xrange(5):
+                scheduler.add((now, i), 'task', None, None)
+            while scheduler.next():
+                pass
+            time_mock.time.return_value = now
+            scheduler.finish(scheduler._running.pop(), size)
+
+        # saturated, limit grows
+        download_window(1000, 10.)
+        assert scheduler.limit == 3
+        # throughput grew, but the limit is already at max
+        download_window(5000, 20.)
+        assert scheduler.limit == 3
+        # throughput dropped, direction is reversed
+        download_window(100, 30.)
+        assert scheduler.limit == 2
+        # no significant change
+        download_window(100, 40.)
+        assert scheduler.limit == 2
+
+        # measurement window is not over yet
+        download_window(5000, 41.)
+        assert scheduler.limit == 2
+
+    @patch('golem.resource.base.downloadscheduler.time')
+    def test_adapt_not_saturated(self, time_mock):
+        time_mock.time.return_value = 0.
+        scheduler = DownloadScheduler(limit=2)
+        scheduler.add('r1', 'task', None, None)
+        scheduler.next()
+
+        time_mock.time.return_value = 10.
+        scheduler.finish('r1', 1000)
+        assert scheduler.limit == 2
@@ -0,0 +1,133 @@
+import os
+
+from golem.resource.base.resourcestore import ResourceStore
+from golem.testutils import TempDirFixture
+
+
+class TestResourceStore(TempDirFixture):
+
+    def setUp(self):
+        TempDirFixture.setUp(self)
+        self.store_dir = os.path.join(self.tempdir, 'store')
+        self.store = ResourceStore(self.store_dir)
+
+    def _file(self, *path, **kwargs):
+        file_path = os.path.join(self.tempdir, *path)
+        if not os.path.isdir(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        with open(file_path, 'w') as f:
+            f.write(kwargs.get('content', 'content'))
+        return file_path
+
+    @staticmethod
+    def _same_file(path, other_path):
+        return os.stat(path).st_ino == os.stat(other_path).st_ino
+
+    def test_add(self):
+        first = self._file('task_1', 'texture.png')
+        second = self._file('task_2', 'texture.png')
+        other = self._file('task_2', 'scene.blend', content='scene')
+
+        self.store.add(first, 'task_1')
+        assert self.store.stats()['files'] == 1
+        self.store.add(os.path.join(self.tempdir, 'task_2'), 'task_2')
+
+        # the same content is stored once
+        stats = self.store.stats()
+        assert stats['files'] == 2
+        assert stats['size'] == len('content') + len('scene')
+        assert stats['saved'] == len('content')
+        assert stats['misses'] == 2
+        assert self._same_file(first, second)
+        assert not self._same_file(first, other)
+
+    def test_copy(self):
+        src = self._file('task_1', 'dir', 'texture.png')
+        self.store.add(src, 'task_1')
+
+        dst = os.path.join(self.tempdir, 'task_2', 'texture.png')
+        self.store.copy(src, dst, 'task_2')
+        assert self._same_file(src, dst)
+
+        src_dir = os.path.join(self.tempdir, 'task_1')
+        dst_dir = os.path.join(self.tempdir, 'task_3')
+        self.store.copy(src_dir, dst_dir, 'task_3')
+        assert self._same_file(src, os.path.join(dst_dir, 'dir',
+                                                 'texture.png'))
+
+        stats = self.store.stats()
+        assert stats['files'] == 1
+        assert stats['hits'] == 2
+        assert stats['hit_rate'] == 2. / 3
+
+    def test_copy_original(self):
+        store = ResourceStore(self.store_dir,
+                              tasks_dir=os.path.join(self.tempdir, 'tasks'))
+        original = self._file('project', 'scene.blend', content='scene')
+        dst = os.path.join(self.tempdir, 'tasks', 'task_1', 'scene.blend')
+        store.copy(original, dst, 'task_1')
+        assert not self._same_file(original, dst)
+
+        # changes of the original don't affect the stored file
+        with open(original, 'r+') as f:
+            f.write('SCENE')
+        with open(dst) as f:
+            assert f.read() == 'scene'
+
+        # files of tasks are linked
+        other = os.path.join(self.tempdir, 'tasks', 'task_2', 'scene.blend')
+        store.copy(dst, other, 'task_2')
+        assert self._same_file(dst, other)
+
+    def test_release(self):
+        path = self._file('task_1', 'texture.png')
+        self.store.add(path, 'task_1')
+        self.store.release(path)
+
+        assert not os.path.exists(path)
+        assert len(os.listdir(self.store_dir)) == 1
+
+        # links are recognized after a restart
+        self.store.copy(os.path.join(self.store_dir,
+                                     os.listdir(self.store_dir)[0]),
+                        path, 'task_1')
+        store = ResourceStore(self.store_dir)
+        store.release(path)
+        assert not os.path.exists(path)
+
+    def test_evict(self):
+        self.store.max_size = 11
+        first = self._file('task_1', 'a', content='first')
+        second = self._file('task_2', 'b', content='second')
+        third = self._file('task_3', 'c', content='third')
+        fourth = self._file('task_4', 'd', content='4th')
+
+        self.store.add(first, 'task_1')
+        self.store.add(second, 'task_2')
+        assert self.store.size == 11
+        assert self.store.evictions == 0
+
+        # least recently used file is removed with its links
+        copied = os.path.join(self.tempdir, 'task_5', 'a')
+        self.store.copy(first, copied, 'task_5')
+        self.store.add(third, 'task_3')
+        assert self.store.size == 10
+        assert self.store.evictions == 1
+        assert not os.path.exists(second)
+        assert os.path.exists(first)
+
+        # files of pinned tasks are kept
+        self.store.pin('task_5')
+        self.store.add(fourth, 'task_4')
+        assert self.store.size == 8
+        assert os.path.exists(copied)
+        assert os.path.exists(first)
+        assert not os.path.exists(third)
+
+    def test_load(self):
+        self.store.add(self._file('task_1', 'a', content='first'), 'task_1')
+        self.store.add(self._file('task_2', 'b', content='second'), 'task_2')
+
+        store = ResourceStore(self.store_dir)
+        assert store.size == 11
+        assert store.stats()['files'] == 2
@@ -0,0 +1,60 @@
+import os
+
+from mock import Mock, patch
+
+from golem.resource.http.filerequest import DownloadFileRequest
+from golem.testutils import TempDirFixture
+
+
+def response(status_code, content):
+    r = Mock(status_code=status_code)
+    r.iter_content.return_value = [content]
+    return r
+
+
+@patch('golem.resource.http.filerequest.requests')
+class TestDownloadFileRequest(TempDirFixture):
+
+    def setUp(self):
+        TempDirFixture.setUp(self)
+        self.file_path = os.path.join(self.tempdir, 'file')
+        self.request = DownloadFileRequest('hash', self.file_path)
+
+    def _read(self):
+        with open(self.file_path) as f:
+            return f.read()
+
+    def test_download(self, requests):
+        requests.get.return_value = response(200, 'content')
+        assert self.request.run('url') == self.file_path
+        assert self._read() == 'content'
+        assert not os.path.exists(self.request.part_path)
+        assert 'Range' not in requests.get.call_args[1]['headers']
+
+    def test_resume(self, requests):
+        with open(self.request.part_path, 'w') as f:
+            f.write('con')
+
+        requests.get.return_value = response(206, 'tent')
+        self.request.run('url', headers={'Auth': 'x'})
+        assert self._read() == 'content'
+        assert requests.get.call_args[1]['headers'] == {'Auth': 'x',
+                                                        'Range': 'bytes=3-'}
+
+    def test_resume_not_supported(self, requests):
+        with open(self.request.part_path, 'w') as f:
+            f.write('con')
+
+        requests.get.return_value = response(200, 'content')
+        self.request.run('url')
+        assert self._read() == 'content'
+
+    def test_resume_invalid_range(self, requests):
+        with open(self.request.part_path, 'w') as f:
+            f.write('content and more')
+
+        requests.get.side_effect = [response(416, ''),
+                                    response(200, 'content')]
+        self.request.run('url')
+        assert self._read() == 'content'
+        assert 'Range' not in requests.get.call_args[1]['headers']
@@ -98,7 +98,10 @@ class ResourceSessionTestCase(unittest.TestCase, testutils.PEP8MixIn):
         msg.encrypted = True
         self.instance.interpret(msg)
         self.assertTrue(self.instance.verified)
-        super_send_mock.assert_called_once_with(self.instance, queued_msg, send_unverified=False)
+        self.assertEquals(super_send_mock.call_count, 2)
+        channel_msg = super_send_mock.call_args_list[0][0][1]
+        self.assertIsInstance(channel_msg, message.MessageChannelKey)
+        super_send_mock.assert_called_with(self.instance, queued_msg, send_unverified=False)
         super_send_mock.reset_mock()
 
         msg = object()
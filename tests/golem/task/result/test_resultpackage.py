@@ -1,8 +1,11 @@
 import os
 import shutil
 import uuid
+import zipfile
 
-from golem.core.fileencrypt import FileEncryptor
+from mock import patch
+
+from golem.core.fileencrypt import AESFileEncryptor, FileEncryptor
 from golem.resource.dirmanager import DirManager
 from golem.task.result.resultpackage import ZipPackager, EncryptingPackager, EncryptingTaskResultPackager, \
     ExtractedPackage
@@ -124,6 +127,51 @@ class TestEncryptingPackager(TestDirFixture):
         self.assertTrue(len(files) == len(self.file_list))
         shutil.rmtree(self.out_dir)
 
+    def testExtractWrongSecret(self):
+        EncryptingPackager(self.secret).create(self.out_path, self.files,
+                                               self.pickle_files)
+        ep = EncryptingPackager(FileEncryptor.gen_secret(10, 20))
+        with self.assertRaises(zipfile.BadZipfile):
+            ep.extract(self.out_path)
+
+    def testExtractEmptyFile(self):
+        open(self.out_path, 'w').close()
+        ep = EncryptingPackager(self.secret)
+        with self.assertRaises(zipfile.BadZipfile):
+            ep.extract(self.out_path)
+
+    def testExtractZipFile(self):
+        # packages created with zipfile and encrypted afterwards
+        zip_path = self.out_path + '.zip'
+        ZipPackager().create(zip_path, self.files, self.pickle_files)
+        AESFileEncryptor.encrypt(zip_path, self.out_path, self.secret)
+
+        ep = EncryptingPackager(self.secret)
+        files, out_dir = ep.extract(self.out_path)
+
+        self.assertEqual(sorted(files), sorted(self.file_list))
+        with open(os.path.join(out_dir, 'out_file')) as f:
+            self.assertEqual(f.read(), "File contents")
+
+    def testCompressLevel(self):
+        with open(self.files[0], 'w') as f:
+            f.write("File contents" * 1000)
+        os.rename(self.files[1], self.files[1] + '.exr')
+        files = [self.files[0], self.files[1] + '.exr']
+
+        sizes = []
+        for level in [0, 9]:
+            ep = EncryptingPackager(self.secret, compress_level=level)
+            ep.create(self.out_path, files)
+            sizes.append(os.path.getsize(self.out_path))
+
+            with patch('golem.core.zipstream.ZipStreamWriter.write') as write:
+                ep.create(self.out_path, files)
+            # images are stored without compression
+            self.assertEqual(write.call_args_list[1][1]['compress_level'], 0)
+
+        self.assertGreater(sizes[0], sizes[1])
+
 
 class TestEncryptingTaskResultPackager(TestDirFixture):
 
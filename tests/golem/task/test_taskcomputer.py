@@ -80,11 +80,21 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         tc.task_resource_failure(task_id, 'reason')
         assert not task_server.send_task_failed.called
 
-        tc.task_to_subtask_mapping[task_id] = subtask_id
-        tc.assigned_subtasks[subtask_id] = mock.Mock()
+        tc.task_to_subtask_mapping[task_id] = [subtask_id]
+        tc.assigned_subtasks[subtask_id] = mock.Mock(task_id=task_id)
 
         tc.task_resource_failure(task_id, 'reason')
         assert task_server.send_task_failed.called
+        assert not tc.assigned_subtasks
+        task_server.release_resources.assert_called_once_with(task_id)
+
+        # resources are requested and rejected for a task
+        tc.task_to_subtask_mapping[task_id] = [subtask_id]
+        tc.assigned_subtasks[subtask_id] = mock.Mock(task_id=task_id)
+        tc.resource_request_rejected(task_id, 'reason')
+        assert not tc.assigned_subtasks
+        assert not tc.task_to_subtask_mapping
+        assert task_server.release_resources.call_count == 2
 
         tc.resource_request_rejected(subtask_id, 'reason')
 
@@ -109,7 +119,7 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         tc.task_given(ctd)
         self.assertEqual(tc.assigned_subtasks["xxyyzz"], ctd)
         self.assertLessEqual(tc.assigned_subtasks["xxyyzz"].deadline, timeout_to_deadline(10))
-        self.assertEqual(tc.task_to_subtask_mapping["xyz"], "xxyyzz")
+        self.assertEqual(tc.task_to_subtask_mapping["xyz"], ["xxyyzz"])
         tc.task_server.request_resource.assert_called_with("xyz",  tc.resource_manager.get_resource_header("xyz"),
                                                            "10.10.10.10", 10203, "key", "owner")
         assert tc.task_resource_collected("xyz")
@@ -150,7 +160,7 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         tc.task_given(ctd)
         self.assertEqual(tc.assigned_subtasks["aabbcc"], ctd)
         self.assertLessEqual(tc.assigned_subtasks["aabbcc"].deadline, timeout_to_deadline(5))
-        self.assertEqual(tc.task_to_subtask_mapping["xyz"], "aabbcc")
+        self.assertEqual(tc.task_to_subtask_mapping["xyz"], ["aabbcc"])
         tc.task_server.request_resource.assert_called_with("xyz",  tc.resource_manager.get_resource_header("xyz"),
                                                            "10.10.10.10", 10203, "key", "owner")
         self.assertTrue(tc.task_resource_collected("xyz"))
@@ -186,6 +196,215 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         if tt.is_alive():
             tt.join(timeout=5)
 
+    @mock.patch('golem.task.taskcomputer.PyTaskThread.start')
+    def test_concurrent_computations(self, _):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        task_server.config_desc.max_concurrent_subtasks = 2
+        task_server.config_desc.accept_tasks = True
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+        tc.support_direct_computation = True
+
+        def give(subtask_id):
+            ctd = ComputeTaskDef()
+            ctd.task_id = "task_" + subtask_id
+            ctd.subtask_id = subtask_id
+            ctd.src_code = "output={'data': 1, 'result_type': 0}"
+            ctd.extra_data = {}
+            ctd.deadline = timeout_to_deadline(10)
+            tc.task_given(ctd)
+            assert tc.task_resource_collected(ctd.task_id)
+
+        give("first")
+        assert tc.can_take_subtask()
+        assert tc.counting_task == "task_first"
+
+        # a new task is requested while the first one is computed
+        tc.last_task_request = 0
+        tc.run()
+        assert task_server.request_task.called
+
+        give("second")
+        assert len(tc.current_computations) == 2
+        assert sorted(tc.computation_slots.values()) == [0, 1]
+        assert not tc.can_take_subtask()
+
+        task_server.request_task.reset_mock()
+        tc.last_task_request = 0
+        tc.run()
+        assert not task_server.request_task.called
+
+        # a subtask assigned above the limit waits for a free slot
+        give("third")
+        assert len(tc.current_computations) == 2
+        assert len(tc.ready_subtasks) == 1
+
+        first = tc.current_computations[0]
+        first.result = {'data': 1, 'result_type': 0}
+        tc.task_computed(first)
+        assert tc.computation_slots["third"] == 0
+        assert len(tc.current_computations) == 2
+
+        for task_thread in list(tc.current_computations):
+            task_thread.result = {'data': 1, 'result_type': 0}
+            tc.task_computed(task_thread)
+        assert not tc.counting_task
+        assert tc.free_slots == [0, 1]
+        assert task_server.send_results.call_count == 3
+
+    @mock.patch('golem.task.taskcomputer.PyTaskThread.start')
+    def test_prefetch(self, _):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        task_server.config_desc.prefetch_subtasks = 1
+        task_server.config_desc.accept_tasks = True
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+        tc.support_direct_computation = True
+
+        def give(subtask_id, timeout):
+            ctd = ComputeTaskDef()
+            ctd.task_id = "task_" + subtask_id
+            ctd.subtask_id = subtask_id
+            ctd.src_code = "output={'data': 1, 'result_type': 0}"
+            ctd.extra_data = {}
+            ctd.deadline = timeout_to_deadline(timeout)
+            tc.task_given(ctd)
+            assert tc.task_resource_collected(ctd.task_id)
+
+        give("first", 10)
+        tc.last_task_request = 0
+        tc.run()
+        assert task_server.request_task.called
+
+        # the next subtask is downloaded, but waits for the computation
+        give("second", 100)
+        assert len(tc.current_computations) == 1
+        assert list(tc.ready_subtasks) == ["second"]
+        assert not tc.can_take_subtask()
+
+        # resources of the subtask with a closer deadline are preferred
+        priorities = dict(c[0] for c in
+                          task_server.set_resources_priority.call_args_list)
+        assert priorities["task_first"] > priorities["task_second"]
+
+        first = tc.current_computations[0]
+        first.result = {'data': 1, 'result_type': 0}
+        with mock.patch('golem.core.common.get_timestamp_utc',
+                        return_value=time.time() + 50):
+            tc.task_computed(first)
+        assert task_server.send_results.call_args[0][0] == "first"
+        task_server.release_resources.assert_called_once_with("task_first")
+
+        second = tc.current_computations[0]
+        assert second.subtask_id == "second"
+        assert not tc.ready_subtasks
+        # timeout is counted from the start of the computation
+        assert 40 < second.task_timeout <= 50
+
+    def test_lost_resource_reply(self):
+        task_server = mock.MagicMock()
+        task_server.config_desc = config_desc()
+        task_server.config_desc.accept_tasks = True
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.request_resource.side_effect = lambda task_id, *_: task_id
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+
+        ctd = ComputeTaskDef()
+        ctd.task_id = "xyz"
+        ctd.subtask_id = "xxyyzz"
+        ctd.deadline = timeout_to_deadline(100)
+        tc.task_given(ctd)
+        assert not tc.can_take_subtask()
+
+        # the resource request is not answered, the session is closed
+        tc.session_closed()
+        assert tc.can_take_subtask()
+        tc.last_task_request = 0
+        tc.run()
+        assert task_server.request_task.called
+
+        # a subtask is dropped when its resource request is not answered
+        # before the waiting time passes
+        other = ComputeTaskDef()
+        other.task_id = "abc"
+        other.subtask_id = "aabbcc"
+        other.deadline = timeout_to_deadline(100)
+        tc.task_given(other)
+        tc.waiting_ttl = -1
+        tc.run()
+        assert "aabbcc" not in tc.assigned_subtasks
+        task_server.release_resources.assert_called_once_with("abc")
+
+        # and when its deadline passes
+        ctd.deadline = timeout_to_deadline(-1)
+        tc.run()
+        assert not tc.assigned_subtasks
+        task_server.release_resources.assert_called_with("xyz")
+
+    @mock.patch('golem.task.taskcomputer.PyTaskThread.start')
+    def test_subtasks_of_the_same_task(self, _):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        task_server.config_desc.prefetch_subtasks = 1
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+        tc.support_direct_computation = True
+
+        for subtask_id in ("first", "second"):
+            ctd = ComputeTaskDef()
+            ctd.task_id = "xyz"
+            ctd.subtask_id = subtask_id
+            ctd.src_code = "output={'data': 1, 'result_type': 0}"
+            ctd.extra_data = {}
+            ctd.deadline = timeout_to_deadline(100)
+            tc.task_given(ctd)
+        tc.wait_for_resources("xyz", "delta")
+
+        # both subtasks are computed with the resources of the task
+        assert tc.task_resource_collected("xyz")
+        task_server.unpack_delta.assert_called_once_with(
+            tc.dir_manager.get_task_resource_dir("xyz"), "delta", "xyz")
+        assert [t.subtask_id for t in tc.current_computations] == ["first"]
+        assert list(tc.ready_subtasks) == ["second"]
+
+        # a repeated callback does not queue the subtasks again
+        assert not tc.task_resource_collected("xyz")
+        assert not tc.resource_given("xyz")
+        assert list(tc.ready_subtasks) == ["second"]
+
+        first = tc.current_computations[0]
+        first.result = {'data': 1, 'result_type': 0}
+        tc.task_computed(first)
+        assert not task_server.release_resources.called
+        assert [t.subtask_id for t in tc.current_computations] == ["second"]
+
+    def test_release_resources(self):
+        task_server = mock.MagicMock()
+        task_server.config_desc = config_desc()
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+
+        for subtask_id in ("xxyyzz", "xxyyzz2"):
+            ctd = ComputeTaskDef()
+            ctd.task_id = "xyz"
+            ctd.subtask_id = subtask_id
+            tc.assigned_subtasks[subtask_id] = ctd
+
+        task_thread = mock.MagicMock()
+        task_thread.error = True
+        task_thread.end_time = time.time()
+        task_thread.start_time = task_thread.end_time
+
+        # another subtask of the task is going to be computed
+        task_thread.subtask_id = "xxyyzz"
+        tc.task_computed(task_thread)
+        assert not task_server.release_resources.called
+
+        task_thread.subtask_id = "xxyyzz2"
+        tc.task_computed(task_thread)
+        task_server.release_resources.assert_called_once_with("xyz")
+
     def test_change_config(self):
         task_server = mock.MagicMock()
         task_server.config_desc = config_desc()
@@ -1,5 +1,6 @@
 from datetime import datetime
 from pathlib import Path
+import pickle
 import random
 import time
 from unittest import TestCase
@@ -13,7 +14,8 @@ from golem.environments.environment import Environment
 from golem.environments.environmentsmanager import EnvironmentsManager
 from golem.network.p2p.node import Node
 from golem.task.taskbase import TaskHeader, ComputeTaskDef
-from golem.task.taskkeeper import CompTaskInfo
+from golem.task.taskkeeper import CompTaskInfo, IndexedSet, \
+    SCORE_HEAP_SLACK, compute_header_digest
 from golem.task.taskkeeper import TaskHeaderKeeper, CompTaskKeeper, CompSubtaskInfo, logger
 from golem.testutils import PEP8MixIn
 from golem.testutils import TempDirFixture
@@ -187,8 +189,8 @@ class TestTaskHeaderKeeper(LogTestCase):
         assert tk.add_task_header(task_header)
         assert task_id not in tk.supported_tasks
 
-        tk.task_headers = {}
-        tk.supported_tasks = []
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
+        tk.environments_manager.add_environment(e)
 
         task_header["max_price"] = 1
         assert tk.add_task_header(task_header)
@@ -198,6 +200,22 @@ class TestTaskHeaderKeeper(LogTestCase):
         task_header['deadline'] = "WRONG DEADLINE"
         assert not tk.add_task_header(task_header)
 
+    def test_header_digests(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
+        task_header = get_dict_task_header()
+        task_header["signature"] = "signature"
+        assert tk.add_task_header(task_header)
+        digest = tk.digests["xyz"]
+        assert digest == compute_header_digest("signature")
+
+        task_header["signature"] = "new signature"
+        assert tk.add_task_header(task_header)
+        assert tk.digests["xyz"] != digest
+
+        tk.remove_task_header("xyz")
+        assert "xyz" not in tk.digests
+        assert compute_header_digest(None) is None
+
     def test_is_correct(self):
         tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
         th = get_dict_task_header()
@@ -231,6 +249,183 @@ class TestTaskHeaderKeeper(LogTestCase):
         assert not correct
         assert err == "Subtask timeout is less than 0"
 
+    def test_change_config_checks_affected_headers(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10.0)
+        e = Environment()
+        e.accept_tasks = True
+        tk.environments_manager.add_environment(e)
+        task_header = get_dict_task_header()
+        for i, price in enumerate([5.0, 9.0, 12.0, 20.0]):
+            task_header["task_id"] = "task{}".format(i)
+            task_header["max_price"] = price
+            assert tk.add_task_header(task_header)
+        assert set(tk.supported_tasks) == {"task2", "task3"}
+
+        config_desc = Mock()
+        config_desc.min_price = 8.0
+        with patch.object(tk, 'is_supported',
+                          wraps=tk.is_supported) as is_supported:
+            tk.change_config(config_desc)
+        assert is_supported.call_count == 1
+        assert set(tk.supported_tasks) == {"task1", "task2", "task3"}
+
+        config_desc.min_price = 15.0
+        tk.change_config(config_desc)
+        assert set(tk.supported_tasks) == {"task3"}
+
+        tk.remove_task_header("task3")
+        assert tk._prices == [5.0, 9.0, 12.0]
+
+    def test_update_environment(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10.0)
+        e = Environment()
+        e.accept_tasks = True
+        tk.environments_manager.add_environment(e)
+        task_header = get_dict_task_header()
+        assert tk.add_task_header(task_header)
+        assert "xyz" in tk.supported_tasks
+
+        e.accept_tasks = False
+        tk.update_environment(e.get_id())
+        assert "xyz" not in tk.supported_tasks
+        e.accept_tasks = True
+        tk.update_environment(e.get_id())
+        assert "xyz" in tk.supported_tasks
+        tk.update_environment("unknown environment")
+
+    def test_old_tasks_updated_deadline(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10,
+                              remove_task_timeout=0.5)
+        e = Environment()
+        e.accept_tasks = True
+        tk.environments_manager.add_environment(e)
+        task_header = get_dict_task_header()
+        task_header["deadline"] = timeout_to_deadline(1)
+        assert tk.add_task_header(task_header)
+        task_header["deadline"] = timeout_to_deadline(10)
+        assert tk.add_task_header(task_header)
+
+        time.sleep(1.1)
+        tk.remove_old_tasks()
+        assert "xyz" in tk.task_headers
+        assert "xyz" in tk.supported_tasks
+
+        tk.remove_task_header("xyz")
+        assert "xyz" in tk.removed_tasks
+        tk.remove_old_tasks()
+        assert "xyz" in tk.removed_tasks
+        time.sleep(0.6)
+        tk.remove_old_tasks()
+        assert "xyz" not in tk.removed_tasks
+
+    def test_get_task_by_score(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
+        e = Environment()
+        e.accept_tasks = True
+        tk.environments_manager.add_environment(e)
+        task_header = get_dict_task_header()
+        sizes = {"small": 1024, "big": 1024 ** 3, "other": 1024 ** 2}
+        for task_id in ["small", "big"]:
+            task_header["task_id"] = task_id
+            task_header["resource_size"] = sizes[task_id]
+            assert tk.add_task_header(task_header)
+        task_header["task_id"] = "other"
+        task_header["task_owner_key_id"] = "other owner"
+        task_header["resource_size"] = sizes["other"]
+        assert tk.add_task_header(task_header)
+        assert tk.get_task().task_id == "small"
+
+        # Requestor of rejected task is less likely to accept other requests
+        tk.request_failure("small")
+        assert tk.get_task().task_id == "other"
+        assert tk._owner_rejections == {"kkkk": 1}
+        tk.request_failure("other")
+        assert tk.get_task().task_id == "big"
+        tk.remove_task_header("big")
+        assert tk.get_task() is None
+        assert tk._owner_rejections == {}
+        assert tk._rejections == {"small": 1, "other": 1}
+
+        # Unchanged header is not scored again
+        with patch.object(tk.task_scorer, 'score',
+                          wraps=tk.task_scorer.score) as score:
+            task_header["task_id"] = "new"
+            assert tk.add_task_header(task_header)
+            assert tk.add_task_header(task_header)
+            assert score.call_count == 1
+            task_header["resource_size"] = 1
+            assert tk.add_task_header(task_header)
+            assert score.call_count == 2
+        assert tk.get_task().task_id == "new"
+
+        tk.task_scorer = Mock()
+        tk.task_scorer.score.return_value = 0.0
+        tk.update_environment(e.get_id())
+        assert tk.get_task().task_id == "new"
+
+    def test_rescore_tasks(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10, rescore_interval=60)
+        e = Environment()
+        e.accept_tasks = True
+        tk.environments_manager.add_environment(e)
+        scores = {"first": 2.0, "second": 1.0}
+        tk.task_scorer = Mock()
+        tk.task_scorer.score.side_effect = lambda h, *_: scores[h.task_id]
+        task_header = get_dict_task_header()
+        for task_id in ["first", "second"]:
+            task_header["task_id"] = task_id
+            assert tk.add_task_header(task_header)
+        assert tk.get_task().task_id == "first"
+
+        # Deadline of the first task is getting close
+        scores["first"] = 0.5
+        tk.remove_old_tasks()
+        assert tk.get_task().task_id == "first"
+        with patch("golem.task.taskkeeper.time.time",
+                   return_value=time.time() + 60):
+            tk.remove_old_tasks()
+        assert tk.get_task().task_id == "second"
+        assert len(tk._score_heap) == 2
+
+    def test_score_heap_compaction(self):
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
+        e = Environment()
+        e.accept_tasks = True
+        tk.environments_manager.add_environment(e)
+        task_header = get_dict_task_header()
+        for task_id in ["first", "second"]:
+            task_header["task_id"] = task_id
+            assert tk.add_task_header(task_header)
+        # Every rejection scores other tasks of the requestor again
+        for i in range(100):
+            task_header["task_id"] = "rejected{}".format(i)
+            assert tk.add_task_header(task_header)
+            tk.request_failure(task_header["task_id"])
+        assert len(tk._score_heap) <= SCORE_HEAP_SLACK * 3
+        assert tk.get_task() is not None
+
+
+class TestIndexedSet(TestCase):
+    def test_indexed_set(self):
+        items = IndexedSet(["a", "b", "c", "a"])
+        assert len(items) == 3
+        assert "a" in items
+        assert sorted(items) == ["a", "b", "c"]
+
+        items.discard("a")
+        items.discard("x")
+        assert "a" not in items
+        assert sorted(items) == ["b", "c"]
+        assert {items[0], items[1]} == {"b", "c"}
+
+        items.discard("c")
+        items.discard("b")
+        assert len(items) == 0
+        items.add("d")
+        assert items[0] == "d"
+        items.clear()
+        assert len(items) == 0
+
 
 def get_dict_task_header():
     return {
@@ -289,6 +484,34 @@ class TestCompTaskKeeper(LogTestCase, PEP8MixIn, TempDirFixture):
         for header in test_headers:
             self.assertIn(header.task_id, ctk.active_tasks)
 
+    def test_persistance_subtasks(self):
+        tasks_dir = Path(self.path)
+        ctk = CompTaskKeeper(tasks_dir)
+        header = get_task_header()
+        ctk.add_request(header, 10)
+        ctk.add_request(header, 10)
+        ctd = ComputeTaskDef()
+        ctd.task_id = header.task_id
+        ctd.subtask_id = "abc"
+        assert ctk.receive_subtask(ctd)
+
+        ctk = CompTaskKeeper(tasks_dir)
+        assert ctk.active_tasks[header.task_id].requests == 1
+        assert ctk.get_task_id_for_subtask("abc") == header.task_id
+
+    def test_restore_legacy_dump(self):
+        tasks_dir = Path(self.path)
+        header = get_task_header()
+        active_tasks = {header.task_id: CompTaskInfo(header, 10)}
+        with (tasks_dir / "comp_task_keeper.pickle").open('wb') as f:
+            pickle.dump((active_tasks, {}), f)
+
+        ctk = CompTaskKeeper(tasks_dir)
+        assert header.task_id in ctk.active_tasks
+        assert not ctk.dump_path.exists()
+        ctk = CompTaskKeeper(tasks_dir)
+        assert header.task_id in ctk.active_tasks
+
     @patch('golem.task.taskkeeper.CompTaskKeeper.dump')
     def test_comp_keeper(self, dump_mock):
         ctk = CompTaskKeeper(Path('ignored'))
@@ -1,4 +1,5 @@
 import os
+import pickle
 import random
 import shutil
 import time
@@ -6,6 +7,7 @@ import uuid
 from collections import OrderedDict
 
 from mock import Mock, patch
+from twisted.internet import defer
 
 from apps.blender.task.blenderrendertask import BlenderRenderTask
 from golem.core.common import get_timestamp_utc, timeout_to_deadline
@@ -32,7 +34,7 @@ class TaskMock(Task):
 
     def __getstate__(self):
         state = super(TaskMock, self).__getstate__()
-        del state['query_extra_data_return_value']
+        state.pop('query_extra_data_return_value', None)
         return state
 
 
@@ -43,6 +45,83 @@ class TestTaskManagerWithPersistance(TestDirFixture, LogTestCase):
             TaskManager("ABC", Node(), keys_auth, root_path=self.path, task_persistence=True)
         assert any("RESTORE TASKS" in log for log in l.output)
 
+    def _create_task_manager(self):
+        keys_auth = Mock()
+        keys_auth.sign.return_value = 'sig'
+        keys_auth.get_key_id.return_value = 'KEYID'
+        tm = TaskManager("ABC", Node(), keys_auth, root_path=self.path,
+                         tasks_dir=os.path.join(self.path, "tasks"),
+                         task_persistence=True)
+        tm.listen_address = "10.10.10.10"
+        tm.listen_port = 2222
+        return tm
+
+    def _add_task(self, tm, task_id):
+        header = TaskHeader("node", task_id, "10.10.10.10", 2222, "KEYID",
+                            "env")
+        task = TaskMock(header, src_code='')
+        task.query_extra_data_return_value = None
+        tm.add_new_task(task)
+        tm.start_task(task_id)
+
+    @patch('twisted.internet.reactor.callLater')
+    def test_persistence(self, call_later):
+        tm = self._create_task_manager()
+        self._add_task(tm, "xyz")
+        self._add_task(tm, "abc")
+        self._add_task(tm, "deleted")
+        tm.delete_task("deleted")
+        call_later.assert_not_called()
+
+        # Updates are written after a delay, all at once
+        tm.pause_task("xyz")
+        tm.pause_task("abc")
+        assert call_later.call_count == 1
+        assert tm._dirty_tasks == {"xyz", "abc"}
+        assert self._create_task_manager().tasks_states["xyz"].status == \
+            TaskStatus.waiting
+
+        with patch.object(tm, 'dump_task', wraps=tm.dump_task) as dump_task:
+            call_later.call_args[0][1]()
+            assert dump_task.call_count == 2
+        restored = self._create_task_manager()
+        assert set(restored.tasks) == {"xyz", "abc"}
+        assert restored.tasks_states["xyz"].status == TaskStatus.paused
+        assert restored.tasks["abc"].header.task_id == "abc"
+
+    @patch('golem.task.taskbase.Task.needs_computation', return_value=True)
+    @patch('twisted.internet.reactor.callLater')
+    def test_persistence_of_assigned_subtask(self, call_later, *_):
+        tm = self._create_task_manager()
+        self._add_task(tm, "xyz")
+        ctd = ComputeTaskDef()
+        ctd.task_id = "xyz"
+        ctd.subtask_id = "xxyyzz"
+        ctd.deadline = timeout_to_deadline(120)
+        tm.tasks["xyz"].query_extra_data_return_value = Task.ExtraData(
+            should_wait=False, ctd=ctd)
+
+        assigned, wrong_task, wait = tm.get_next_subtask(
+            "NODE", "NODE", "xyz", 1000, 0, 5, 10)
+        assert assigned is ctd
+        # Assigned subtask is written right away, not after a delay
+        call_later.assert_not_called()
+        assert not tm._dirty_tasks
+        restored = self._create_task_manager()
+        assert "xxyyzz" in restored.tasks_states["xyz"].subtask_states
+
+    def test_restore_legacy_dump(self):
+        tm = self._create_task_manager()
+        self._add_task(tm, "xyz")
+        with (tm.tasks_dir / "xyz.pickle").open('wb') as f:
+            pickle.dump((tm.tasks["xyz"], tm.tasks_states["xyz"]), f)
+        tm.delete_task("xyz")
+
+        restored = self._create_task_manager()
+        assert "xyz" in restored.tasks
+        assert not (tm.tasks_dir / "xyz.pickle").exists()
+        assert "xyz" in self._create_task_manager().tasks
+
 
 class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
     def setUp(self):
@@ -61,6 +140,13 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         super(TestTaskManager, self).tearDown()
         shutil.rmtree(str(self.tm.tasks_dir))
 
+    def _computed_task_received(self, subtask_id, result, result_type):
+        results = []
+        deferred = self.tm.computed_task_received(subtask_id, result,
+                                                  result_type)
+        deferred.addCallback(results.append)
+        return results[0]
+
     def _get_task_header(self, task_id, timeout, subtask_timeout):
         return TaskHeader(
             node_name="test_node_%s" % (self.test_nonce,),
@@ -275,7 +361,8 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
             def needs_computation(self):
                 return sum(self.finished.values()) != len(self.finished)
 
-            def computation_finished(self, subtask_id, task_result, result_type=0):
+            def computation_finished(self, subtask_id, task_result, result_type=0,
+                                     verification_scheduler=None):
                 if not self.restarted[subtask_id]:
                     self.finished[subtask_id] = True
 
@@ -302,7 +389,7 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         assert task_id == "xyz"
         ss = self.tm.tasks_states["xyz"].subtask_states["xxyyzz"]
         assert ss.subtask_status == SubtaskStatus.starting
-        assert self.tm.computed_task_received("xxyyzz", [], 0)
+        assert self._computed_task_received("xxyyzz", [], 0)
         assert t.finished["xxyyzz"]
         assert ss.subtask_progress == 1.0
         assert ss.subtask_rem_time == 0.0
@@ -320,7 +407,7 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         self.tm.restart_subtask("aabbcc")
         ss = self.tm.tasks_states["abc"].subtask_states["aabbcc"]
         assert ss.subtask_status == SubtaskStatus.restarted
-        assert not self.tm.computed_task_received("aabbcc", [], 0)
+        assert not self._computed_task_received("aabbcc", [], 0)
         assert ss.subtask_progress == 0.0
         assert ss.subtask_status == SubtaskStatus.restarted
         assert not t2.finished["aabbcc"]
@@ -339,7 +426,7 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         assert ss.subtask_rem_time == 0.0
         assert ss.stderr == "something went wrong"
         with self.assertLogs(logger, level="WARNING"):
-            assert not self.tm.computed_task_received("qqwwee", [], 0)
+            assert not self._computed_task_received("qqwwee", [], 0)
 
         th.task_id = "task4"
         t2 = TestTask(th, "print 'Hello world!", ["ttt4", "sss4"], {'ttt4': False, 'sss4': True})
@@ -349,13 +436,58 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
                                                            "10.10.10.10")
         assert not wrong_task
         assert ctd.subtask_id == "ttt4"
-        assert not self.tm.computed_task_received("ttt4", [], 0)
+        assert not self._computed_task_received("ttt4", [], 0)
         assert self.tm.tasks_states["task4"].subtask_states["ttt4"].subtask_status == SubtaskStatus.failure
-        assert not self.tm.computed_task_received("ttt4", [], 0)
+        assert not self._computed_task_received("ttt4", [], 0)
         ctd, wrong_task, should_wait = self.tm.get_next_subtask("DEF", "DEF", "task4", 1000, 10, 5, 10, 2, "10.10.10.10")
         assert not wrong_task
         assert ctd.subtask_id == "sss4"
-        assert self.tm.computed_task_received("sss4", [], 0)
+        assert self._computed_task_received("sss4", [], 0)
+
+    def _add_verified_subtask(self, task_id, subtask_id):
+        task = Mock()
+        task.verify_subtask.return_value = True
+        task.finished_computation.return_value = False
+        task_state = TaskState()
+        task_state.status = TaskStatus.computing
+        subtask_state = SubtaskState()
+        subtask_state.subtask_status = SubtaskStatus.starting
+        task_state.subtask_states[subtask_id] = subtask_state
+
+        self.tm.tasks[task_id] = task
+        self.tm.tasks_states[task_id] = task_state
+        self.tm.subtask2task_mapping[subtask_id] = task_id
+        return task, subtask_state
+
+    def test_computed_task_received_deferred(self):
+        task, ss = self._add_verified_subtask("xyz", "xxyyzz")
+        verification = defer.Deferred()
+        task.computation_finished.return_value = verification
+
+        results = []
+        deferred = self.tm.computed_task_received("xxyyzz", [], 0)
+        deferred.addCallback(results.append)
+        assert task.computation_finished.call_args[1] == {
+            'verification_scheduler': self.tm.verification_scheduler}
+        assert ss.subtask_status == SubtaskStatus.verifying
+        assert not results
+
+        # Result is not verified twice
+        with self.assertLogs(logger, level="WARNING"):
+            assert not self._computed_task_received("xxyyzz", [], 0)
+        assert task.computation_finished.call_count == 1
+
+        verification.callback(None)
+        assert results == [True]
+        assert ss.subtask_status == SubtaskStatus.finished
+        assert self.tm.tasks_states["xyz"].status == TaskStatus.computing
+
+        task, ss = self._add_verified_subtask("abc", "aabbcc")
+        task.computation_finished.side_effect = ValueError("wrong result")
+        with self.assertLogs(logger, level="ERROR"):
+            assert not self._computed_task_received("aabbcc", [], 0)
+        assert ss.subtask_status == SubtaskStatus.failure
+        task.computation_failed.assert_called_once_with("aabbcc")
 
     @patch("golem.task.taskmanager.get_external_address")
     def test_task_result_incoming(self, mock_addr):
@@ -473,6 +605,79 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
             assert self.tm.tasks_states["qwe"].status == TaskStatus.timeout
             assert self.tm.tasks_states["qwe"].subtask_states["qwerty"].subtask_status == SubtaskStatus.failure
 
+    @patch("golem.task.taskmanager.get_external_address")
+    def test_check_timeouts_inactive_and_changed(self, mock_addr):
+        mock_addr.return_value = self.addr_return
+        t = self._get_task_mock(timeout=0.05)
+        self.tm.add_new_task(t)
+        self.tm.start_task("xyz")
+        self.tm.pause_task("xyz")
+        time.sleep(0.1)
+
+        # paused task dies only after it's resumed
+        self.tm.check_timeouts()
+        assert self.tm.tasks_states["xyz"].status == TaskStatus.paused
+        assert self.tm._deadlines == []
+        self.tm.resume_task("xyz")
+        self.tm.check_timeouts()
+        assert self.tm.tasks_states["xyz"].status == TaskStatus.timeout
+
+        # entries of changed deadlines are ignored
+        t2 = self._get_task_mock(task_id="abc", timeout=0.05)
+        self.tm.add_new_task(t2)
+        self.tm.start_task("abc")
+        self.tm.change_timeouts("abc", 60, 10)
+        time.sleep(0.1)
+        self.tm.check_timeouts()
+        assert self.tm.tasks_states["abc"].status == TaskStatus.waiting
+        assert [e[1:] for e in self.tm._deadlines] == [("abc", None)]
+
+    @patch("golem.task.taskmanager.get_external_address")
+    def test_check_timeouts_finished_tasks(self, mock_addr):
+        mock_addr.return_value = self.addr_return
+        self.tm.add_new_task(self._get_task_mock(timeout=0.05))
+        self.tm.start_task("xyz")
+        self.tm.pause_task("xyz")
+        time.sleep(0.1)
+        self.tm.check_timeouts()
+        assert set(self.tm._inactive_deadlines) == {"xyz"}
+
+        # deadlines of aborted or finished tasks are not kept
+        self.tm.abort_task("xyz")
+        t = self._get_task_mock(task_id="qwe", timeout=0.05)
+        self.tm.add_new_task(t)
+        self.tm.start_task("qwe")
+        self.tm.tasks_states["qwe"].status = TaskStatus.finished
+        time.sleep(0.1)
+        self.tm.check_timeouts()
+        assert self.tm._inactive_deadlines == {}
+        assert self.tm._deadlines == []
+        assert self.tm.tasks_states["qwe"].status == TaskStatus.finished
+
+    @patch("golem.task.taskmanager.get_external_address")
+    def test_check_timeouts_many_subtasks(self, mock_addr):
+        mock_addr.return_value = self.addr_return
+        t = self._get_task_mock(timeout=60)
+        t.computation_failed = Mock()
+        self.tm.add_new_task(t)
+        self.tm.start_task("xyz")
+        add_subtask = self.tm._TaskManager__add_subtask_to_tasks_states
+        for i in xrange(100):
+            ctd = ComputeTaskDef()
+            ctd.task_id = "xyz"
+            ctd.subtask_id = "sub{}".format(i)
+            ctd.deadline = timeout_to_deadline(0.05 if i < 3 else 60)
+            add_subtask("node", "node{}".format(i), 1, ctd, "10.10.10.10")
+            self.tm.subtask2task_mapping[ctd.subtask_id] = "xyz"
+        self.tm.tasks_states["xyz"].subtask_states["sub2"].subtask_status = \
+            SubtaskStatus.verifying
+        time.sleep(0.1)
+
+        assert sorted(self.tm.check_timeouts()) == ["node0", "node1"]
+        assert t.computation_failed.call_count == 2
+        assert len(self.tm._deadlines) == 98
+        assert self.tm.check_timeouts() == []
+
     def test_task_event_listener(self):
         self.tm.notice_task_updated = Mock()
         assert isinstance(self.tm, TaskEventListener)
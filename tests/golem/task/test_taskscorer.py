@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from golem.core.common import timeout_to_deadline
+
+from golem.task.taskbase import TaskHeader
+from golem.task.taskscorer import ExpectedValueTaskScorer, RandomTaskScorer, \
+    TaskScorer
+
+
+def get_header(resource_size=0, subtask_timeout=100, owner="owner",
+               max_price=3600, deadline=None):
+    if deadline is None:
+        deadline = timeout_to_deadline(3600)
+    return TaskHeader("node", "task", "10.10.10.10", 10101, owner,
+                      "DEFAULT", resource_size=resource_size,
+                      subtask_timeout=subtask_timeout, max_price=max_price,
+                      deadline=deadline)
+
+
+class TestTaskScorer(TestCase):
+    def test_base(self):
+        with self.assertRaises(NotImplementedError):
+            TaskScorer().score(get_header())
+
+    def test_random(self):
+        score = RandomTaskScorer().score(get_header())
+        assert 0.0 <= score < 1.0
+
+    def test_expected_value(self):
+        scorer = ExpectedValueTaskScorer(bandwidth=100)
+        assert scorer.score(get_header()) == 0.5
+        # half of the time is spent downloading resources
+        assert scorer.score(get_header(resource_size=10000)) == 0.25
+        assert scorer.score(get_header(), rejections=1) == 0.25
+        assert scorer.score(get_header(), owner_rejections=1) == 0.4
+
+    def test_price(self):
+        scorer = ExpectedValueTaskScorer()
+        assert scorer.score(get_header(max_price=7200)) == 1.0
+        assert scorer.score(get_header(max_price=0)) == 0.0
+
+    def test_deadline(self):
+        scorer = ExpectedValueTaskScorer()
+        # the subtask may be computed in a half of its timeout only
+        header = get_header(deadline=timeout_to_deadline(50))
+        assert 0.24 < scorer.score(header) <= 0.25
+        header = get_header(deadline=timeout_to_deadline(-10))
+        assert scorer.score(header) == 0.0
+
+    def test_trust(self):
+        get_trust = Mock(return_value=1.0)
+        scorer = ExpectedValueTaskScorer(get_trust)
+        assert scorer.score(get_header()) == 1.0
+        get_trust.assert_called_once_with("owner")
+
+        get_trust.return_value = -0.5
+        assert scorer.score(get_header(owner="owner_2")) == 0.25
+        get_trust.return_value = -3.0
+        assert scorer.score(get_header(owner="owner_3")) == 0.0
+        get_trust.return_value = None
+        assert scorer.score(get_header(owner="owner_4")) == 0.5
+
+    def test_trust_cached(self):
+        get_trust = Mock(return_value=1.0)
+        scorer = ExpectedValueTaskScorer(get_trust, trust_timeout=10)
+        with patch('golem.task.taskscorer.time.time', return_value=1000):
+            assert scorer.score(get_header()) == 1.0
+            get_trust.return_value = -1.0
+            assert scorer.score(get_header()) == 1.0
+        assert get_trust.call_count == 1
+
+        with patch('golem.task.taskscorer.time.time', return_value=1011):
+            assert scorer.score(get_header()) == 0.0
+        assert get_trust.call_count == 2
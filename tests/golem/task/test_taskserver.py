@@ -6,6 +6,7 @@ import random
 import uuid
 from collections import deque
 from math import ceil
+from unittest import TestCase
 
 from mock import Mock, MagicMock, patch, ANY
 from stun import FullCone
@@ -20,7 +21,8 @@ from golem.network.p2p.node import Node
 from golem.task import tasksession
 from golem.task.taskbase import ComputeTaskDef, TaskHeader
 from golem.task.taskserver import TASK_CONN_TYPES
-from golem.task.taskserver import TaskServer, WaitingTaskResult, logger
+from golem.task.taskserver import TaskServer, WaitingTaskResult, logger, \
+    HeaderSignatureCache
 from golem.task.tasksession import TaskSession
 from golem.tools.assertlogs import LogTestCase
 from golem.tools.testwithappconfig import TestWithKeysAuth
@@ -266,6 +268,68 @@ class TestTaskServer(TestWithKeysAuth, LogTestCase, testutils.DatabaseFixture):
         saved_task = next(th for th in ts.get_tasks_headers() if th["task_id"] == "xyz_2")
         self.assertEqual(saved_task["signature"], new_header["signature"])
 
+    def test_add_task_header_verified_once(self):
+        config = self._get_config_desc()
+        keys_auth = EllipticalKeysAuth(self.path)
+        keys_auth_2 = EllipticalKeysAuth(os.path.join(self.path, "2"))
+
+        self.ts = ts = TaskServer(Node(), config, keys_auth, self.client,
+                                  use_docker_machine_manager=False)
+
+        task_header = get_example_task_header()
+        task_header["task_owner_key_id"] = keys_auth_2.key_id
+        task_header["signature"] = keys_auth_2.sign(
+            TaskHeader.dict_to_binary(task_header))
+
+        with patch.object(ts, 'verify_header_sig',
+                          wraps=ts.verify_header_sig) as verify:
+            for _ in range(3):
+                assert ts.add_task_header(dict(task_header))
+            assert verify.call_count == 1
+            assert ts.header_sig_cache.get_stats()['hits'] == 2
+
+            # relayed header modified without signing it again
+            forged = dict(task_header, task_owner_port=1)
+            assert not ts.add_task_header(forged)
+            assert verify.call_count == 2
+
+    def test_get_tasks_headers_delta(self):
+        config = self._get_config_desc()
+        keys_auth = EllipticalKeysAuth(self.path)
+        keys_auth_2 = EllipticalKeysAuth(os.path.join(self.path, "2"))
+
+        self.ts = ts = TaskServer(Node(), config, keys_auth, self.client,
+                                  use_docker_machine_manager=False)
+
+        for task_id in ["xyz_1", "xyz_2"]:
+            task_header = get_example_task_header()
+            task_header["task_id"] = task_id
+            task_header["task_owner_key_id"] = keys_auth_2.key_id
+            task_header["signature"] = keys_auth_2.sign(
+                TaskHeader.dict_to_binary(task_header))
+            assert ts.add_task_header(task_header)
+
+        digests = ts.get_tasks_digests()
+        assert set(digests.keys()) == {"xyz_1", "xyz_2"}
+
+        # peers not sending digests and peers knowing nothing get everything
+        assert len(ts.get_tasks_headers()) == 2
+        assert len(ts.get_tasks_headers({"other": "abc"})) == 2
+        # peers knowing all headers get nothing
+        assert ts.get_tasks_headers(digests) == []
+
+        # updated headers are sent again
+        task_header["task_owner"]["pub_port"] = 9999
+        task_header["signature"] = keys_auth_2.sign(
+            TaskHeader.dict_to_binary(task_header))
+        assert ts.add_task_header(task_header)
+        assert ts.get_tasks_digests()["xyz_2"] != digests["xyz_2"]
+        headers = ts.get_tasks_headers(digests)
+        assert [th["task_id"] for th in headers] == ["xyz_2"]
+
+        ts.remove_task_header("xyz_1")
+        assert "xyz_1" not in ts.get_tasks_digests()
+
     def test_sync(self):
         ccd = self._get_config_desc()
         ts = TaskServer(Node(), ccd, EllipticalKeysAuth(self.path), self.client,
@@ -715,6 +779,74 @@ class TestTaskServer(TestWithKeysAuth, LogTestCase, testutils.DatabaseFixture):
         assert ts.task_sessions_incoming.pop() == tss
 
 
+class TestHeaderSignatureCache(TestCase):
+
+    def test_verify(self):
+        cache = HeaderSignatureCache(max_size=2)
+        verify = Mock(return_value=True)
+        headers = []
+        for i in range(3):
+            header = get_example_task_header()
+            header["task_id"] = "task_{}".format(i)
+            header["signature"] = "sig"
+            header["last_checking"] = 1000.0
+            headers.append(header)
+
+        assert cache.verify(headers[0], verify)
+        assert cache.verify(headers[0], verify)
+        assert verify.call_count == 1
+        assert cache.get_stats() == {'size': 1, 'hits': 1, 'misses': 1}
+
+        # least recently used entries are removed
+        cache.verify(headers[1], verify)
+        cache.verify(headers[2], verify)
+        assert len(cache) == 2
+        cache.verify(headers[0], verify)
+        assert verify.call_count == 4
+
+        # the same header relayed by other peers, which set their own
+        # last_checking time
+        relayed = dict(headers[2], last_checking=2000.0)
+        assert cache.verify(relayed, verify)
+        assert verify.call_count == 4
+        # changes of signed fields are verified again
+        modified = dict(headers[2], max_price=headers[2]["max_price"] + 1)
+        assert cache.verify(modified, verify)
+        assert verify.call_count == 5
+
+        # results are kept until the header deadline
+        verify.return_value = False
+        header = dict(headers[0], task_id="expired")
+        header["deadline"] = timeout_to_deadline(-1)
+        assert not cache.verify(header, verify)
+        assert not cache.verify(header, verify)
+        assert verify.call_count == 7
+
+    @patch('golem.task.taskserver.get_timestamp_utc')
+    def test_evict(self, now):
+        now.return_value = 1000.0
+        cache = HeaderSignatureCache(max_size=3, sweep_interval=60)
+        verify = Mock(return_value=True)
+        for i, deadline in enumerate([1010.0, 2000.0, 1020.0, 2000.0]):
+            header = get_example_task_header()
+            header["task_id"] = "task_{}".format(i)
+            header["signature"] = "sig"
+            header["deadline"] = deadline
+            cache.verify(header, verify)
+
+        # only the least recently used entry is evicted
+        assert [k[0] for k in cache._results] == ["task_1", "task_2",
+                                                  "task_3"]
+
+        # expired entries are swept once per interval
+        now.return_value = 1059.0
+        cache._evict(now.return_value)
+        assert len(cache) == 3
+        now.return_value = 1060.0
+        cache._evict(now.return_value)
+        assert [k[0] for k in cache._results] == ["task_1", "task_3"]
+
+
 class TestTaskServer2(TestWithKeysAuth, TestDirFixtureWithReactor):
 
     def setUp(self):
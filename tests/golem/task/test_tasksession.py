@@ -6,6 +6,7 @@ import uuid
 
 from apps.core.task.coretask import TaskResourceHeader
 from mock import Mock, MagicMock, patch
+from twisted.internet.defer import Deferred
 
 from golem import model
 from golem import testutils
@@ -250,6 +251,38 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
         assert not ts.msgs_to_send
         assert conn.close.called
 
+    def test_result_received_async_verification(self):
+        conn = Mock()
+        ts = TaskSession(conn)
+        ts.task_server = Mock()
+        ts.task_manager = Mock()
+        ts.task_manager.verify_subtask.return_value = True
+
+        extra_data = dict(
+            result=cPickle.dumps({'stdout': 'xyz'}),
+            result_type=result_types['data'],
+            subtask_id='xxyyzz'
+        )
+
+        for fire, expected in [
+                (lambda d: d.callback(True), MessageSubtaskResultAccepted),
+                (lambda d: d.errback(Exception('Verification failed')),
+                 MessageSubtaskResultRejected)]:
+            deferred = Deferred()
+            ts.task_manager.computed_task_received.return_value = deferred
+            ts.msgs_to_send = []
+            conn.close.called = False
+
+            ts.result_received(extra_data, decrypt=False)
+
+            # the session waits for the verification result
+            assert not ts.msgs_to_send
+            assert not conn.close.called
+
+            fire(deferred)
+            assert isinstance(ts.msgs_to_send[0], expected)
+            assert conn.close.called
+
     def test_react_to_task_result_hash(self):
 
         def create_pull_package(result):
@@ -0,0 +1,89 @@
+from unittest import TestCase
+
+from mock import patch
+from twisted.internet import defer
+
+from golem.task.verificationscheduler import VerificationScheduler
+
+
+class TestVerificationScheduler(TestCase):
+
+    def setUp(self):
+        self.started = []
+        patcher = patch('golem.task.verificationscheduler.threads'
+                        '.deferToThread', side_effect=self._defer_to_thread)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _defer_to_thread(self, verify, *args, **kwargs):
+        deferred = defer.Deferred()
+        self.started.append((args[0], deferred))
+        return deferred
+
+    def _schedule(self, scheduler, deadline, name, results):
+        deferred = scheduler.schedule(deadline, lambda n: n, name)
+        deferred.addBoth(results.append)
+
+    def test_concurrency_limit(self):
+        scheduler = VerificationScheduler(max_workers=2)
+        results = []
+        for name in ['a', 'b', 'c']:
+            self._schedule(scheduler, 10, name, results)
+
+        assert [name for name, _ in self.started] == ['a', 'b']
+        stats = scheduler.get_stats()
+        assert stats['queued'] == 1
+        assert stats['running'] == 2
+
+        self.started[1][1].callback('b')
+        assert results == ['b']
+        assert [name for name, _ in self.started] == ['a', 'b', 'c']
+
+        self.started[0][1].callback('a')
+        self.started[2][1].callback('c')
+        assert results == ['b', 'a', 'c']
+
+        stats = scheduler.get_stats()
+        assert stats['queued'] == 0
+        assert stats['running'] == 0
+        assert stats['finished'] == 3
+        assert stats['failed'] == 0
+
+    def test_deadline_priority(self):
+        scheduler = VerificationScheduler(max_workers=1)
+        results = []
+        self._schedule(scheduler, 30, 'first', results)
+        self._schedule(scheduler, 30, 'late', results)
+        self._schedule(scheduler, 10, 'urgent', results)
+        self._schedule(scheduler, 20, 'soon', results)
+
+        while len(results) < len(self.started):
+            name, deferred = self.started[len(results)]
+            deferred.callback(name)
+        assert results == ['first', 'urgent', 'soon', 'late']
+
+    def test_failure(self):
+        scheduler = VerificationScheduler(max_workers=0)
+        assert scheduler.max_workers == 1
+
+        results = []
+        self._schedule(scheduler, 10, 'a', results)
+        self._schedule(scheduler, 10, 'b', results)
+        self.started[0][1].errback(ValueError('a'))
+        assert isinstance(results[0].value, ValueError)
+
+        self.started[1][1].callback('b')
+        stats = scheduler.get_stats()
+        assert stats['finished'] == 1
+        assert stats['failed'] == 1
+
+    def test_set_max_workers(self):
+        scheduler = VerificationScheduler(max_workers=1)
+        results = []
+        for name in ['a', 'b', 'c']:
+            self._schedule(scheduler, 10, name, results)
+        assert len(self.started) == 1
+
+        scheduler.set_max_workers(3)
+        assert len(self.started) == 3
+        assert scheduler.get_stats()['max_workers'] == 3
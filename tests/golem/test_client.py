@@ -4,7 +4,7 @@ import unittest
 import uuid
 
 from mock import Mock, MagicMock, patch
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import Deferred, succeed
 
 from golem import testutils
 from golem.client import Client, ClientTaskComputerEventListener
@@ -16,6 +16,8 @@ from golem.core.deferred import sync_wait
 from golem.model import Payment, PaymentStatus, ExpectedIncome
 from golem.network.p2p.node import Node
 from golem.network.p2p.peersession import PeerSessionInfo
+from golem.resource.base.resourcesmanager import ResourceCache
+from golem.resource.base.resourcestore import ResourceStore
 from golem.resource.dirmanager import DirManager
 from golem.resource.resourceserver import ResourceServer
 from golem.rpc.mapping.aliases import UI, Environment
@@ -306,8 +308,8 @@ class TestClient(TestWithDatabase):
         self.client.start_network()
         self.client.collect_gossip()
 
-    @patch('golem.client.log')
-    def test_do_work(self, log, *_):
+    @patch('golem.client.threads.deferToThread')
+    def test_subsystem_ticks(self, defer_to_thread, *_):
         self.client = Client(datadir=self.path, transaction_system=False,
                              connect_to_known_hosts=False,
                              use_docker_machine_manager=False,
@@ -319,49 +321,104 @@ class TestClient(TestWithDatabase):
         c.task_server = Mock()
         c.resource_server = Mock()
         c.ranking = Mock()
+        c.transaction_system = Mock()
         c.check_payments = Mock()
 
-        # Test if method exits if p2pservice is not present
+        ticks = [c._Client__sync_p2p, c._Client__sync_tasks,
+                 c._Client__sync_resources, c._Client__sync_ranking,
+                 c._Client__check_payments]
+
+        # Test if ticks exit if p2pservice is not present
         c.p2pservice = None
         c.config_desc.send_pings = False
-        c._Client__do_work()
+        for tick in ticks:
+            tick()
 
-        assert not log.exception.called
-        assert not c.check_payments.called
+        assert not c.task_server.sync_network.called
+        assert not c.resource_server.sync_network.called
+        assert not defer_to_thread.called
 
         # Test calls with p2pservice
         c.p2pservice = Mock()
         c.p2pservice.peers = {
             str(uuid.uuid4()): Mock()
         }
-
-        c._Client__do_work()
+        c.p2pservice.pop_neighbours_loc_ranks.return_value = []
+        for tick in ticks:
+            tick()
 
         assert not c.p2pservice.ping_peers.called
-        assert not log.exception.called
         assert c.p2pservice.sync_network.called
         assert c.task_server.sync_network.called
         assert c.resource_server.sync_network.called
-        assert c.ranking.sync_network.called
-        assert c.check_payments.called
+        # payments are checked and ranks are saved in a thread
+        defer_to_thread.assert_called_once_with(c.check_payments)
+        assert not c.ranking.sync_network.called
+
+        loc_ranks = [['neighbour', 'node', [0.1, 0.2]]]
+        c.p2pservice.pop_neighbours_loc_ranks.return_value = loc_ranks
+        c._Client__sync_ranking()
+        defer_to_thread.assert_called_with(c.ranking.sync_network, loc_ranks)
 
         # Enable pings
         c.config_desc.send_pings = True
+        c._Client__sync_p2p()
+        assert c.p2pservice.ping_peers.called
 
-        # Make methods throw exceptions
-        def raise_exc():
-            raise Exception('Test exception')
+    @patch('golem.client.threads.deferToThread')
+    def test_check_payments(self, defer_to_thread, *_):
+        self.client = Client(datadir=self.path, transaction_system=False,
+                             connect_to_known_hosts=False,
+                             use_docker_machine_manager=False,
+                             use_monitor=False)
+        c = self.client
+        c.p2pservice = Mock()
+        c.transaction_system = Mock()
+        c.transaction_system.check_payments.return_value = []
+        keeper = c.transaction_system.incomes_keeper
+        keeper.update_expected.return_value = ['expected_income']
+
+        # the database is checked in a thread
+        defer_to_thread.side_effect = lambda f: succeed(f())
+        c._Client__check_payments()
+        assert keeper.update_expected.called
+        # but the signal is sent after the thread finishes
+        keeper.notify_expected.assert_called_once_with(['expected_income'])
+
+        defer_to_thread.side_effect = lambda f: Deferred()
+        keeper.notify_expected.reset_mock()
+        c._Client__check_payments()
+        assert not keeper.notify_expected.called
+
+    def test_timers(self, *_):
+        self.client = Client(datadir=self.path, transaction_system=False,
+                             connect_to_known_hosts=False,
+                             use_docker_machine_manager=False,
+                             use_monitor=False)
 
-        c.p2pservice.sync_network = raise_exc
-        c.task_server.sync_network = raise_exc
-        c.resource_server.sync_network = raise_exc
-        c.ranking.sync_network = raise_exc
-        c.check_payments = raise_exc
+        stats = self.client.get_tick_stats()
+        assert set(stats.keys()) == {'p2p', 'tasks', 'resources', 'ranking',
+                                     'payments'}
+        assert all(s['ticks'] == 0 for s in stats.values())
 
-        c._Client__do_work()
+        self.client.resume()
+        assert self.client.timers.running
+        self.client.pause()
+        assert not self.client.timers.running
 
-        assert c.p2pservice.ping_peers.called
-        assert log.exception.call_count == 5
+    def test_header_signature_stats(self, *_):
+        self.client = Client(datadir=self.path, transaction_system=False,
+                             connect_to_known_hosts=False,
+                             use_docker_machine_manager=False,
+                             use_monitor=False)
+        self.client.task_server = Mock()
+        stats = self.client.task_server.header_sig_cache.get_stats
+        assert self.client.get_header_signature_stats() is stats.return_value
+
+    @patch('golem.client.StreamMonitor.stats')
+    def test_stream_stats(self, stats, *_):
+        stats.return_value = dict(active=1, timed_out=2, finished=3)
+        assert Client.get_stream_stats() == stats.return_value
 
     @patch('golem.client.log')
     @patch('golem.client.dispatcher.send')
@@ -568,6 +625,10 @@ class TestClientRPCMethods(TestWithDatabase, LogTestCase):
 
         c.resource_server = ResourceServer.__new__(ResourceServer)
         c.resource_server.dir_manager = c.task_server.task_computer.dir_manager
+        store = ResourceStore(os.path.join(self.path, 'store'))
+        c.resource_server.resource_manager = Mock()
+        c.resource_server.resource_manager.storage.store = store
+        c.resource_server.resource_manager.storage.cache = ResourceCache()
 
         self.assertIsInstance(c.get_datadir(), unicode)
         self.assertIsInstance(c.get_dir_manager(), DirManager)
@@ -587,7 +648,10 @@ class TestClientRPCMethods(TestWithDatabase, LogTestCase):
         for key, value in res_dir_sizes.iteritems():
             self.assertIsInstance(key, unicode)
             self.assertIsInstance(value, unicode)
-            self.assertTrue(key in res_dirs)
+            self.assertTrue(key in res_dirs or key.startswith(u"store")
+                            or key == u"resource cache")
+
+        assert res_dir_sizes[u"store hit rate"] == u"0.0% (0 of 0)"
 
     def test_get_estimated_cost(self, *_):
         c = self.client
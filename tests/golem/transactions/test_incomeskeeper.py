@@ -3,6 +3,8 @@ import random
 import sys
 import time
 
+from mock import patch
+
 from golem.model import db
 from golem.model import ExpectedIncome
 from golem.model import Income
@@ -124,3 +126,26 @@ class TestIncomesKeeper(TestWithDatabase, PEP8MixIn):
         with db.atomic():
             # Match
             self.assertEquals(ExpectedIncome.select().count(), 0)
+
+    @patch('golem.transactions.incomeskeeper.dispatcher.send')
+    def test_update_expected(self, send):
+        expected_income = self.incomes_keeper.expect(
+            sender_node_id=generate_some_id('sender_node_id'),
+            p2p_node=Node(),
+            task_id=generate_some_id('task_id'),
+            subtask_id=generate_some_id('subtask_id'),
+            value=random.randint(1, 10**5)
+        )
+        with db.atomic():
+            expected_income.modified_date = datetime.datetime.now() - datetime.timedelta(hours=1)
+            expected_income.save()
+
+        # the signal is not sent while the database is checked
+        expected = self.incomes_keeper.update_expected()
+        assert [e.id for e in expected] == [expected_income.id]
+        assert not send.called
+
+        self.incomes_keeper.notify_expected(expected)
+        send.assert_called_once_with(signal="golem.transactions",
+                                     event="expected_income",
+                                     expected_income=expected[0])